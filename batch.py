@@ -0,0 +1,263 @@
+"""
+Пакетная обработка без интерфейса.
+
+    python batch.py jobs.toml            # манифест
+    python batch.py папка --out итог     # пары name.docx + name.xlsx
+
+Манифест — TOML со списком задач:
+
+    [[jobs]]
+    pipeline = "make_word"        # необязательно для пар Word + Excel
+    word = "отчёт.docx"
+    excel = "данные.xlsx"
+
+    [[jobs]]
+    pipeline = "copy_ws"
+    origin = "откуда.xlsx"
+    target = "куда.xlsx"
+
+Пути в манифесте считаются от папки манифеста. Если pipeline не указан,
+задача выбирается по листам книги (см. detect_pipeline). Итоги по каждой
+задаче (время, ошибка) пишутся в <out>/summary.json.
+"""
+
+import argparse
+import json
+import multiprocessing
+import sys
+import tomllib
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from time import perf_counter
+from typing import Literal
+
+from pydantic import BaseModel
+from tqdm import tqdm
+
+from jobs import PIPELINES, JobsConfig, init_worker
+from spans import job_trace
+
+Pipeline = Literal[*PIPELINES]
+# префикс имени готового файла, как в интерфейсе
+OUTPUT_PREFIX = {
+    "make_word": "temp_",
+    "excel2word_insert": "выход_",
+    "copy_ws": "target_",
+    "insert_tables_with_filter": "выход_",
+}
+
+
+class BatchJob(BaseModel):
+    name: str = ""
+    pipeline: Pipeline | None = None
+    word: Path | None = None
+    excel: Path | None = None
+    origin: Path | None = None
+    target: Path | None = None
+
+    def inputs(self) -> tuple[Path, Path]:
+        if self.pipeline == "copy_ws":
+            return self.origin, self.target
+        return self.word, self.excel
+
+
+class JobResult(BaseModel):
+    name: str
+    pipeline: str | None
+    status: Literal["ok", "empty", "failed"]
+    seconds: float
+    # секунды по этапам (spans.STAGES)
+    stages: dict[str, float] = {}
+    output: str | None = None
+    error: str | None = None
+
+
+def detect_pipeline(word: Path, excel: Path) -> Pipeline:
+    """
+    Задача по содержимому книги: лист ОСВ — вставка по жёлтым строкам,
+    листы из config.toml — отчёт РД_Влияние СПОД, иначе — таблицы отчёта.
+    """
+    from fills import OSV_SHEET
+    from process import Processor
+    from xlsx_stream import XlsxReader
+
+    with XlsxReader(excel) as reader:
+        sheets = set(reader.sheet_names)
+    if OSV_SHEET in sheets:
+        return "excel2word_insert"
+    if set(Processor().excel.sheet_names or ()) <= sheets:
+        return "make_word"
+    return "insert_tables_with_filter"
+
+
+def run_batch_job(job: BatchJob, out_dir: Path) -> JobResult:
+    """Одна задача в процессе-исполнителе; ошибка не прерывает остальные задачи."""
+    start = perf_counter()
+    trace = None
+    try:
+        with job_trace(job.pipeline, name=job.name) as trace:
+            first, second = job.inputs()
+            if job.pipeline == "insert_tables_with_filter":
+                from task_four import insert_tables_with_filter_io
+
+                buffer = insert_tables_with_filter_io(first, second)
+            else:
+                from process import Processor
+
+                buffer = getattr(Processor(), f"{job.pipeline}_io")(first, second)
+            output = None
+            if buffer is not None:
+                # имя как в интерфейсе: по документу Word (для copy_ws — по целевой книге)
+                named = second if job.pipeline == "copy_ws" else first
+                target = out_dir / job.name / f"{OUTPUT_PREFIX[job.pipeline]}{named.name}"
+                target.parent.mkdir(parents=True, exist_ok=True)
+                target.write_bytes(buffer.getbuffer())
+                output = str(target)
+        status = "ok" if output else "empty"
+        return JobResult(
+            name=job.name, pipeline=job.pipeline, status=status,
+            seconds=perf_counter() - start, stages=trace.totals(), output=output,
+        )
+    except Exception as e:
+        return JobResult(
+            name=job.name, pipeline=job.pipeline, status="failed",
+            seconds=perf_counter() - start, stages=trace.totals() if trace else {},
+            error=f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=-3)}",
+        )
+
+
+def load_manifest(path: Path) -> list[BatchJob]:
+    with open(path, "rb") as f:
+        entries = tomllib.load(f).get("jobs", [])
+    jobs = []
+    for entry in entries:
+        job = BatchJob.model_validate(entry)
+        for field in ("word", "excel", "origin", "target"):
+            value = getattr(job, field)
+            if value is not None and not value.is_absolute():
+                setattr(job, field, path.parent / value)
+        jobs.append(job)
+    return jobs
+
+
+def scan_directory(folder: Path) -> list[BatchJob]:
+    """Пары name.docx + name.xlsx в папке; docx без пары тоже попадает в итог как ошибка."""
+    return [
+        BatchJob(name=word.stem, word=word, excel=word.with_suffix(".xlsx"))
+        for word in sorted(folder.glob("*.docx"))
+        if not word.name.startswith("~$")
+    ]
+
+
+def prepare(jobs: list[BatchJob], pipeline: Pipeline | None) -> dict[int, str]:
+    """
+    Имена задач (уникальные — это папки результата) и выбор задачи.
+    Возвращает ошибки выбора по номерам задач: такие задачи попадут в итог с ошибкой.
+    """
+    seen: set[str] = set()
+    errors: dict[int, str] = {}
+    for i, job in enumerate(jobs):
+        base = job.name or (job.word or job.origin or Path(f"job{i + 1}")).stem
+        name, n = base, 1
+        while name in seen:
+            n += 1
+            name = f"{base}_{n}"
+        seen.add(name)
+        job.name = name
+        if job.pipeline is None:
+            job.pipeline = pipeline
+        if job.pipeline is None and job.word and job.excel and job.excel.exists():
+            try:
+                job.pipeline = detect_pipeline(job.word, job.excel)
+            except Exception as e:
+                errors[i] = f"Не удалось определить задачу по книге {job.excel}: {type(e).__name__}: {e}"
+    return errors
+
+
+def run_batch(
+    jobs: list[BatchJob], out_dir: Path, workers: int, errors: dict[int, str] | None = None
+) -> list[JobResult]:
+    """
+    Все задачи в пуле процессов; результаты в порядке задач. errors — ошибки
+    подготовки (prepare) по номерам задач. Падение исполнителя не прерывает
+    пакет: его задачи попадают в итог с ошибкой.
+    """
+    errors = errors or {}
+    results: list[JobResult | None] = [None] * len(jobs)
+    runnable = {}
+    for i, job in enumerate(jobs):
+        missing = [str(p) for p in job.inputs() if p is None or not p.exists()]
+        if job.pipeline not in PIPELINES or missing:
+            if missing:
+                error = f"Нет файлов: {', '.join(missing)}"
+            else:
+                error = errors.get(i, "Задача (pipeline) не указана и не определена")
+            results[i] = JobResult(
+                name=job.name, pipeline=job.pipeline, status="failed", seconds=0, error=error
+            )
+        else:
+            runnable[i] = job
+    with ProcessPoolExecutor(
+        max(1, min(workers, len(runnable))),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+    ) as pool:
+        futures = {pool.submit(run_batch_job, job, out_dir): i for i, job in runnable.items()}
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                # исполнитель упал (BrokenProcessPool) или ошибка вне run_batch_job
+                job = runnable[i]
+                results[i] = JobResult(
+                    name=job.name, pipeline=job.pipeline, status="failed", seconds=0, error=repr(e)
+                )
+    return results
+
+
+def write_summary(results: list[JobResult], out_dir: Path, seconds: float) -> Path:
+    summary = {
+        "total": len(results),
+        "ok": sum(r.status == "ok" for r in results),
+        "empty": sum(r.status == "empty" for r in results),
+        "failed": sum(r.status == "failed" for r in results),
+        "seconds": round(seconds, 3),
+        "jobs": [r.model_dump() for r in results],
+    }
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path = out_dir / "summary.json"
+    path.write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+    return path
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Пакетная обработка пар Word + Excel")
+    parser.add_argument("source", type=Path, help="манифест .toml или папка с парами docx/xlsx")
+    parser.add_argument("--out", type=Path, default=Path("output") / "batch", help="папка результатов")
+    parser.add_argument("--pipeline", choices=PIPELINES, help="задача для всех пар без явного pipeline")
+    parser.add_argument("--workers", type=int, help="число процессов (по умолчанию [jobs] workers)")
+    args = parser.parse_args(argv)
+
+    jobs = scan_directory(args.source) if args.source.is_dir() else load_manifest(args.source)
+    errors = prepare(jobs, args.pipeline)
+    workers = args.workers
+    if workers is None:
+        with open("config.toml", "rb") as f:
+            workers = JobsConfig.model_validate(tomllib.load(f).get("jobs", {})).workers
+
+    start = perf_counter()
+    results = run_batch(jobs, args.out, workers, errors)
+    path = write_summary(results, args.out, perf_counter() - start)
+
+    for r in results:
+        error = f": {r.error.splitlines()[0]}" if r.error else ""
+        print(f"{r.status:6} {r.seconds:8.2f}s  {r.name} ({r.pipeline}){error}")
+    failed = sum(r.status == "failed" for r in results)
+    print(f"Задач: {len(results)}, с ошибкой: {failed}. Итоги: {path}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
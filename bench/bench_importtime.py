@@ -0,0 +1,68 @@
+"""
+Время запуска: сколько стоит импорт модулей приложения (python -X importtime)
+и не тянут ли они за собой polars, python-docx и openpyxl раньше первой задачи.
+
+    python -m bench.bench_importtime
+    python -m bench.bench_importtime --repeat 7 --scale 1.5
+
+Код возврата 1, если импорт модуля дольше бюджета (BUDGET_MS × --scale)
+или при импорте загрузилась тяжёлая библиотека.
+"""
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# бюджет импорта, мс (лучший из --repeat запусков); основную часть занимают pydantic и tqdm
+BUDGET_MS = {
+    "sources": 100,
+    "markers": 100,
+    "task_four": 150,
+    "process": 300,
+    "jobs": 300,
+    "batch": 350,
+}
+# загружаются только внутри задач
+HEAVY = ("polars", "docx", "openpyxl", "lxml", "fastexcel")
+
+
+def measure(module: str) -> tuple[float, list[str]]:
+    """Суммарное время импорта module в мс и тяжёлые библиотеки, оказавшиеся в sys.modules."""
+    code = f"import sys, {module}; print(' '.join(m for m in {HEAVY!r} if m in sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    total = None
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.removeprefix("import time:").split("|")
+        if len(parts) == 3 and parts[2].strip() == module and not parts[2].startswith("  "):
+            total = int(parts[1]) / 1000
+    if total is None:
+        raise RuntimeError(f"Нет строки импорта {module} в выводе -X importtime")
+    return total, result.stdout.split()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("modules", nargs="*", default=list(BUDGET_MS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="множитель бюджета для медленных машин")
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        # первый запуск прогревает .pyc и файловый кэш
+        measure(module)
+        runs = [measure(module) for _ in range(args.repeat)]
+        best = min(ms for ms, _ in runs)
+        heavy = runs[0][1]
+        budget = BUDGET_MS.get(module, 100) * args.scale
+        ok = best <= budget and not heavy
+        failed |= not ok
+        extra = f"  загружены: {', '.join(heavy)}" if heavy else ""
+        print(f"{'ok' if ok else 'FAIL':4} {module:>10}: {best:7.1f} мс (бюджет {budget:.0f}){extra}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,163 @@
+"""
+Время и пиковая память задач на синтетических входах (bench/synth.py)
+с проверкой против сохранённого базового уровня.
+
+    python -m bench.bench_pipelines                              # сравнить с bench/baseline.json
+    python -m bench.bench_pipelines --cells 100 10000 1000000 --pipelines make_word copy_ws
+    python -m bench.bench_pipelines --update                     # записать новый базовый уровень
+
+Каждый замер идёт в отдельном процессе: память одной задачи не влияет
+на другую. Кэши шаблонов и листов выключены — меряется холодный запуск.
+Пиковая память — максимальный RSS процесса (на Windows — пик выделений
+Python по tracemalloc, без памяти polars и lxml). Время этапов (чтение
+Excel, разбор Word, ...) берётся из spans; пик памяти этапов — из
+отдельного запуска под tracemalloc (выделения Python, без памяти polars
+и lxml), чтобы tracemalloc не искажал время. Код возврата 1, если время,
+память, время или память этапа выросли больше --tolerance относительно
+базового уровня.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from pathlib import Path
+from time import perf_counter
+
+from bench.synth import GENERATORS
+
+BASELINE = Path(__file__).with_name("baseline.json")
+DEFAULT_CELLS = (100, 10_000, 100_000)
+# разницы меньше этих порогов считаются шумом даже сверх --tolerance
+MIN_SECONDS = 0.05
+MIN_MB = 20
+MIN_STAGE_MB = 2
+
+
+def _pipeline(name: str):
+    from process import Processor
+
+    if name == "insert_tables_with_filter":
+        from task_four import insert_tables_with_filter_io
+
+        return insert_tables_with_filter_io
+    if name == "extract_spec_tables":
+        from task6 import extract_spec_tables
+
+        return extract_spec_tables
+    return getattr(Processor(), f"{name}_io")
+
+
+def run_case(name: str, paths: tuple[Path, ...], repeat: int) -> dict:
+    """
+    Замер в процессе-исполнителе: лучшее время из repeat запусков, пик памяти
+    и время этапов (spans) лучшего запуска; затем ещё один запуск под
+    tracemalloc — пик памяти этапов.
+    """
+    import tracemalloc
+
+    import frame_cache
+    import template_cache
+    from spans import ProfileConfig, job_trace, peak_mb
+
+    frame_cache._cache = frame_cache.FrameCache(frame_cache.FrameCacheConfig(size_mb=0))
+    template_cache._cache = template_cache.TemplateCache(template_cache.TemplateConfig(size=0))
+    try:
+        import resource  # noqa: F401
+    except ImportError:
+        tracemalloc.start()
+    fn = _pipeline(name)
+    best, stages = float("inf"), {}
+    # отладочный вывод задач не мешает таблице результатов
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        for _ in range(repeat):
+            start = perf_counter()
+            with job_trace(name, config=ProfileConfig(log_dir=None)) as trace:
+                fn(*paths)
+            seconds = perf_counter() - start
+            if seconds < best:
+                best, stages = seconds, trace.totals()
+        peak = peak_mb()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        with job_trace(name, config=ProfileConfig(log_dir=None), memory=True) as trace:
+            fn(*paths)
+        tracemalloc.stop()
+    return {
+        "seconds": round(best, 4),
+        "peak_mb": round(peak, 1),
+        "stages": {stage: round(s, 4) for stage, s in stages.items()},
+        "stage_mb": trace.peaks(),
+    }
+
+
+def measure(name: str, paths: tuple[Path, ...], repeat: int) -> dict:
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(run_case, name, paths, repeat).result()
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Регрессии: время, память, время или память этапа больше базового
+    уровня на долю tolerance и на заметную величину.
+    """
+    regressions = []
+    for key, now in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        for metric, slack in (("seconds", MIN_SECONDS), ("peak_mb", MIN_MB)):
+            if now[metric] > base[metric] * (1 + tolerance) and now[metric] - base[metric] > slack:
+                regressions.append(f"{key} {metric}: {base[metric]} -> {now[metric]}")
+        for stage, seconds in now.get("stages", {}).items():
+            was = base.get("stages", {}).get(stage)
+            if was is not None and seconds > was * (1 + tolerance) and seconds - was > MIN_SECONDS:
+                regressions.append(f"{key} {stage}: {was} -> {seconds}")
+        for stage, mb in now.get("stage_mb", {}).items():
+            was = base.get("stage_mb", {}).get(stage)
+            if was is not None and mb > was * (1 + tolerance) and mb - was > MIN_STAGE_MB:
+                regressions.append(f"{key} {stage} peak_mb: {was} -> {mb}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cells", type=int, nargs="+", default=list(DEFAULT_CELLS))
+    parser.add_argument("--pipelines", nargs="+", choices=list(GENERATORS), default=list(GENERATORS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="допустимый рост, доля")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--data", type=Path, help="папка входов (по умолчанию временная)")
+    parser.add_argument("--update", action="store_true", help="записать результаты в базовый уровень")
+    args = parser.parse_args()
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline.exists() else {}
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        data = args.data or Path(tmp)
+        data.mkdir(parents=True, exist_ok=True)
+        for cells in args.cells:
+            for name in args.pipelines:
+                paths = GENERATORS[name](data, cells)
+                key = f"{name}/{cells}"
+                results[key] = now = measure(name, paths, args.repeat)
+                base = baseline.get(key)
+                ref = f"  (было {base['seconds']:.3f} с, {base['peak_mb']:.0f} МБ)" if base else ""
+                print(f"{key:>36}: {now['seconds']:8.3f} с  {now['peak_mb']:7.0f} МБ{ref}")
+                if now["stages"]:
+                    print(" " * 38 + ", ".join(f"{stage} {s:.3f}" for stage, s in now["stages"].items()))
+                if now["stage_mb"]:
+                    print(" " * 38 + ", ".join(f"{stage} {mb:.0f} МБ" for stage, mb in now["stage_mb"].items()))
+
+    if args.update:
+        baseline.update(results)
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"Базовый уровень записан: {args.baseline}")
+        sys.exit(0)
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print(f"РЕГРЕССИЯ {line}")
+    sys.exit(1 if regressions else 0)
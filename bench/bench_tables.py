@@ -0,0 +1,78 @@
+"""
+Скорость вставки вложенной таблицы в ячейку (строк в секунду):
+построчная сборка через python-docx против format_numbers + tables.add_table_to_cell.
+
+    python -m bench.bench_tables --rows 20000
+"""
+import argparse
+from time import perf_counter
+
+import polars as pl
+from docx import Document
+from docx.enum.table import WD_TABLE_ALIGNMENT
+from docx.shared import Pt
+from humanize import intcomma
+
+from formatting import format_numbers
+from tables import add_table_to_cell
+
+
+def make_frame(rows: int) -> pl.DataFrame:
+    return pl.DataFrame(
+        {
+            "Лицевой счет": [f"4081781000{i:010d}" for i in range(rows)],
+            "Наименование": [f"Клиент {i}" for i in range(rows)],
+            "Сумма": [i * 1234.567 for i in range(rows)],
+            "Остаток": [i * 7.25 for i in range(rows)],
+        }
+    )
+
+
+def legacy(cell, df: pl.DataFrame) -> None:
+    # прежний код insert_l6_table / insert_table
+    nested = cell.add_table(rows=1, cols=df.width)
+    nested.style = "Table Grid"
+    nested.alignment = WD_TABLE_ALIGNMENT.LEFT
+    hdr = nested.rows[0].cells
+    for i, col in enumerate(df.columns):
+        hdr[i].text = str(col).strip()
+    for data_row in df.iter_rows():
+        new_cells = nested.add_row().cells
+        for i, val in enumerate(data_row):
+            new_cells[i].text = (
+                intcomma(str(val).strip()).replace(",", " ").replace(".", ",")
+                if i >= 2
+                else str(val).strip()
+            )
+    for row in nested.rows:
+        for c in row.cells:
+            for p in c.paragraphs:
+                p.paragraph_format.first_line_indent = Pt(0)
+                p.paragraph_format.left_indent = Pt(0)
+
+
+def bulk(cell, df: pl.DataFrame) -> None:
+    add_table_to_cell(cell, format_numbers(df, columns=df.columns[2:]))
+
+
+def run(fn, df: pl.DataFrame) -> float:
+    doc = Document()
+    cell = doc.add_table(rows=1, cols=1).cell(0, 0)
+    start = perf_counter()
+    fn(cell, df)
+    return perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 5_000, 20_000])
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        df = make_frame(rows)
+        old = run(legacy, df)
+        new = run(bulk, df)
+        print(
+            f"{rows:>7} строк: python-docx {rows / old:>9.0f} строк/с, "
+            f"add_table_to_cell {rows / new:>9.0f} строк/с  (x{old / new:.1f})"
+        )
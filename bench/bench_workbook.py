@@ -0,0 +1,64 @@
+"""
+Сравнение чтения листов для make_word: три вызова pl.read_excel
+против одного разбора книги через WorkbookSession.
+
+    python -m bench.bench_workbook --rows 200000
+"""
+import argparse
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+import polars as pl
+import xlsxwriter
+
+from workbook import WorkbookSession
+
+SHEET_NAMES = ["data1", "data2", "data3"]
+
+
+def make_workbook(path: Path, rows: int) -> None:
+    df = pl.DataFrame(
+        {
+            "Счёт": [f"{40702810000000000000 + i}" for i in range(rows)],
+            "Наименование": [f"Клиент {i}" for i in range(rows)],
+            "Сумма": [i * 1.2345 for i in range(rows)],
+            "Остаток": [i * 7.5 for i in range(rows)],
+        }
+    )
+    with xlsxwriter.Workbook(path) as wb:
+        for name in SHEET_NAMES:
+            df.write_excel(wb, worksheet=name)
+
+
+def legacy(path: Path) -> dict[str, pl.DataFrame]:
+    return {name: pl.read_excel(path, sheet_name=name) for name in SHEET_NAMES}
+
+
+def session(path: Path) -> dict[str, pl.DataFrame]:
+    return WorkbookSession(path, SHEET_NAMES).frames
+
+
+def timeit(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = perf_counter()
+        fn()
+        best = min(best, perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "book.xlsx"
+        make_workbook(path, args.rows)
+        print(f"{args.rows} строк x {len(SHEET_NAMES)} листа, {path.stat().st_size / 2**20:.1f} МБ")
+        base = timeit(lambda: legacy(path), args.repeat)
+        print(f"3 x pl.read_excel:           {base:.3f} с")
+        t = timeit(lambda: session(path), args.repeat)
+        print(f"WorkbookSession:             {t:.3f} с  (x{base / t:.2f})")
@@ -0,0 +1,217 @@
+"""
+Синтетические входы для бенчмарков задач: шаблоны Word с маркерами
+и вложенными таблицами и книги Excel заданного размера (ячеек данных).
+
+    python -m bench.synth --cells 100000 --out bench/.data
+
+Каждый генератор возвращает пути входов в порядке аргументов задачи
+(word, excel) / (origin, target) / (xlsx,) и не пересоздаёт уже
+существующие файлы.
+"""
+import argparse
+import random
+from pathlib import Path
+
+import xlsxwriter
+from docx import Document
+
+from fills import OSV_SHEET
+from process import L6_MARKER, SPOD_MARKER
+from markers import START_PART
+from task6 import SPEC_PREFIX, SPEC_WIDTH
+
+SHEET_NAMES = ("data1", "data2", "data3")
+YELLOW = {"pattern": 1, "bg_color": "#FFFF00"}
+
+
+def _nested_tables(doc, count: int) -> None:
+    """Таблицы с вложенными таблицами — как в реальных шаблонах отчётов."""
+    for n in range(count):
+        table = doc.add_table(rows=3, cols=3)
+        for r in range(3):
+            for c in range(3):
+                table.cell(r, c).text = f"Текст {n}.{r}.{c}"
+        inner = table.cell(1, 1).add_table(rows=2, cols=2)
+        for r in range(2):
+            for c in range(2):
+                inner.cell(r, c).text = f"Вложенная {n}.{r}.{c}"
+        doc.add_paragraph("Пояснение к таблице. " * 5)
+
+
+def make_word_inputs(out: Path, cells: int, sheet_names=SHEET_NAMES) -> tuple[Path, Path]:
+    """Шаблон с L6 и таблицей СПОД; в книге L6 — cells ячеек (4 столбца)."""
+    word, excel = out / f"make_word_{cells}.docx", out / f"make_word_{cells}.xlsx"
+    if not word.exists():
+        doc = Document()
+        doc.add_paragraph("Отчёт о влиянии СПОД")
+        _nested_tables(doc, 2)
+        table = doc.add_table(rows=2, cols=2)
+        table.cell(0, 0).text = "Раздел"
+        table.cell(1, 0).text = "Таблица L6"
+        table.cell(1, 1).text = L6_MARKER
+        spod = doc.add_table(rows=1, cols=2)
+        spod.cell(0, 0).text = SPOD_MARKER
+        spod.cell(0, 1).text = "Итого"
+        for i in range(8):
+            row = spod.add_row().cells
+            row[0].text = f"Строка {i}"
+            row[1].text = ("Д" if i % 2 else "К") + f" {i}"
+        doc.save(word)
+    if not excel.exists():
+        rows = max(1, cells // 4)
+        with xlsxwriter.Workbook(excel) as wb:
+            ws = wb.add_worksheet(sheet_names[0])
+            ws.write_row(0, 0, ["Счёт", "Наименование", "Сумма", "Остаток"])
+            for i in range(rows):
+                ws.write_row(i + 1, 0, [f"4070281000{i:010d}", f"Клиент {i}", i * 1234.567, i * 7.25])
+            ws = wb.add_worksheet(sheet_names[1])
+            ws.write_row(0, 0, ["a", "b", "c", "d"])
+            ws.write_row(1, 0, [1234567.12345, 2.5, 3000, 0.1])
+            ws = wb.add_worksheet(sheet_names[2])
+            ws.write_row(0, 0, ["Статья", "Сумма"])
+            for i in range(4):
+                ws.write_row(i + 1, 0, [f"Д {i}", i * 1000.555])
+    return word, excel
+
+
+def excel2word_inputs(out: Path, cells: int) -> tuple[Path, Path]:
+    """
+    Шаблон с маркерами `_ВСТАВКА_M<i>` в ячейках и лист ОСВ на cells ячеек
+    (4 столбца), каждая третья строка залита жёлтым.
+    """
+    rows = max(1, cells // 4)
+    markers = max(3, min(200, rows // 20))
+    word, excel = out / f"excel2word_{cells}.docx", out / f"excel2word_{cells}.xlsx"
+    if not word.exists():
+        doc = Document()
+        _nested_tables(doc, 2)
+        table = doc.add_table(rows=0, cols=2)
+        for m in range(markers):
+            row = table.add_row().cells
+            row[0].text = f"Раздел {m}"
+            row[1].text = f"{START_PART}M{m}"
+        doc.save(word)
+    if not excel.exists():
+        with xlsxwriter.Workbook(excel) as wb:
+            yellow = wb.add_format(YELLOW)
+            ws = wb.add_worksheet(OSV_SHEET)
+            ws.write_row(0, 0, ["лист", "счёт", "имя", "сумма"])
+            for i in range(rows):
+                ws.write(i + 1, 0, f"M{i % markers}")
+                ws.write(i + 1, 1, f"40817810{i:012d}", yellow if i % 3 == 0 else None)
+                ws.write_row(i + 1, 2, [f"Счёт {i}", i * 10.5])
+    return word, excel
+
+
+def insert_tables_inputs(out: Path, cells: int) -> tuple[Path, Path]:
+    """Шаблон с абзацами `_ВСТАВКА_` по одному на лист; листы по 5 столбцов, шапка в 3-й строке."""
+    sheets = max(1, min(30, cells // 2000))
+    rows = max(1, cells // (5 * sheets))
+    word, excel = out / f"insert_tables_{cells}.docx", out / f"insert_tables_{cells}.xlsx"
+    if not word.exists():
+        doc = Document()
+        doc.add_paragraph("Вступление")
+        _nested_tables(doc, 1)
+        for i in range(sheets):
+            doc.add_paragraph(f"{START_PART} таблица {i}")
+            doc.add_paragraph("Текст после таблицы. " * 3)
+        doc.save(word)
+    if not excel.exists():
+        with xlsxwriter.Workbook(excel) as wb:
+            for s in range(sheets):
+                ws = wb.add_worksheet(f"S{s}")
+                ws.write(0, 0, f"Таблица {s}")
+                ws.write_row(2, 0, ["Статья", "Прим", "2024", "2023", "Изм"])
+                for r in range(rows):
+                    # каждая четвёртая строка — нули, фильтр её отбросит
+                    zero = r % 4 == 0
+                    ws.write_row(3 + r, 0, [
+                        f"Статья {r}", "", 0 if zero else r * 1000.5, 0 if zero else r * 10, 0 if zero else r % 7,
+                    ])
+    return word, excel
+
+
+def copy_ws_inputs(out: Path, cells: int, styles: int = 24) -> tuple[Path, Path]:
+    """Лист с cells ячейками (8 столбцов) и styles разными стилями, объединениями и ширинами."""
+    rows = max(1, cells // 8)
+    origin, target = out / f"copy_ws_{cells}_origin.xlsx", out / f"copy_ws_{cells}_target.xlsx"
+    if not origin.exists():
+        rnd = random.Random(cells)
+        with xlsxwriter.Workbook(origin) as wb:
+            formats = [
+                wb.add_format({
+                    "bold": i % 2 == 0,
+                    "italic": i % 3 == 0,
+                    "font_color": ["#000000", "#FF0000", "#0070C0"][i % 3],
+                    "bg_color": ["#FFFF00", "#00B0F0", "#D9D9D9", "#FFFFFF"][i % 4],
+                    "pattern": 1,
+                    "border": i % 3,
+                    "num_format": ["#,##0.00", "0.000%", "@", "dd.mm.yyyy"][i % 4],
+                    "align": ["left", "center", "right"][i % 3],
+                    "text_wrap": i % 5 == 0,
+                })
+                for i in range(styles)
+            ]
+            ws = wb.add_worksheet("План")
+            for r in range(rows):
+                for c in range(8):
+                    value = f"текст {r % 37}" if c % 3 == 0 else r * c + 0.5
+                    ws.write(r, c, value, formats[rnd.randrange(styles)])
+            for r in range(0, min(rows, 2000), 50):
+                ws.merge_range(r, 8, r + 1, 9, "объединено")
+            ws.set_column(1, 1, 33)
+            ws.set_row(2, 40)
+            ws.conditional_format(1, 1, rows, 1, {
+                "type": "cell", "criteria": ">", "value": 10, "format": formats[0],
+            })
+            ws.repeat_rows(0, 1)
+            wb.add_worksheet("Справочник").write(0, 0, "код")
+    if not target.exists():
+        with xlsxwriter.Workbook(target) as wb:
+            wb.add_worksheet("Итоги").write(0, 0, "итог")
+            wb.add_worksheet("Справочник").write(0, 0, "старый")
+    return origin, target
+
+
+def spec_inputs(out: Path, cells: int, sheets: int = 4) -> tuple[Path]:
+    """Книга из sheets листов с блоками spec_ (ширина SPEC_WIDTH) на cells ячеек в сумме."""
+    xlsx = out / f"spec_{cells}.xlsx"
+    if not xlsx.exists():
+        rnd = random.Random(cells)
+        per_sheet = max(1, cells // (sheets * SPEC_WIDTH))
+        with xlsxwriter.Workbook(xlsx) as wb:
+            for s in range(sheets):
+                ws = wb.add_worksheet(f"Лист{s}")
+                r, t, written = 0, 0, 0
+                while written < per_sheet:
+                    ws.write_row(r, 1, [f"{SPEC_PREFIX}{s}_{t}", "Статья", 2024, "Сумма"])
+                    height = rnd.randint(1, 12)
+                    for i in range(height):
+                        ws.write_row(r + 1 + i, 1, [f"код {i}", f"статья {i}", rnd.choice([0, 12.25, 100000]), i])
+                    written += height + 1
+                    r += height + 1 + rnd.randint(1, 3)
+                    t += 1
+    return (xlsx,)
+
+
+GENERATORS = {
+    "make_word": make_word_inputs,
+    "excel2word_insert": excel2word_inputs,
+    "insert_tables_with_filter": insert_tables_inputs,
+    "copy_ws": copy_ws_inputs,
+    "extract_spec_tables": spec_inputs,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cells", type=int, nargs="+", default=[10_000])
+    parser.add_argument("--out", type=Path, default=Path("bench") / ".data")
+    args = parser.parse_args()
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    for cells in args.cells:
+        for name, generate in GENERATORS.items():
+            paths = generate(args.out, cells)
+            size = sum(p.stat().st_size for p in paths) / 2**20
+            print(f"{name:>26} {cells:>9} ячеек: {', '.join(p.name for p in paths)} ({size:.1f} МБ)")
@@ -4,11 +4,14 @@ from openpyxl.worksheet.worksheet import Worksheet
 from pathlib import Path
 from copy import copy
 from time import time
+from style_cache import StyleCache
 
 SAVE_PATH = Path("output")
-SAVE_PATH.mkdir(exist_ok=True)
+ORIGIN_PATH = Path('шаблоны', 'task2')
 
-def copy_sheet(src_ws: Worksheet, dst_ws: Worksheet):
+def copy_sheet(src_ws: Worksheet, dst_ws: Worksheet, styles: StyleCache | None = None):
+    if styles is None:
+        styles = StyleCache()
     # Копируем значения и стили
     for row in src_ws.iter_rows():
         for cell in row:
@@ -22,13 +25,8 @@ def copy_sheet(src_ws: Worksheet, dst_ws: Worksheet):
             new_cell = dst_ws.cell(row=row_idx, column=col_idx, value=cell.value)
 
             if cell.has_style:
-                new_cell.font = copy(cell.font)
-                new_cell.border = copy(cell.border)
-                new_cell.fill = copy(cell.fill)
-                # Прямо присваиваем строковый код формата
-                new_cell.number_format = cell.number_format
-                new_cell.protection = copy(cell.protection)
-                new_cell.alignment = copy(cell.alignment)
+                # одинаковые стили источника переносятся один раз, дальше — по номеру
+                styles.apply(cell, new_cell)
     # Воссоздаём merged ranges
     for merged_range in src_ws.merged_cells.ranges:
         dst_ws.merge_cells(str(merged_range))
@@ -49,29 +47,30 @@ def copy_sheet(src_ws: Worksheet, dst_ws: Worksheet):
     # Простой (хлороформатный) способ — скопировать «правила» целиком:
     dst_ws.conditional_formatting._cf_rules = copy(src_ws.conditional_formatting._cf_rules)
 
-# Load workbooks
-ORIGIN_PATH = Path('шаблоны', 'task2')
-origin = ORIGIN_PATH / 'origin.xlsx'
-target = ORIGIN_PATH / 'пустой.xlsx'
-origin_wb = load_workbook(origin)
-target_wb = load_workbook(target)
+if __name__ == "__main__":
+    # Load workbooks
+    origin = ORIGIN_PATH / 'origin.xlsx'
+    target = ORIGIN_PATH / 'пустой.xlsx'
+    origin_wb = load_workbook(origin)
+    target_wb = load_workbook(target)
 
-for sheet_name in reversed(origin_wb.sheetnames):
-    # Удаляем существующий лист, если он есть
-    if sheet_name in target_wb.sheetnames:
-        target_wb.remove(target_wb[sheet_name])
-    # Создаём новый лист в позиции 0 (в начале)
-    dst = target_wb.create_sheet(title=sheet_name, index=0)
-    src = origin_wb[sheet_name]
-    copy_sheet(src, dst)
+    styles = StyleCache()
+    for sheet_name in reversed(origin_wb.sheetnames):
+        # Удаляем существующий лист, если он есть
+        if sheet_name in target_wb.sheetnames:
+            target_wb.remove(target_wb[sheet_name])
+        # Создаём новый лист в позиции 0 (в начале)
+        dst = target_wb.create_sheet(title=sheet_name, index=0)
+        src = origin_wb[sheet_name]
+        copy_sheet(src, dst, styles)
 
-# Optionally remove the default 'Sheet' if it's empty and not in origin
-if 'Sheet' in target_wb.sheetnames and 'Sheet' not in origin_wb.sheetnames:
-    target_wb.remove(target_wb['Sheet'])
+    # Optionally remove the default 'Sheet' if it's empty and not in origin
+    if 'Sheet' in target_wb.sheetnames and 'Sheet' not in origin_wb.sheetnames:
+        target_wb.remove(target_wb['Sheet'])
 
-# Save changes
-timestamp = str(int(time()))
-tmp = SAVE_PATH / timestamp
-tmp.mkdir()
+    # Save changes
+    timestamp = str(int(time()))
+    tmp = SAVE_PATH / timestamp
+    tmp.mkdir(parents=True)
 
-target_wb.save(tmp / f'target_{target.name}')
+    target_wb.save(tmp / f'target_{target.name}')
@@ -0,0 +1,309 @@
+"""
+Потоковая запись документа Word без модели python-docx.
+
+word/document.xml читается по частям (XMLPullParser), элементы тела —
+абзацы и таблицы верхнего уровня — по одному отдаются обработчику
+и сразу пишутся в новый архив, после чего освобождаются. В памяти
+одновременно один элемент тела (самая большая таблица) и готовые части
+архива, а не весь документ с колонтитулами, примечаниями и объектами
+python-docx. Остальные части пакета копируются сжатыми байтами
+исходника (package_writer).
+"""
+from __future__ import annotations
+
+import posixpath
+import re
+import tomllib
+import zipfile
+from functools import cached_property
+from io import BytesIO
+from typing import IO, TYPE_CHECKING, Callable, Iterable, Iterator, Literal
+from xml.sax.saxutils import escape
+
+from pydantic import BaseModel
+
+from package_writer import PackageWriter
+from sources import Source, open_source
+
+# lxml и python-docx подгружаются при первой обработке документа
+if TYPE_CHECKING:
+    from lxml import etree
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+REL_TYPES = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/"
+OFFICE_DOCUMENT_REL = REL_TYPES + "officeDocument"
+STYLES_REL = REL_TYPES + "styles"
+DOCUMENT = "word/document.xml"
+# сколько байт document.xml распаковывается и разбирается за шаг
+CHUNK = 1 << 16
+# сколько последних байт document.xml хранится, чтобы скопировать конец после </w:body>
+TAIL = 4096
+
+_BODY = re.compile(rb"<((?:[\w.-]+:)?)body\b[^>]*>")
+_XMLNS = re.compile(rb'\sxmlns(?::([\w.-]+))?="([^"]*)"')
+
+# элемент тела -> что записать вместо него: элементы или готовый XML; None — оставить как есть
+Replace = Callable[["etree._Element"], "Iterable[etree._Element | str] | None"]
+
+
+class DocxConfig(BaseModel):
+    # stream — потоковая запись document.xml (docx_stream), python-docx — через модель документа
+    engine: Literal["stream", "python-docx"] = "stream"
+
+
+def load_config() -> DocxConfig:
+    try:
+        with open("config.toml", "rb") as f:
+            return DocxConfig.model_validate(tomllib.load(f).get("docx", {}))
+    except FileNotFoundError:
+        return DocxConfig()
+
+
+def w(tag: str) -> str:
+    return f"{{{W_NS}}}{tag}"
+
+
+class DocxRewriter:
+    """
+    Документ Word для потоковой замены элементов тела.
+
+        with DocxRewriter(word) as docx:
+            width = docx.section_width()
+            buffer = docx.rewrite(replace, needle="_ВСТАВКА_")
+
+    replace получает элементы тела, в тексте которых есть needle,
+    уже разобранные парсером python-docx (работают Paragraph, _Cell,
+    Table без Document), и возвращает, что записать на их место.
+    """
+
+    def __init__(self, source: Source) -> None:
+        self.zip = zipfile.ZipFile(open_source(source))
+        self._style_ids: dict[str, str | None] = {}
+
+    def close(self) -> None:
+        self.zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- части пакета ---
+
+    def _rels(self, part: str) -> dict[str, str]:
+        """Тип связи -> путь части в архиве для связей part ("" — связи пакета)."""
+        from lxml import etree
+
+        folder, name = posixpath.split(part)
+        rels = posixpath.join(folder, "_rels", f"{name}.rels")
+        if rels not in self.zip.namelist():
+            return {}
+        targets = {}
+        for rel in etree.fromstring(self.zip.read(rels)).iter(f"{{{PKG_REL_NS}}}Relationship"):
+            if rel.get("TargetMode") == "External":
+                continue
+            target = rel.get("Target")
+            if target.startswith("/"):
+                path = target.lstrip("/")
+            else:
+                path = posixpath.normpath(posixpath.join(folder, target))
+            targets.setdefault(rel.get("Type"), path)
+        return targets
+
+    @cached_property
+    def document_part(self) -> str:
+        return self._rels("").get(OFFICE_DOCUMENT_REL, DOCUMENT)
+
+    @cached_property
+    def _styles(self):
+        from docx.oxml import parse_xml
+        from docx.styles.styles import Styles
+
+        part = self._rels(self.document_part).get(STYLES_REL)
+        return None if part is None else Styles(parse_xml(self.zip.read(part)))
+
+    def style_id(self, name: str) -> str | None:
+        """
+        Идентификатор стиля таблицы по имени, как у part.get_style_id: None — стиль
+        по умолчанию, нет такого стиля — ошибка. В документе без styles.xml стиль
+        не задаётся (python-docx в этом случае добавил бы свои стили).
+        """
+        from docx.enum.style import WD_STYLE_TYPE
+
+        if self._styles is None:
+            return None
+        # поиск по имени — обход всех стилей; таблиц в документе может быть сотни
+        if name not in self._style_ids:
+            self._style_ids[name] = self._styles.get_style_id(name, WD_STYLE_TYPE.TABLE)
+        return self._style_ids[name]
+
+    # --- тело документа ---
+
+    def iter_body(self) -> Iterator[etree._Element]:
+        """
+        Элементы тела по порядку. Элемент действителен только до следующего
+        шага: после него он очищается.
+        """
+        from lxml import etree
+
+        parser = etree.XMLPullParser(resolve_entities=False, huge_tree=True)
+        body = previous = None
+        with self.zip.open(self.document_part) as f:
+            while chunk := f.read(CHUNK):
+                parser.feed(chunk)
+                for _, el in parser.read_events():
+                    parent = el.getparent()
+                    if parent is None or parent.tag != w("body"):
+                        continue
+                    body = parent
+                    yield el
+                    if previous is not None:
+                        previous.clear()
+                        body.remove(previous)
+                    previous = el
+            parser.close()
+
+    def section_width(self) -> int:
+        """
+        Ширина текста первого раздела (страница без полей), EMU, как
+        document.sections[0] у python-docx. Первый sectPr обычно в конце
+        тела, поэтому document.xml читается отдельным проходом.
+        """
+        from docx.oxml import parse_xml
+        from lxml import etree
+
+        for el in self.iter_body():
+            if el.tag == w("sectPr"):
+                sect = el
+            elif el.tag == w("p"):
+                sect = el.find(f"{w('pPr')}/{w('sectPr')}")
+            else:
+                sect = None
+            if sect is None:
+                continue
+            sect = parse_xml(etree.tostring(sect))
+            if None in (sect.page_width, sect.left_margin, sect.right_margin):
+                raise ValueError("В первом разделе документа не заданы размеры страницы или поля")
+            return sect.page_width - sect.left_margin - sect.right_margin
+        raise ValueError("В документе нет разделов (w:sectPr)")
+
+    def rewrite(self, replace: Replace, needle: str | None = None) -> BytesIO:
+        """
+        Новый docx: элементы тела, которые replace заменил, и остальное
+        без изменений. Части кроме document.xml копируются без пересжатия.
+        """
+        with PackageWriter(self.zip) as out:
+            for info in self.zip.infolist():
+                if info.filename != self.document_part:
+                    out.copy(info)
+                    continue
+                # дата исходной записи; размеры запишет zipfile
+                with self.zip.open(info) as src, out.open(info) as dst:
+                    self._rewrite_document(src, dst, replace, needle)
+        return out.buffer
+
+    def _rewrite_document(self, src: IO[bytes], dst: IO[bytes], replace: Replace, needle: str | None) -> None:
+        """
+        Начало документа до `<w:body>` и конец после `</w:body>` копируются
+        байтами исходника (объявление, пространства имён, фон страницы);
+        элементы тела сериализуются по одному.
+        """
+        from docx.oxml import parse_xml
+        from lxml import etree
+
+        head = b""
+        while (m := _BODY.search(head)) is None:
+            chunk = src.read(CHUNK)
+            if not chunk:
+                raise ValueError(f"В {self.document_part} нет w:body")
+            head += chunk
+        if m.group(0).endswith(b"/>"):
+            # пустое тело — менять нечего
+            dst.write(head + src.read())
+            return
+        dst.write(head[: m.end()])
+        close = b"</" + m.group(1) + b"body>"
+
+        parser = etree.XMLPullParser(resolve_entities=False, huge_tree=True)
+        declared: frozenset[tuple[bytes, bytes]] = frozenset()
+        body = previous = None
+        started = False
+        # конец исходника: из него берётся всё начиная с </w:body>
+        window = b""
+
+        def serialize(node, with_tail: bool = True) -> bytes:
+            data = etree.tostring(node, encoding="UTF-8", xml_declaration=False, with_tail=with_tail)
+            return _unqualified(data, declared)
+
+        def write_pending(stop=None) -> None:
+            """Ещё не записанные узлы тела до stop: комментарии, инструкции, пробелы."""
+            nonlocal started
+            if not started:
+                started = True
+                if body.text:
+                    dst.write(escape(body.text).encode())
+            for node in body:
+                if node is stop:
+                    break
+                if node is not previous:
+                    dst.write(serialize(node))
+
+        data = head
+        while data:
+            window = (window + data)[-TAIL:]
+            parser.feed(data)
+            for _, el in parser.read_events():
+                if el.tag == w("body"):
+                    body = el
+                    write_pending()
+                    continue
+                parent = el.getparent()
+                if parent is None or parent.tag != w("body"):
+                    continue
+                if body is None:
+                    body = parent
+                    # пространства имён, объявленные в начале документа (оно скопировано как есть)
+                    declared = frozenset(
+                        ((prefix or "").encode(), uri.encode()) for prefix, uri in body.nsmap.items()
+                    )
+                write_pending(el)
+                new = None
+                if needle is None or needle in "".join(el.itertext()):
+                    new = replace(parse_xml(etree.tostring(el, with_tail=False)))
+                if new is None:
+                    dst.write(serialize(el))
+                else:
+                    for item in new:
+                        dst.write(
+                            _unqualified(item.encode(), declared) if isinstance(item, str)
+                            else serialize(item, with_tail=False)
+                        )
+                    if el.tail:
+                        dst.write(escape(el.tail).encode())
+                # записанное больше не нужно
+                el.clear(keep_tail=False)
+                while el.getprevious() is not None:
+                    del body[0]
+                previous = el
+            data = src.read(CHUNK)
+        parser.close()
+        end = window.rfind(close)
+        if end < 0:
+            raise ValueError(f"В {self.document_part} нет закрывающего {close.decode()}")
+        dst.write(window[end:])
+
+
+def _unqualified(data: bytes, declared: frozenset[tuple[bytes, bytes]]) -> bytes:
+    """
+    Без объявлений пространств имён, которые уже есть у корня документа:
+    lxml повторяет их у каждого отдельно сериализованного элемента.
+    """
+    if not data.startswith(b"<") or data.startswith((b"<!", b"<?")):
+        return data
+    end = data.index(b">")
+    start = _XMLNS.sub(
+        lambda m: b"" if ((m.group(1) or b""), m.group(2)) in declared else m.group(0), data[:end]
+    )
+    return start + data[end:]
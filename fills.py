@@ -0,0 +1,120 @@
+from pathlib import Path
+from typing import IO
+
+import polars as pl
+from lxml import etree
+from openpyxl.styles.colors import COLOR_INDEX
+
+from xlsx_stream import XlsxReader, q
+
+YELLOW = "FFFF00"
+OSV_SHEET = "Приложение_ОСВ"
+DRAWING_NS = "http://schemas.openxmlformats.org/drawingml/2006/main"
+# порядок цветов темы в индексах Excel: lt1 и dk1 (lt2 и dk2) переставлены
+THEME_ORDER = (
+    "lt1", "dk1", "lt2", "dk2",
+    "accent1", "accent2", "accent3", "accent4", "accent5", "accent6",
+    "hlink", "folHlink",
+)
+
+
+def _theme_colors(reader: XlsxReader) -> list[str]:
+    theme = next((n for n in reader.zip.namelist() if n.startswith("xl/theme/")), None)
+    if theme is None:
+        return []
+    root = etree.fromstring(reader.zip.read(theme))
+    scheme = root.find(f".//{{{DRAWING_NS}}}clrScheme")
+    if scheme is None:
+        return []
+    colors = []
+    for name in THEME_ORDER:
+        node = scheme.find(f"{{{DRAWING_NS}}}{name}")
+        value = None
+        if node is not None and len(node):
+            clr = node[0]
+            value = clr.get("val") if clr.tag.endswith("srgbClr") else clr.get("lastClr")
+        colors.append((value or "").upper())
+    return colors
+
+
+def _palette(reader: XlsxReader) -> list[str]:
+    custom = reader.styles.find(f"{q('colors')}/{q('indexedColors')}")
+    if custom is None:
+        return list(COLOR_INDEX)
+    return [c.get("rgb", "") for c in custom.iter(q("rgbColor"))]
+
+
+def _rgb(color, palette: list[str], theme: list[str]) -> str:
+    """RGB цвета `fgColor` (rgb, indexed или theme); пусто, если цвет с оттенком (tint)."""
+    if color is None or float(color.get("tint", 0)):
+        return ""
+    if color.get("rgb"):
+        return color.get("rgb").upper()[-6:]
+    if color.get("indexed") is not None:
+        idx = int(color.get("indexed"))
+        return palette[idx].upper()[-6:] if idx < len(palette) else ""
+    if color.get("theme") is not None:
+        idx = int(color.get("theme"))
+        return theme[idx][-6:] if idx < len(theme) else ""
+    return ""
+
+
+def yellow_style_ids(reader: XlsxReader) -> frozenset[int]:
+    """
+    Номера cellXfs со сплошной жёлтой (#FFFF00) заливкой.
+
+    Цвет может быть задан явно, через indexed-палитру (стандартную или
+    из styles.xml) или цветом темы; цвета с tint жёлтыми не считаются.
+    """
+    palette, theme = _palette(reader), _theme_colors(reader)
+    fills = reader.styles.find(q("fills"))
+    yellow_fills = set()
+    for i, fill in enumerate(() if fills is None else fills.iterchildren(q("fill"))):
+        pattern = fill.find(q("patternFill"))
+        if pattern is None or pattern.get("patternType") != "solid":
+            continue
+        if _rgb(pattern.find(q("fgColor")), palette, theme) == YELLOW:
+            yellow_fills.add(i)
+    return frozenset(
+        i for i, xf in enumerate(reader.cell_xfs) if int(xf.get("fillId", 0)) in yellow_fills
+    )
+
+
+def read_yellow_rows(
+    source: str | Path | bytes | IO[bytes], sheet_name: str = OSV_SHEET, min_row: int = 2
+) -> pl.DataFrame:
+    """
+    Строки листа ОСВ, где есть ячейка с жёлтой заливкой:
+    лист (ячейка слева), лицевой счёт (сама ячейка), наименование (справа).
+
+    styles.xml разбирается один раз, дальше у ячеек проверяется только
+    атрибут `s`. Лист читается потоком; общие строки подгружаются
+    в конце и только те, что попали в результат.
+    """
+    columns = ("лист", "Лицевой счет", "Наименование счета")
+    with XlsxReader(source) as reader:
+        # сравниваем сырые значения атрибута s, без разбора каждой ячейки
+        yellow = {str(i) for i in yellow_style_ids(reader)}
+        cell_tag = q("c")
+        found = []
+        if yellow:
+            for row_idx, row in reader.iter_row_elements(sheet_name):
+                if row_idx < min_row:
+                    continue
+                for i, c in enumerate(row.iterchildren(cell_tag)):
+                    if c.get("s") not in yellow:
+                        continue
+                    cells = reader.read_cells(row)
+                    col = cells[i].col
+                    by_col = {cell.col: cell for cell in cells[max(i - 1, 0) : i + 2]}
+                    found.append(tuple(by_col.get(col + d) for d in (-1, 0, 1)))
+                    break  # эту строку уже отметили, идём дальше
+        wanted = {
+            int(c.value) for row in found for c in row if c is not None and c.type == "s"
+        }
+        strings = reader.shared_strings(wanted) if wanted else {}
+        data = {
+            name: [str(reader.value(row[k], strings)) for row in found]
+            for k, name in enumerate(columns)
+        }
+    return pl.DataFrame(data, schema={name: pl.String for name in columns})
@@ -0,0 +1,128 @@
+from typing import Sequence
+
+import polars as pl
+
+from spans import span
+
+THOUSANDS_SEP = " "
+DECIMAL_SEP = ","
+
+
+def _group_thousands(digits: pl.Expr) -> pl.Expr:
+    # в regex polars нет lookahead: разворачиваем строку,
+    # режем по три цифры и разворачиваем обратно
+    return (
+        digits.str.reverse()
+        .str.replace_all(r"(\d{3})", "${1}" + THOUSANDS_SEP)
+        .str.strip_chars_end(THOUSANDS_SEP)
+        .str.reverse()
+    )
+
+
+def _format_number_text(text: pl.Expr) -> pl.Expr:
+    """
+    '-1234567.125' -> '-1 234 567,125'.
+    Экспоненциальная запись разрядами не делится, как у humanize.intcomma.
+    """
+    sign = text.str.extract(r"^(-?)", 1)
+    int_part = text.str.extract(r"^-?(\d+)", 1)
+    frac = text.str.extract(r"\.(\d+)$", 1)
+    grouped = pl.concat_str(
+        [
+            sign,
+            _group_thousands(int_part),
+            pl.when(frac.is_not_null())
+            .then(pl.concat_str([pl.lit(DECIMAL_SEP), frac]))
+            .otherwise(pl.lit("")),
+        ]
+    )
+    return (
+        pl.when(text.str.contains(r"^-?\d+(\.\d+)?$"))
+        .then(grouped)
+        .otherwise(
+            # экспонента как в str(float): не меньше двух цифр (1e-07)
+            text.str.replace(r"e([+-])(\d)$", "e${1}0${2}").str.replace(
+                ".", DECIMAL_SEP, literal=True
+            )
+        )
+    )
+
+
+def _not_finite(value: pl.Expr) -> pl.Expr:
+    """inf и NaN как у humanize.intcomma: '+Inf', '-Inf', 'NaN'; для конечных — null."""
+    return (
+        pl.when(value.is_nan())
+        .then(pl.lit("NaN"))
+        .when(value.is_infinite())
+        .then(pl.when(value > 0).then(pl.lit("+Inf")).otherwise(pl.lit("-Inf")))
+    )
+
+
+def format_number(expr: pl.Expr, dtype: pl.DataType, decimals: int | None = None) -> pl.Expr:
+    """
+    Числовой столбец как текст отчёта: пробел между разрядами, запятая
+    в дробной части, округление дробных до decimals знаков.
+
+    Для строковых столбцов (листы, прочитанные с infer_schema_length=0,
+    или столбцы с числами вперемешку с текстом) числа распознаются так же,
+    как это делал humanize.intcomma: целые, дробные с точкой, inf/NaN;
+    остальной текст возвращается как есть. Как и раньше, такие числа
+    не округляются.
+    """
+    if dtype.is_float():
+        if decimals is not None:
+            expr = expr.round(decimals)
+        return pl.coalesce(_not_finite(expr), _format_number_text(expr.cast(pl.String)))
+    if dtype.is_integer():
+        return _format_number_text(expr.cast(pl.String))
+    if dtype == pl.String:
+        text = expr.str.strip_chars()
+        cleaned = text.str.replace_all(",", "", literal=True)
+        as_int = cleaned.cast(pl.Int64, strict=False)
+        as_float = cleaned.cast(pl.Float64, strict=False)
+        return (
+            pl.when(cleaned.str.contains(r"^[+-]?\d+$") & as_int.is_not_null())
+            .then(_format_number_text(as_int.cast(pl.String)))
+            .when(as_float.is_not_null() & ~as_float.is_finite())
+            .then(_not_finite(as_float))
+            .when(cleaned.str.contains(".", literal=True) & as_float.is_not_null())
+            .then(_format_number_text(as_float.cast(pl.String)))
+            .otherwise(text)
+        )
+    return format_text(expr, dtype)
+
+
+def format_text(expr: pl.Expr, dtype: pl.DataType) -> pl.Expr:
+    """Нечисловой столбец как текст: str(value).strip()."""
+    if dtype == pl.Boolean:
+        return pl.when(expr).then(pl.lit("True")).when(~expr).then(pl.lit("False"))
+    if dtype == pl.Datetime:
+        return expr.dt.to_string("%Y-%m-%d %H:%M:%S")
+    return expr.cast(pl.String).str.strip_chars()
+
+
+def format_numbers(
+    df: pl.DataFrame,
+    decimals: int | None = None,
+    columns: Sequence[str] | None = None,
+    null_value: str = "",
+) -> pl.DataFrame:
+    """
+    Все столбцы df как готовый текст ячеек.
+
+    columns — столбцы, которые форматируются как числа (по умолчанию все);
+    остальные переводятся в текст без изменений. Пустые значения
+    заменяются на null_value.
+    """
+    numeric = set(df.columns if columns is None else columns)
+    with span("format_numbers", rows=df.height, columns=df.width):
+        return df.select(
+            (
+                format_number(pl.col(name), dtype, decimals)
+                if name in numeric
+                else format_text(pl.col(name), dtype)
+            )
+            .fill_null(null_value)
+            .alias(name)
+            for name, dtype in df.schema.items()
+        )
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tomllib
+from pathlib import Path
+from tempfile import mkdtemp
+from typing import TYPE_CHECKING, Callable
+
+from pydantic import BaseModel
+
+if TYPE_CHECKING:
+    import polars as pl
+
+# меняется вместе с раскладкой файлов в записи кэша
+CACHE_VERSION = 1
+MANIFEST = "frames.json"
+
+
+class FrameCacheConfig(BaseModel):
+    # папка кэша разобранных листов
+    directory: Path = Path("cache") / "frames"
+    # предел размера кэша на диске, МБ; 0 — кэш выключен
+    size_mb: int = 512
+
+
+class FrameCache:
+    """
+    Кэш разобранных листов Excel и производных таблиц на диске.
+
+    Запись — папка с файлами Arrow IPC (по одному на таблицу) и списком
+    таблиц в frames.json. Ключ — хеш содержимого книги, имя читателя
+    и его параметры, поэтому повторная задача с той же книгой берёт
+    таблицы из кэша. Файлы не сжаты и открываются через memory map:
+    чтение не зависит от размера исходной книги. Сверх size_mb
+    удаляются записи, которые дольше всего не читались (LRU по mtime
+    frames.json).
+    """
+
+    def __init__(self, config: FrameCacheConfig | None = None) -> None:
+        self.config = config or FrameCacheConfig()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.size_mb > 0
+
+    def frames(
+        self,
+        data: bytes,
+        reader: str,
+        options: dict,
+        load: Callable[[], dict[str, pl.DataFrame]],
+        digest: str | None = None,
+    ) -> dict[str, pl.DataFrame]:
+        """
+        Таблицы книги data, прочитанные reader с options; при промахе — load() и запись в кэш.
+        digest — готовый sha256 data, если книга читается по частям несколькими вызовами.
+        """
+        if not self.enabled:
+            return load()
+        key = self.key(data, reader, options, digest)
+        frames = self._read(key)
+        if frames is not None:
+            self.hits += 1
+            return frames
+        self.misses += 1
+        frames = load()
+        self._write(key, frames)
+        self.evict()
+        return frames
+
+    def key(self, data: bytes, reader: str, options: dict, digest: str | None = None) -> str:
+        import polars as pl
+
+        digest = digest or hashlib.sha256(data).hexdigest()
+        # версия polars входит в ключ: от неё зависят типы и разбор значений
+        params = json.dumps(
+            [CACHE_VERSION, pl.__version__, reader, options], sort_keys=True, default=str
+        )
+        return f"{digest[:32]}_{hashlib.sha256(params.encode()).hexdigest()[:8]}"
+
+    def _read(self, key: str) -> dict[str, pl.DataFrame] | None:
+        import polars as pl
+
+        entry = self.config.directory / key
+        manifest = entry / MANIFEST
+        try:
+            names = json.loads(manifest.read_text(encoding="utf-8"))
+            # несжатый IPC с диска polars читает через memory map
+            frames = {
+                name: pl.read_ipc(entry / f"{i}.arrow")
+                for i, name in enumerate(names)
+            }
+        except (OSError, ValueError, pl.exceptions.PolarsError):
+            return None
+        # время последнего чтения — для вытеснения
+        os.utime(manifest)
+        return frames
+
+    def _write(self, key: str, frames: dict[str, pl.DataFrame]) -> None:
+        self.config.directory.mkdir(parents=True, exist_ok=True)
+        # запись собирается во временной папке и появляется целиком
+        tmp = Path(mkdtemp(prefix=f".{key}_", dir=self.config.directory))
+        try:
+            for i, df in enumerate(frames.values()):
+                df.write_ipc(tmp / f"{i}.arrow", compression="uncompressed")
+            (tmp / MANIFEST).write_text(
+                json.dumps(list(frames), ensure_ascii=False), encoding="utf-8"
+            )
+            tmp.rename(self.config.directory / key)
+        except OSError:
+            # ту же книгу уже записал другой процесс
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def usage(self) -> list[tuple[float, int, Path]]:
+        """Записи кэша: (время последнего чтения, размер в байтах, папка)."""
+        entries = []
+        if not self.config.directory.is_dir():
+            return entries
+        for entry in self.config.directory.iterdir():
+            if entry.name.startswith("."):
+                # запись, которую сейчас собирает другой процесс
+                continue
+            manifest = entry / MANIFEST
+            try:
+                # недоудалённая запись без frames.json уходит первой
+                used = manifest.stat().st_mtime if manifest.is_file() else 0.0
+                size = sum(f.stat().st_size for f in entry.iterdir())
+            except OSError:
+                # запись удалил другой процесс
+                continue
+            entries.append((used, size, entry))
+        return entries
+
+    def evict(self) -> None:
+        """Удаление давно не читавшихся записей, пока кэш больше size_mb."""
+        entries = sorted(self.usage())
+        total = sum(size for _, size, _ in entries)
+        limit = self.config.size_mb << 20
+        for _, size, entry in entries:
+            if total <= limit:
+                break
+            # файл, открытый через memory map в другой задаче, удалится позже
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def __repr__(self) -> str:
+        return f"FrameCache(directory={str(self.config.directory)!r}, hits={self.hits}, misses={self.misses})"
+
+
+_cache: FrameCache | None = None
+
+
+def frame_cache() -> FrameCache:
+    """Кэш листов процесса; настройки — секция [frames] в config.toml."""
+    global _cache
+    if _cache is None:
+        try:
+            with open("config.toml", "rb") as f:
+                section = tomllib.load(f).get("frames", {})
+        except FileNotFoundError:
+            section = {}
+        _cache = FrameCache(FrameCacheConfig.model_validate(section))
+    return _cache
@@ -0,0 +1,160 @@
+import multiprocessing
+import threading
+import tomllib
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from pydantic import BaseModel
+
+from package_writer import compression_level, package_config
+from spans import job_trace
+
+# задачи, которые умеет выполнять исполнитель (аргументы: word/origin, excel/target)
+PIPELINES = ("make_word", "excel2word_insert", "copy_ws", "insert_tables_with_filter")
+
+
+class JobsConfig(BaseModel):
+    # одновременно выполняемых задач (процессов-исполнителей)
+    workers: int = 2
+    # задач, ожидающих свободного исполнителя; сверх этого новые отклоняются
+    queue_size: int = 8
+    # сколько секунд новая задача ждёт места в очереди
+    queue_timeout: float = 0
+
+
+class JobQueueFull(RuntimeError):
+    pass
+
+
+def init_worker() -> None:
+    """Тяжёлые импорты один раз при старте процесса, а не в первой задаче."""
+    import docx  # noqa: F401
+    import openpyxl  # noqa: F401
+    import polars  # noqa: F401
+
+    import process  # noqa: F401
+    import task_four  # noqa: F401
+
+
+def _ping() -> None:
+    pass
+
+
+def run_job(pipeline: str, *args) -> tuple[str | None, str]:
+    """
+    Выполнение одной задачи в процессе-исполнителе.
+    У каждой задачи свой Processor: между задачами ничего не разделяется.
+    Возвращает путь к результату и сводку времени по этапам.
+    """
+    if pipeline not in PIPELINES:
+        raise ValueError(f"Неизвестная задача: {pipeline}")
+    files = [None if a is None else Path(a).name for a in args]
+    # пользователь интерфейса ждёт файл: быстрое сжатие
+    with job_trace(pipeline, files=files) as trace, compression_level(package_config().interactive_level):
+        if pipeline == "insert_tables_with_filter":
+            from task_four import insert_tables_with_filter
+
+            result = insert_tables_with_filter(*args)
+        else:
+            from process import Processor
+
+            result = getattr(Processor(), pipeline)(*args)
+    return result, trace.summary()
+
+
+class JobRunner:
+    """
+    Выполнение задач интерфейса в пуле процессов.
+
+    Одновременно выполняется не больше workers задач, ещё queue_size
+    ждут в очереди; если очередь полна дольше queue_timeout секунд,
+    задача отклоняется с JobQueueFull. Процессы запускаются заранее
+    (prewarm) и уже держат в памяти polars, python-docx и openpyxl.
+    """
+
+    def __init__(self, config: JobsConfig | None = None) -> None:
+        if config is None:
+            with open("config.toml", "rb") as f:
+                config = JobsConfig.model_validate(tomllib.load(f).get("jobs", {}))
+        self.config = config
+        self._slots = threading.BoundedSemaphore(config.workers + config.queue_size)
+        self._lock = threading.Lock()
+        self._pool = self._new_pool()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # spawn: процесс приложения уже многопоточный (gradio, polars)
+        return ProcessPoolExecutor(
+            self.config.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+        )
+
+    def prewarm(self) -> None:
+        """Запустить все процессы-исполнители сейчас, до первой задачи."""
+        for future in self._start_workers(self._pool):
+            future.result()
+
+    def _start_workers(self, pool: ProcessPoolExecutor) -> list[Future]:
+        return [pool.submit(_ping) for _ in range(self.config.workers)]
+
+    def submit(self, pipeline: str, *args) -> Future:
+        return self._submit(pipeline, *args)[1]
+
+    def _submit(self, pipeline: str, *args) -> tuple[ProcessPoolExecutor, Future]:
+        """Задача в пул; вместе с ней — пул, в который она попала."""
+        timeout = self.config.queue_timeout
+        if timeout > 0:
+            acquired = self._slots.acquire(timeout=timeout)
+        else:
+            acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            raise JobQueueFull("Сервер занят: слишком много задач в очереди, попробуйте позже.")
+        try:
+            with self._lock:
+                pool = self._pool
+                try:
+                    future = pool.submit(run_job, pipeline, *args)
+                except BrokenProcessPool:
+                    # пул сломался, а задача, которая его заменит, ещё не дошла до run
+                    pool = self._replace(pool)
+                    future = pool.submit(run_job, pipeline, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return pool, future
+
+    def run(self, pipeline: str, *args) -> tuple[str | None, str]:
+        """Выполнить задачу и дождаться результата: путь к готовому файлу и сводка времени."""
+        pool, future = self._submit(pipeline, *args)
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            # исполнитель упал (например, нехватка памяти) — пул пересоздаётся;
+            # одно падение обрывает все задачи пула, но заменяет его только первая:
+            # остальные не трогают новый пул с задачами, поставленными уже в него
+            with self._lock:
+                if self._pool is pool:
+                    self._replace(pool)
+            raise RuntimeError("Процесс обработки аварийно завершился, попробуйте ещё раз.")
+
+    def _replace(self, broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        """Новый пул вместо сломанного; вызывается под _lock."""
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._pool = self._new_pool()
+        # процессы запускаются сразу; задача, заменившая пул, их не ждёт
+        self._start_workers(self._pool)
+        return self._pool
+
+    def handler(self, pipeline: str):
+        """Функция для gr.Button.click: аргументы — файлы из интерфейса."""
+
+        def handle(*files):
+            return self.run(pipeline, *(None if f is None else str(f) for f in files))
+
+        handle.__name__ = pipeline
+        return handle
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(cancel_futures=True)
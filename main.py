@@ -1,74 +1,133 @@
-import gradio as gr
-from process import Processor
-
-
-with gr.Blocks() as app:
-    with gr.Tabs():
-        with gr.TabItem("РД_Влияние СПОД"):
-            excel_input = gr.File(label="Загрузите Excel файл (.xlsx)", file_types=[".xlsx"])
-            word_input = gr.File(label="Загрузите Word файл (.docx)", file_types=[".docx"])
-            process_button = gr.Button("Запустить процесс")
-            download_output = gr.File(label="Скачать обработанный файл")
-
-            process_button.click(
-                Processor().make_word,
-                inputs=[
-                    word_input,
-                    excel_input
-                ],
-                outputs=[download_output],
-            )
-        with gr.TabItem("РД планирование"):
-            origin_input = gr.File(label="Откуда (.xlsx)", file_types=[".xlsx"])
-            target_input = gr.File(label="Куда (.xlsx)", file_types=[".xlsx"])
-            process_button = gr.Button("Запустить процесс")
-            download_output = gr.File(label="Скачать обработанный файл")
-
-            process_button.click(
-                Processor().copy_ws,
-                inputs=[
-                    origin_input,
-                    target_input
-                ],
-                outputs=[download_output],
-            )
-        with gr.TabItem("Запрос 3"):
-            gr.Markdown("""
-            `_ВСТАВКА_` - маркер, который будет искаться в ячейках таблиц
-            """)
-            excel_input = gr.File(label="Загрузите Excel файл (.xlsx)", file_types=[".xlsx"])
-            word_input = gr.File(label="Загрузите Word файл (.docx)", file_types=[".docx"])
-            process_button = gr.Button("Запустить процесс")
-            download_output = gr.File(label="Скачать обработанный файл")
-
-            process_button.click(
-                Processor().excel2word_insert,
-                inputs=[
-                    word_input,
-                    excel_input
-                ],
-                outputs=[download_output],
-            )
-        with gr.TabItem("Таблицы для отчета"):
-            from task_four import insert_tables_with_filter
-            gr.Markdown("""
-            `_ВСТАВКА_` - маркер, на место которого вставят таблицу
-            """)
-            excel_input = gr.File(label="Загрузите Excel файл (.xlsx)", file_types=[".xlsx"])
-            word_input = gr.File(label="Загрузите Word файл (.docx)", file_types=[".docx"])
-            process_button = gr.Button("Запустить процесс")
-            download_output = gr.File(label="Скачать обработанный файл")
-
-            process_button.click(
-                insert_tables_with_filter,
-                inputs=[
-                    word_input,
-                    excel_input
-                ],
-                outputs=[download_output],
-            )
+"""
+Интерфейс gradio.
 
+Процессы-исполнители (spawn) заново импортируют этот модуль как
+__mp_main__, поэтому на уровне модуля ничего не создаётся: gradio,
+пул исполнителей и очистка output/ — только в main().
+"""
+from __future__ import annotations
 
+from typing import TYPE_CHECKING
 
-if __name__ == "__main__":
+from jobs import JobQueueFull, JobRunner
+
+if TYPE_CHECKING:
+    from retention import RetentionManager
+
+
+def build_app(runner: JobRunner, retention: RetentionManager):
+    import gradio as gr
+    from humanize import naturalsize
+
+    def job(pipeline: str):
+        run = runner.handler(pipeline)
+
+        def handle(*files):
+            try:
+                result, timing = run(*files)
+            except JobQueueFull as e:
+                raise gr.Error(str(e))
+            if result:
+                # срок хранения в output/ считается от этой выдачи, не от скачивания
+                retention.touch(result)
+            retention.wake()
+            return result, timing
+
+        return handle
+
+    def output_usage() -> str:
+        usage = retention.usage()
+        return f"Результатов на сервере: {usage.jobs}, {naturalsize(usage.bytes, binary=True)}"
+
+    with gr.Blocks() as app:
+        with gr.Tabs():
+            with gr.TabItem("РД_Влияние СПОД"):
+                excel_input = gr.File(label="Загрузите Excel файл (.xlsx)", file_types=[".xlsx"])
+                word_input = gr.File(label="Загрузите Word файл (.docx)", file_types=[".docx"])
+                process_button = gr.Button("Запустить процесс")
+                download_output = gr.File(label="Скачать обработанный файл")
+                timing = gr.Markdown()
+
+                process_button.click(
+                    job("make_word"),
+                    inputs=[
+                        word_input,
+                        excel_input
+                    ],
+                    outputs=[download_output, timing],
+                )
+            with gr.TabItem("РД планирование"):
+                origin_input = gr.File(label="Откуда (.xlsx)", file_types=[".xlsx"])
+                target_input = gr.File(label="Куда (.xlsx)", file_types=[".xlsx"])
+                process_button = gr.Button("Запустить процесс")
+                download_output = gr.File(label="Скачать обработанный файл")
+                timing = gr.Markdown()
+
+                process_button.click(
+                    job("copy_ws"),
+                    inputs=[
+                        origin_input,
+                        target_input
+                    ],
+                    outputs=[download_output, timing],
+                )
+            with gr.TabItem("Запрос 3"):
+                gr.Markdown("""
+                `_ВСТАВКА_` - маркер, который будет искаться в ячейках таблиц
+                """)
+                excel_input = gr.File(label="Загрузите Excel файл (.xlsx)", file_types=[".xlsx"])
+                word_input = gr.File(label="Загрузите Word файл (.docx)", file_types=[".docx"])
+                process_button = gr.Button("Запустить процесс")
+                download_output = gr.File(label="Скачать обработанный файл")
+                timing = gr.Markdown()
+
+                process_button.click(
+                    job("excel2word_insert"),
+                    inputs=[
+                        word_input,
+                        excel_input
+                    ],
+                    outputs=[download_output, timing],
+                )
+            with gr.TabItem("Таблицы для отчета"):
+                gr.Markdown("""
+                `_ВСТАВКА_` - маркер, на место которого вставят таблицу
+                """)
+                excel_input = gr.File(label="Загрузите Excel файл (.xlsx)", file_types=[".xlsx"])
+                word_input = gr.File(label="Загрузите Word файл (.docx)", file_types=[".docx"])
+                process_button = gr.Button("Запустить процесс")
+                download_output = gr.File(label="Скачать обработанный файл")
+                timing = gr.Markdown()
+
+                process_button.click(
+                    job("insert_tables_with_filter"),
+                    inputs=[
+                        word_input,
+                        excel_input
+                    ],
+                    outputs=[download_output, timing],
+                )
+        usage_info = gr.Markdown()
+        app.load(output_usage, outputs=[usage_info])
+
+    return app
+
+
+def main() -> None:
+    from retention import RetentionManager
+
+    # тяжёлая работа идёт в процессах-исполнителях, а не в потоке запроса gradio
+    runner = JobRunner()
+    # старые результаты в output/ удаляются в фоне (секция [retention] в config.toml)
+    retention = RetentionManager()
+    app = build_app(runner, retention)
+    runner.prewarm()
+    retention.start()
+    # очередь gradio пропускает к исполнителям столько запросов, сколько они примут;
+    # остальные отклоняет JobRunner
+    app.queue(default_concurrency_limit=runner.config.workers + runner.config.queue_size)
     app.launch(inbrowser=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import re
+from collections import defaultdict
+from typing import TYPE_CHECKING, Iterator
+
+# python-docx подгружается при первом обходе документа, а не при импорте модуля
+if TYPE_CHECKING:
+    from docx.document import Document as DocumentObject
+    from docx.oxml.xmlchemy import BaseOxmlElement
+    from docx.table import Table, _Cell
+    from docx.text.paragraph import Paragraph
+
+START_PART = "_ВСТАВКА_"
+
+
+class MarkerHit:
+    """
+    Найденный маркер: ячейка (None для абзаца вне таблиц), абзац и таблица.
+
+    Хранит ссылки на xml-элементы, а не номера, поэтому координаты
+    остаются верными после вставки таблиц и удаления строк.
+    """
+
+    def __init__(
+        self, key: str, paragraph: Paragraph | None, cell: _Cell | None, table: Table | None
+    ):
+        self.key = key
+        self.paragraph = paragraph
+        self.cell = cell
+        self.table = table
+
+    @property
+    def tr(self):
+        return self.cell._tc.getparent() if self.cell is not None else None
+
+    @property
+    def row(self) -> int | None:
+        if self.table is None:
+            return None
+        return self.table._tbl.tr_lst.index(self.tr)
+
+    @property
+    def col(self) -> int | None:
+        """Номер столбца сетки, как в Table.cell(row, col)."""
+        if self.cell is None:
+            return None
+        col = 0
+        for tc in self.tr.tc_lst:
+            if tc is self.cell._tc:
+                return col
+            col += tc.grid_span
+        return None
+
+    def is_alive(self, body) -> bool:
+        """Элемент маркера всё ещё в документе (строку не удалили, абзац не перезаписали)."""
+        element = self.paragraph._p if self.paragraph is not None else self.cell._tc
+        while element is not None:
+            if element is body:
+                return True
+            element = element.getparent()
+        return False
+
+    def __repr__(self) -> str:
+        return f"MarkerHit({self.key!r}, row={self.row}, col={self.col})"
+
+
+class DocumentMarkerIndex:
+    """
+    Индекс маркеров документа, собранный за один обход.
+
+    Обходит абзацы тела и таблицы тела — как doc.paragraphs и doc.tables:
+    во вложенные таблицы ячеек не заходит. Объединённые по горизонтали
+    ячейки (gridSpan) попадают в индекс один раз.
+    Индексируются:
+      * needles — подстроки текста ячейки ("L6", "Общая сумма СПОД");
+      * абзацы, начинающиеся с prefix (`_ВСТАВКА_…`), по тексту после префикса;
+      * patterns — именованные регулярные выражения по тексту абзацев.
+
+    locations — ранее сохранённые положения маркеров (locations()) того же
+    документа: индекс восстанавливается по ним без обхода и чтения текста.
+    """
+
+    def __init__(
+        self,
+        doc: DocumentObject,
+        needles: tuple[str, ...] = (),
+        patterns: dict[str, re.Pattern | str] | None = None,
+        prefix: str = START_PART,
+        locations: dict | None = None,
+    ) -> None:
+        self.doc = doc
+        self.needles = needles
+        self.patterns = {name: re.compile(p) for name, p in (patterns or {}).items()}
+        self.prefix = prefix
+        self._body = doc.element.body
+        self._needles: dict[str, list[MarkerHit]] = defaultdict(list)
+        self._markers: dict[str, list[MarkerHit]] = defaultdict(list)
+        self._matches: dict[str, list[MarkerHit]] = defaultdict(list)
+        self._ordered: list[MarkerHit] = []
+        if locations is None:
+            self._scan()
+        else:
+            self._restore(locations)
+
+    # --- построение ---
+
+    def _scan(self) -> None:
+        from docx.oxml.ns import qn
+        from docx.table import Table
+        from docx.text.paragraph import Paragraph
+
+        container = self.doc._body
+        for child in self._body.iterchildren(qn("w:p"), qn("w:tbl")):
+            if child.tag == qn("w:p"):
+                self._add_paragraph(Paragraph(child, container), None, None)
+            else:
+                self._scan_table(Table(child, container))
+
+    def _scan_table(self, table: Table) -> None:
+        from docx.oxml.ns import qn
+        from docx.table import _Cell
+        from docx.text.paragraph import Paragraph
+
+        for tr in table._tbl.tr_lst:
+            # tc_lst отдаёт каждую ячейку строки один раз, даже если она объединена
+            for tc in tr.tc_lst:
+                cell = _Cell(tc, table)
+                text = cell.text
+                for needle in self.needles:
+                    if needle in text:
+                        self._needles[needle].append(MarkerHit(needle, None, cell, table))
+                # только абзацы ячейки, как cell.paragraphs: вложенные таблицы не обходятся
+                for p in tc.iterchildren(qn("w:p")):
+                    self._add_paragraph(Paragraph(p, cell), cell, table)
+
+    def _add_paragraph(self, paragraph: Paragraph, cell: _Cell | None, table: Table | None):
+        text = paragraph.text
+        key = _marker_key(text, cell is not None, self.prefix)
+        if key is not None:
+            hit = MarkerHit(key, paragraph, cell, table)
+            self._markers[key].append(hit)
+            self._ordered.append(hit)
+        for name, pattern in self.patterns.items():
+            if pattern.search(text):
+                self._matches[name].append(MarkerHit(name, paragraph, cell, table))
+
+    # --- сохранение положений ---
+
+    def locations(self) -> dict:
+        """
+        Положения всех найденных маркеров (включая использованные) как пути
+        номеров дочерних элементов от тела документа; пригодны для JSON.
+        """
+        return {
+            "needles": {
+                needle: [_path(hit.cell._tc, self._body) for hit in hits]
+                for needle, hits in self._needles.items()
+            },
+            "markers": [[hit.key, _path(hit.paragraph._p, self._body)] for hit in self._ordered],
+            "matches": {
+                name: [_path(hit.paragraph._p, self._body) for hit in hits]
+                for name, hits in self._matches.items()
+            },
+        }
+
+    def _restore(self, locations: dict) -> None:
+        for needle, paths in locations["needles"].items():
+            for path in paths:
+                _, cell, table = self._wrap(path)
+                self._needles[needle].append(MarkerHit(needle, None, cell, table))
+        for key, path in locations["markers"]:
+            hit = MarkerHit(key, *self._wrap(path))
+            self._markers[key].append(hit)
+            self._ordered.append(hit)
+        for name, paths in locations["matches"].items():
+            for path in paths:
+                self._matches[name].append(MarkerHit(name, *self._wrap(path)))
+
+    def _wrap(self, path: list[int]) -> tuple[Paragraph | None, _Cell | None, Table | None]:
+        """Абзац, ячейка и таблица по пути — с теми же родителями, что дал бы обход."""
+        from docx.oxml.ns import qn
+        from docx.table import Table, _Cell
+        from docx.text.paragraph import Paragraph
+
+        container, element = self.doc._body, self._body
+        paragraph = cell = table = None
+        for i in path:
+            element = element[i]
+            if element.tag == qn("w:tbl"):
+                table = Table(element, container)
+            elif element.tag == qn("w:tc"):
+                cell = container = _Cell(element, table)
+            elif element.tag == qn("w:p"):
+                paragraph = Paragraph(element, container)
+        return paragraph, cell, table
+
+    # --- поиск ---
+
+    def first(self, needle: str) -> MarkerHit | None:
+        """Первая ячейка (в порядке документа), текст которой содержит needle."""
+        for hit in self._needles[needle]:
+            if hit.is_alive(self._body) and needle in hit.cell.text:
+                return hit
+        return None
+
+    def marker(self, key: str) -> MarkerHit | None:
+        """Первый ещё не использованный абзац `_ВСТАВКА_<key>`."""
+        for hit in self._markers.get(key, ()):
+            if hit.is_alive(self._body):
+                return hit
+        return None
+
+    def has_marker(self, key: str) -> bool:
+        """Был ли в документе маркер `_ВСТАВКА_<key>` (включая уже использованные)."""
+        return key in self._markers
+
+    def markers(self, in_cells: bool | None = None) -> list[MarkerHit]:
+        """
+        Все живые маркеры `_ВСТАВКА_` в порядке документа.
+        in_cells=True — только в ячейках таблиц, False — только абзацы тела.
+        """
+        return [
+            hit
+            for hit in self._ordered
+            if (in_cells is None or (hit.cell is not None) == in_cells)
+            and hit.is_alive(self._body)
+        ]
+
+    def matches(self, name: str) -> list[MarkerHit]:
+        return [hit for hit in self._matches.get(name, ()) if hit.is_alive(self._body)]
+
+
+def _marker_key(text: str, in_cell: bool, prefix: str) -> str | None:
+    # в ячейках маркер должен стоять в начале абзаца, вне таблиц — после пробелов
+    marker_text = text if in_cell else text.strip()
+    if marker_text.startswith(prefix):
+        return text.strip().removeprefix(prefix)
+    return None
+
+
+def iter_markers(element: BaseOxmlElement, prefix: str = START_PART) -> Iterator[MarkerHit]:
+    """
+    Маркеры `_ВСТАВКА_` в одном элементе тела (абзац или таблица; абзацы
+    ячеек без вложенных таблиц) в порядке документа, по тем же правилам,
+    что у DocumentMarkerIndex. Для обработки документа по частям (docx_stream):
+    у найденных абзацев и ячеек нет part.
+    """
+    from docx.oxml.ns import qn
+    from docx.table import Table, _Cell
+    from docx.text.paragraph import Paragraph
+
+    def paragraph_hit(p, cell, table):
+        paragraph = Paragraph(p, cell)
+        key = _marker_key(paragraph.text, cell is not None, prefix)
+        return None if key is None else MarkerHit(key, paragraph, cell, table)
+
+    if element.tag == qn("w:p"):
+        hit = paragraph_hit(element, None, None)
+        if hit is not None:
+            yield hit
+    elif element.tag == qn("w:tbl"):
+        table = Table(element, None)
+        for tr in element.tr_lst:
+            # tc_lst отдаёт каждую ячейку строки один раз, даже если она объединена
+            for tc in tr.tc_lst:
+                cell = _Cell(tc, table)
+                for p in tc.iterchildren(qn("w:p")):
+                    hit = paragraph_hit(p, cell, table)
+                    if hit is not None:
+                        yield hit
+
+
+def _path(element, body) -> list[int]:
+    path = []
+    while element is not body:
+        parent = element.getparent()
+        path.append(parent.index(element))
+        element = parent
+    return path[::-1]
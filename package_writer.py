@@ -0,0 +1,304 @@
+"""
+Запись пакетов Office (docx, xlsx) без лишнего пересжатия.
+
+Часть, которая не менялась (запись исходного архива или те же байты,
+что в нём), копируется сжатыми байтами исходника — без распаковки
+и повторного сжатия: картинки и колонтитулы шаблона почти ничего не
+стоят. Изменённые части сжимаются в потоках (zlib отпускает GIL)
+с уровнем из секции [package]; задачи интерфейса используют быстрый
+уровень interactive_level.
+
+Копирование сжатых байтов идёт через внутренности zipfile (fp, _lock,
+FileHeader...). Если в этой версии Python их нет, PackageWriter пишет
+обычным ZipFile.writestr: медленнее, но архив тот же по содержимому.
+
+    with PackageWriter(source) as out:
+        out.copy(info)                            # запись исходника как есть
+        out.write("xl/styles.xml", data)          # те же байты, что в source, — тоже копия
+        with out.open("word/document.xml") as f:  # потоком
+            ...
+    buffer = out.buffer
+"""
+from __future__ import annotations
+
+import struct
+import time
+import tomllib
+import zipfile
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from io import BytesIO
+from typing import IO, TYPE_CHECKING, Collection, Iterator, NamedTuple
+
+from pydantic import BaseModel
+
+if TYPE_CHECKING:
+    from docx.document import Document as DocumentObject
+    from docx.opc.part import Part
+
+CONTENT_TYPES = "[Content_Types].xml"
+# непубличные атрибуты ZipFile, без которых сжатые байты не скопировать
+_ZIP_INTERNALS = ("fp", "_lock", "_writecheck", "start_dir", "_didModify")
+
+
+class Entry(NamedTuple):
+    """Запись, готовая к добавлению в архив: заголовок и сжатые данные."""
+
+    info: zipfile.ZipInfo
+    # без доступа к внутренностям zipfile — несжатые данные для writestr
+    payload: bytes
+    # скопирована из исходника без пересжатия
+    copied: bool
+
+
+class PackageConfig(BaseModel):
+    # уровень сжатия изменённых частей (zlib): 1 — быстрее, 9 — меньше файл
+    level: int = 6
+    # уровень для задач из интерфейса: пользователь ждёт файл, скорость важнее размера
+    interactive_level: int = 1
+    # потоков сжатия изменённых частей; 1 — без пула
+    workers: int = 4
+
+
+_config: PackageConfig | None = None
+_level: ContextVar[int | None] = ContextVar("package_level", default=None)
+
+
+def package_config() -> PackageConfig:
+    """Настройки процесса — секция [package] в config.toml."""
+    global _config
+    if _config is None:
+        try:
+            with open("config.toml", "rb") as f:
+                section = tomllib.load(f).get("package", {})
+        except FileNotFoundError:
+            section = {}
+        _config = PackageConfig.model_validate(section)
+    return _config
+
+
+@contextmanager
+def compression_level(level: int) -> Iterator[None]:
+    """Уровень сжатия для всех PackageWriter внутри блока (например, interactive_level)."""
+    token = _level.set(level)
+    try:
+        yield
+    finally:
+        _level.reset(token)
+
+
+class PackageWriter:
+    """
+    Новый zip-пакет в памяти; части пишутся в порядке вызовов.
+
+    source — исходный архив: его записи можно скопировать как есть (copy),
+    а write копирует запись вместо сжатия, если байты совпали (CRC и размер).
+    Сжатие изменённых частей идёт в фоне, запись в архив — по порядку
+    при open() и close().
+    """
+
+    def __init__(
+        self, source: zipfile.ZipFile | None = None, level: int | None = None, workers: int | None = None
+    ) -> None:
+        config = package_config()
+        self.source = source
+        if level is None:
+            level = _level.get()
+        self.level = config.level if level is None else level
+        workers = workers or config.workers
+        self.buffer = BytesIO()
+        self.zip = zipfile.ZipFile(self.buffer, "w", zipfile.ZIP_DEFLATED, compresslevel=self.level)
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="deflate") if workers > 1 else None
+        self._pending: list[Future | Entry] = []
+        self._raw = _raw_access(self.zip) and (source is None or _raw_access(source))
+        # сколько частей скопировано и сколько сжато заново
+        self.copied = 0
+        self.compressed = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self._shutdown()
+            self.zip.close()
+
+    def copy(self, info: zipfile.ZipInfo | str) -> None:
+        """Запись исходного архива без изменений."""
+        if isinstance(info, str):
+            info = self.source.getinfo(info)
+        self._pending.append(self._copy(info))
+
+    def write(self, name: zipfile.ZipInfo | str, data: bytes) -> None:
+        """
+        Часть с содержимым data. ZipInfo задаёт дату и атрибуты записи,
+        по строке они как у zipfile.writestr (текущее время).
+        """
+        if isinstance(name, str):
+            info = zipfile.ZipInfo(name, date_time=time.localtime(time.time())[:6])
+            info.external_attr = 0o600 << 16
+        else:
+            info = _entry(name)
+        original = None
+        if self.source is not None:
+            original = self.source.NameToInfo.get(info.filename)
+            if original is not None and original.file_size != len(data):
+                original = None
+        if self._pool is None:
+            self._pending.append(self._encode(info, data, original))
+        else:
+            self._pending.append(self._pool.submit(self._encode, info, data, original))
+
+    def open(self, name: zipfile.ZipInfo | str) -> IO[bytes]:
+        """Часть, которая пишется потоком (сжимается по мере записи)."""
+        self._flush()
+        info = _entry(name) if isinstance(name, zipfile.ZipInfo) else zipfile.ZipInfo(
+            name, date_time=time.localtime(time.time())[:6]
+        )
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.compress_level = self.level
+        self.compressed += 1
+        return self.zip.open(info, "w")
+
+    def close(self) -> BytesIO:
+        """Дописать отложенные части и закрыть архив; buffer — с начала."""
+        try:
+            self._flush()
+        finally:
+            self._shutdown()
+        self.zip.close()
+        self.buffer.seek(0)
+        return self.buffer
+
+    # --- запись ---
+
+    def _encode(self, info: zipfile.ZipInfo, data: bytes, original: zipfile.ZipInfo | None) -> Entry:
+        """Сжатые байты записи; если data совпадает с записью исходника — её байты."""
+        if not self._raw:
+            info.compress_type = zipfile.ZIP_DEFLATED
+            return Entry(info, data, copied=False)
+        crc = zlib.crc32(data)
+        if original is not None and original.CRC == crc:
+            return self._copy(original, info)
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+        payload = compressor.compress(data) + compressor.flush()
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.CRC = crc
+        info.file_size = len(data)
+        info.compress_size = len(payload)
+        return Entry(info, payload, copied=False)
+
+    def _copy(self, original: zipfile.ZipInfo, info: zipfile.ZipInfo | None = None) -> Entry:
+        """Запись исходника: сжатые данные после её локального заголовка."""
+        info = info or _entry(original)
+        info.compress_type = original.compress_type
+        if not self._raw:
+            return Entry(info, self.source.read(original), copied=False)
+        info.CRC = original.CRC
+        info.file_size = original.file_size
+        info.compress_size = original.compress_size
+        # общий файл архива; тот же замок, что у ZipFile.open
+        with self.source._lock:
+            fp = self.source.fp
+            fp.seek(original.header_offset)
+            header = fp.read(zipfile.sizeFileHeader)
+            if header[:4] != zipfile.stringFileHeader:
+                raise zipfile.BadZipFile(f"Повреждён заголовок записи {original.filename}")
+            name_length, extra_length = struct.unpack("<HH", header[26:30])
+            fp.seek(original.header_offset + zipfile.sizeFileHeader + name_length + extra_length)
+            payload = fp.read(original.compress_size)
+        if len(payload) != original.compress_size:
+            raise zipfile.BadZipFile(f"Обрезаны данные записи {original.filename}")
+        return Entry(info, payload, copied=True)
+
+    def _flush(self) -> None:
+        for item in self._pending:
+            entry = item.result() if isinstance(item, Future) else item
+            self._append(entry.info, entry.payload)
+            if entry.copied:
+                self.copied += 1
+            else:
+                self.compressed += 1
+        self._pending.clear()
+
+    def _append(self, info: zipfile.ZipInfo, payload: bytes) -> None:
+        """Готовые сжатые байты в архив — как ZipFile.writestr, но без сжатия."""
+        out = self.zip
+        if not self._raw:
+            out.writestr(info, payload, compresslevel=self.level)
+            return
+        out._writecheck(info)
+        with out._lock:
+            info.header_offset = out.fp.tell()
+            out.fp.write(info.FileHeader())
+            out.fp.write(payload)
+            out.filelist.append(info)
+            out.NameToInfo[info.filename] = info
+            out.start_dir = out.fp.tell()
+            out._didModify = True
+
+    def _shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+
+def _raw_access(archive: zipfile.ZipFile) -> bool:
+    """Можно ли читать и писать сжатые байты записей archive в обход zipfile."""
+    return (
+        all(hasattr(archive, name) for name in _ZIP_INTERNALS)
+        and hasattr(zipfile.ZipInfo, "FileHeader")
+        and hasattr(zipfile, "sizeFileHeader")
+        and hasattr(zipfile, "stringFileHeader")
+    )
+
+
+def _entry(info: zipfile.ZipInfo) -> zipfile.ZipInfo:
+    """Новая запись с именем, датой и атрибутами info; размеры и CRC заполняются при записи."""
+    entry = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+    entry.external_attr = info.external_attr
+    entry.create_system = info.create_system
+    return entry
+
+
+def save_docx(
+    doc: DocumentObject, source: bytes | None = None, changed: Collection[Part] | None = None
+) -> BytesIO:
+    """
+    Документ python-docx в docx, как Document.save. source — байты
+    исходного docx (шаблона): части с теми же байтами (картинки,
+    вложения) копируются из него без пересжатия.
+
+    changed — части, которые задача могла изменить (обычно только
+    document.xml). Остальные части, что есть в source, копируются
+    вместе с их связями без сериализации: python-docx пишет XML иначе,
+    чем Word, и сравнение байтов их бы не узнало. None — все части
+    сериализуются и сравниваются с source.
+    """
+    from docx.opc.packuri import PACKAGE_URI
+    from docx.opc.pkgwriter import _ContentTypesItem
+
+    package = doc.part.package
+    parts = list(package.iter_parts())
+    with (
+        zipfile.ZipFile(BytesIO(source)) if source is not None else nullcontext() as original,
+        PackageWriter(original) as out,
+    ):
+        names = set(original.NameToInfo) if original is not None else set()
+        out.write(CONTENT_TYPES, _ContentTypesItem.from_parts(parts).blob)
+        out.write(PACKAGE_URI.rels_uri.membername, package.rels.xml)
+        for part in parts:
+            name, rels = part.partname.membername, part.partname.rels_uri.membername
+            if changed is not None and part not in changed and name in names:
+                out.copy(name)
+                if rels in names:
+                    out.copy(rels)
+                continue
+            out.write(name, part.blob)
+            if len(part.rels):
+                out.write(rels, part.rels.xml)
+    return out.buffer
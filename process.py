@@ -1,32 +1,61 @@
+from __future__ import annotations
+
 import tomllib
+from io import BytesIO
 from pathlib import Path
-import polars as pl
-from docx import Document
-from docx.document import Document as DocumentObject
-from docx.enum.table import WD_TABLE_ALIGNMENT
-from docx.oxml.ns import qn
 from pydantic import BaseModel
-from time import time
-import polars.selectors as sc
-from humanize import intcomma
-from docx.shared import Pt
-from docx.table import _Cell
-import openpyxl
+from typing import TYPE_CHECKING, Collection, Literal
 from copy import copy
-from openpyxl.worksheet.worksheet import Worksheet
-from openpyxl.utils import column_index_from_string
-
-OUTPUT_DIR = Path("output")
-START_PART = "_ВСТАВКА_"
+from docx_stream import DocxConfig
+from markers import START_PART, DocumentMarkerIndex
+from sources import (
+    OUTPUT_DIR,
+    Source,
+    new_output_dir,
+    open_source,
+    read_source,
+    save_output,
+    source_name,
+)
+from spans import span
+
+# polars, python-docx и openpyxl импортируются внутри задач, которым они нужны:
+# интерфейс и процессы-исполнители стартуют без них
+if TYPE_CHECKING:
+    import polars as pl
+    from docx.document import Document as DocumentObject
+    from docx.opc.part import Part
+    from docx.table import _Cell
+    from openpyxl.worksheet.worksheet import Worksheet
+
+    from style_cache import StyleCache
+
+L6_MARKER = "L6"
+SPOD_MARKER = "Общая сумма СПОД"
 
 class OfficeConfig(BaseModel):
     filename: Path
     sheet_names: list[str] | None = None
 
 
+class CopyConfig(BaseModel):
+    # xml — перенос частей пакета (xlsx_transplant), openpyxl — по ячейкам
+    engine: Literal["xml", "openpyxl"] = "xml"
+    # процессов для переписывания листов движком xml; 1 — без пула
+    workers: int = 1
+
+
+class DebugConfig(BaseModel):
+    # промежуточные сохранения документа после каждого шага (для отладки)
+    checkpoints: bool = False
+
+
 class Processor:
     word: OfficeConfig
     excel: OfficeConfig
+    copy: CopyConfig
+    debug: DebugConfig
+    docx: DocxConfig
 
     def __init__(self) -> None:
         OUTPUT_DIR.mkdir(exist_ok=True)
@@ -35,312 +64,307 @@ class Processor:
             cfg = tomllib.load(f)
         self.word = OfficeConfig.model_validate(cfg["word"])
         self.excel = OfficeConfig.model_validate(cfg["excel"])
+        self.copy = CopyConfig.model_validate(cfg.get("copy_ws", {}))
+        self.debug = DebugConfig.model_validate(cfg.get("debug", {}))
+        self.docx = DocxConfig.model_validate(cfg.get("docx", {}))
         pass
-    
+
+    def _checkpoint_dir(self) -> Path | None:
+        if not self.debug.checkpoints:
+            return None
+        return new_output_dir(OUTPUT_DIR / "checkpoints")
+
     # TASK2
     def make_word(self, word_filename, excel_filename) -> str:
-        timestamp = str(int(time()))
-        tmp_dir = OUTPUT_DIR / timestamp
-        tmp_dir.mkdir()
-
         # 1. конфиг
-        print("filenames = ", word_filename, excel_filename)
-
-        self.word.filename = Path(str(word_filename))
-        self.excel.filename = Path(str(excel_filename))
-        df = pl.read_excel(self.excel.filename, sheet_name=self.excel.sheet_names[0])
-        df = df.with_columns(sc.by_dtype(pl.Float64).round(2))
-
-        # 3. Открываем Word
-        doc = Document(self.word.filename)
-        tmp = tmp_dir / f"temp_{self.word.filename.name}"
+        name = source_name(word_filename, "document.docx")
+        buffer = self.make_word_io(
+            word_filename, excel_filename, checkpoint_dir=self._checkpoint_dir()
+        )
+        # 5. Сохраняем документ
+        return save_output(buffer, f"temp_{name}")
+
+    def make_word_io(
+        self, word: Source, excel: Source, checkpoint_dir: Path | None = None
+    ) -> BytesIO:
+        """
+        Задача 2 целиком в памяти: на входе пути, байты или потоки,
+        на выходе готовый docx. checkpoint_dir — куда сохранять документ
+        после каждого шага (по умолчанию не сохраняется).
+        """
+        from formatting import format_numbers
+        from template_cache import template_cache
+        from workbook import WorkbookSession
+
+        # 2. Разбираем книгу один раз сразу для всех листов из конфига
+        workbook = WorkbookSession(excel, self.excel.sheet_names)
+        # числа форматируем сразу целыми столбцами: L6 и D — 2 знака, K — 4
+        df = workbook[self.excel.sheet_names[0]]
+        df = format_numbers(df, decimals=2, columns=df.columns[2:])
+
+        # 3. Открываем Word: шаблон с тем же содержимым разобран один раз,
+        # маркеры и строки таблицы СПОД берутся из его плана
+        template = template_cache().get(word, needles=(L6_MARKER, SPOD_MARKER), plan=spod_rows)
+        doc, index = template.open()
+
+        def checkpoint(step: str) -> None:
+            if checkpoint_dir is not None:
+                doc.save(checkpoint_dir / f"{step}_{source_name(word, 'document.docx')}")
 
         # 4. Ищем L6 внутри ячеек всех таблиц
-        doc = insert_l6_table(doc, df)
+        doc = insert_l6_table(doc, df, index)
         if not doc:
             raise RuntimeError("Маркер L6 не найден ни в одной ячейке таблиц.")
-        doc.save(tmp)
+        checkpoint("l6")
 
-        df = pl.read_excel(self.excel.filename, sheet_name=self.excel.sheet_names[1])
-        doc = insert_k_table(doc, df)
+        df = format_numbers(workbook[self.excel.sheet_names[1]], decimals=4)
+        doc = insert_k_table(doc, df, index, template.rows.get("k"))
         if not doc:
             raise RuntimeError("Маркер L6 не найден ни в одной ячейке таблиц.")
-        doc.save(tmp)
+        checkpoint("k")
 
-        df = pl.read_excel(self.excel.filename, sheet_name=self.excel.sheet_names[2])
-        doc = insert_d_table(doc, df)
+        df = format_numbers(workbook[self.excel.sheet_names[2]], decimals=2)
+        doc = insert_d_table(doc, df, index, template.rows.get("d"))
         if not doc:
             raise RuntimeError(
                 "Маркер Общая сумма СПОД не найден ни в одной ячейке таблиц."
             )
-        # 5. Сохраняем документ
-        doc.save(tmp)
-        tmp = tmp.relative_to(".")
-        print("tmp = ", tmp, str(tmp))
-        return str(tmp)
+        return save_document(doc, template.source, changed=(doc.part,))
+
     # TASK 3
     def excel2word_insert(self, word_filename: str, excel_filename: str):
-        timestamp = str(int(time()))
-        tmp_dir = OUTPUT_DIR / timestamp
-        tmp_dir.mkdir()
-
-        word_filename = Path(str(word_filename))
-        excel_filename = Path(str(excel_filename))
-        doc = Document(word_filename)
-        wb = openpyxl.load_workbook(excel_filename, data_only=True, read_only=True)
-        ws = wb["Приложение_ОСВ"]
-
-        # 2. Собираем номера строк, где хотя бы одна ячейка залита жёлтым (#FFFF00 или ColorIndex 6)
-        yellow_rows = {"лист": [], "Лицевой счет": [], "Наименование счета": []}
-        for row in ws.iter_rows(
-            min_row=2
-        ):  # header_row=1 → данные с физической строки 2
-            for i, cell in enumerate(row):
-                # print(i, 'value: ', cell.value) if i % 5 == 0 else None
-                if not hasattr(cell.fill, 'fgColor'):
-                    continue
-                fg = cell.fill.fgColor
-                # openpyxl хранит цвет в разных форматах, но в большинстве случаев .rgb == 'FFFFFF00' или 'FF0000FF'
-                rgb = getattr(fg, "rgb", None)
-                # некоторые файлы могут использовать indexed цвет
-                if rgb and rgb.upper().endswith("FFFF00"):
-                    v1 = str(row[i - 1].value)
-                    v2 = str(row[i].value)
-                    v3 = str(row[i + 1].value)
-                    print(f'Номер: {i}, Значения: {v1} | {v2} | {v3}')
-                    yellow_rows["лист"].append(str(row[i - 1].value))
-                    yellow_rows["Лицевой счет"].append(str(row[i].value))
-                    yellow_rows["Наименование счета"].append(str(row[i + 1].value))
-                    break  # эту строку уже отметили, идём дальше
-        # print('yellow_rows = ', yellow_rows)
-        df = pl.DataFrame(yellow_rows)
+        buffer = self.excel2word_insert_io(word_filename, excel_filename)
+        if buffer is None:
+            return
+        name = source_name(word_filename, "document.docx")
+        return save_output(buffer, f"выход_{name}")
+
+    def excel2word_insert_io(self, word: Source, excel: Source) -> BytesIO | None:
+        """Задача 3 в памяти; None, если в ОСВ нет жёлтых строк."""
+        from fills import OSV_SHEET, read_yellow_rows
+        from frame_cache import frame_cache
+        from template_cache import template_cache
+
+        # 2. Собираем строки, где хотя бы одна ячейка залита жёлтым (#FFFF00):
+        # стили разбираются один раз, лист читается потоком; при повторе — из кэша
+        with span("load_excel", sheet=OSV_SHEET) as record:
+            data = read_source(excel)
+            df = frame_cache().frames(
+                data,
+                "read_yellow_rows",
+                {"sheet_name": OSV_SHEET},
+                lambda: {OSV_SHEET: read_yellow_rows(data, OSV_SHEET)},
+            )[OSV_SHEET]
+            if record is not None:
+                record["rows"] = df.height
         if df.is_empty():
             print('Внимание! df пустой!')
             return
-        else:
-            print('Получился вот такой DF со значениями')
-            print(df)
-
-        # Перебираем таблицы и строки, чтобы иметь доступ к row
-        for tbl in doc.tables:
-            # Копируем список строк, чтобы безопасно удалять во время итерации
-            for row in list(tbl.rows):
-                found_marker = False
-                for cell in row.cells:
-                    marker = search_text_marker(cell)
-                    if marker:
-                        temp_df = df.filter(pl.nth(0) == marker).drop(pl.nth(0))
-                        if temp_df.is_empty():
-                            # Удаляем строку, если DataFrame пуст
-                            tbl._tbl.remove(row._tr)
-                            found_marker = True
-                            break
-                        print(marker, temp_df)
-                        temp_doc = insert_table(doc, temp_df, marker)
-                        if temp_doc:
-                            doc = temp_doc
-                        else:
-                            tbl._tbl.remove(row._tr)
-                        found_marker = True
-                        break
-                if not found_marker:
-                    # Если не найден ни один marker в строке, удаляем строку
-                    continue
-        tmp = tmp_dir / f"выход_{word_filename.name}"
-        doc.save(tmp)
-        tmp = tmp.relative_to(".")
-        return str(tmp)
+
+        # Группируем строки по листу один раз: маркер ищется в словаре
+        groups = {
+            key: frame
+            for (key,), frame in df.partition_by(
+                df.columns[0], as_dict=True, include_key=False
+            ).items()
+        }
+        if self.docx.engine == "stream":
+            return _excel2word_stream(word, groups)
+        missing_markers = []
+
+        # Маркеры в ячейках таблиц в порядке документа — из плана шаблона
+        template = template_cache().get(word)
+        doc, index = template.open()
+        handled_rows = set()
+        for hit in index.markers(in_cells=True):
+            # в строке обрабатываем только первый маркер
+            tr = hit.tr
+            if tr in handled_rows or not hit.is_alive(doc.element.body):
+                continue
+            handled_rows.add(tr)
+            marker = hit.key
+            temp_df = groups.get(marker)
+            if temp_df is None:
+                # Удаляем строку, если для маркера нет данных
+                missing_markers.append(marker)
+                tr.getparent().remove(tr)
+                continue
+            temp_doc = insert_table(doc, temp_df, marker, index)
+            if temp_doc:
+                doc = temp_doc
+            else:
+                tr.getparent().remove(tr)
+
+        if missing_markers:
+            print(f"Маркеры без данных (строки удалены): {missing_markers}")
+        unused = [key for key in groups if not index.has_marker(key)]
+        if unused:
+            print(f"Данные без маркера в документе: {unused}")
+        return save_document(doc, template.source, changed=(doc.part,))
 
     def copy_ws(self, origin_filename, target_filename):
+        buffer = self.copy_ws_io(origin_filename, target_filename)
+        name = source_name(target_filename, "workbook.xlsx")
+        return save_output(buffer, f"target_{name}")
+
+    def copy_ws_io(self, origin: Source, target: Source) -> BytesIO:
+        """Перенос листов origin в начало target в памяти; на выходе готовый xlsx."""
+        if self.copy.engine == "xml":
+            from xlsx_transplant import transplant_sheets
+
+            with span("copy_sheets", engine="xml"):
+                return transplant_sheets(origin, target, self.copy.workers)
+
         from openpyxl import load_workbook
 
-        origin_filename = Path(str(origin_filename))
-        target_filename = Path(str(target_filename))
-        timestamp = str(int(time()))
-        tmp_dir = OUTPUT_DIR / timestamp
-        tmp_dir.mkdir()
-        origin_wb = load_workbook(origin_filename)
-        target_wb = load_workbook(target_filename)
-
-        for sheet_name in reversed(origin_wb.sheetnames):
-            # Удаляем существующий лист, если он есть
-            if sheet_name in target_wb.sheetnames:
-                target_wb.remove(target_wb[sheet_name])
-            # Создаём новый лист в позиции 0 (в начале)
-            dst = target_wb.create_sheet(title=sheet_name, index=0)
-            src = origin_wb[sheet_name]
-            copy_sheet(src, dst)
+        from style_cache import StyleCache
+
+        with span("load_excel"):
+            origin_wb = load_workbook(open_source(origin))
+            target_wb = load_workbook(open_source(target))
+
+        # один кэш стилей на пару книг: стиль источника переносится один раз
+        styles = StyleCache()
+        with span("copy_sheets", engine="openpyxl") as record:
+            for sheet_name in reversed(origin_wb.sheetnames):
+                # Удаляем существующий лист, если он есть
+                if sheet_name in target_wb.sheetnames:
+                    target_wb.remove(target_wb[sheet_name])
+                # Создаём новый лист в позиции 0 (в начале)
+                dst = target_wb.create_sheet(title=sheet_name, index=0)
+                src = origin_wb[sheet_name]
+                copy_sheet(src, dst, styles)
+            if record is not None:
+                record.update(style_hits=styles.hits, style_misses=styles.misses)
 
         # Optionally remove the default 'Sheet' if it's empty and not in origin
         if "Sheet" in target_wb.sheetnames and "Sheet" not in origin_wb.sheetnames:
             target_wb.remove(target_wb["Sheet"])
 
         # Save changes
-        timestamp = str(int(time()))
-        tmp = tmp_dir / timestamp
-        tmp.mkdir()
-        tmp = tmp / f"target_{target_filename.name}"
+        with span("save"):
+            buffer = BytesIO()
+            target_wb.save(buffer)
+            buffer.seek(0)
+        return buffer
 
-        target_wb.save(tmp)
-        return str(tmp.relative_to("."))
+
+def save_document(
+    doc: DocumentObject, source: bytes | None = None, changed: Collection[Part] | None = None
+) -> BytesIO:
+    """
+    Единственная сериализация документа — в память. source — байты
+    шаблона: неизменённые части копируются из него без пересжатия;
+    changed — части, которые задача правила (см. save_docx).
+    """
+    from package_writer import save_docx
+
+    with span("save"):
+        return save_docx(doc, source, changed)
 
 
-def insert_l6_table(doc: DocumentObject, df: pl.DataFrame):
-    all_cells = (cell for tbl in doc.tables for row in tbl.rows for cell in row.cells)
+def insert_l6_table(
+    doc: DocumentObject, df: pl.DataFrame, index: DocumentMarkerIndex | None = None
+):
+    if index is None:
+        index = DocumentMarkerIndex(doc, needles=(L6_MARKER,))
 
     # находим первую ячейку с маркером L6
-    try:
-        cell = next(cell for cell in all_cells if "L6" in cell.text)
-    except StopIteration:
+    hit = index.first(L6_MARKER)
+    if hit is None:
         return None
+    cell = hit.cell
     clear_cell_shading(cell)
-    if "L6" in cell.text:
+    if L6_MARKER in cell.text:
         # очистить маркер
         cell.text = ""
-        # вставить вложенную таблицу
-        nested = cell.add_table(rows=1, cols=len(df.columns))
-        nested.style = "Table Grid"
-        nested.alignment = WD_TABLE_ALIGNMENT.LEFT
-        # nested.autofit = False
-
-        # шапка
-
-        hdr = nested.rows[0].cells
-        for i, col in enumerate(df.columns):
-            hdr[i].text = str(col).strip()
-        # данные
-        for data_row in df.iter_rows():
-            new_cells = nested.add_row().cells
-            for i, val in enumerate(data_row):
-                new_cells[i].text = (
-                    intcomma(str(val).strip()).replace(",", " ").replace(".", ",")
-                    if i >= 2
-                    else str(val).strip()
-                )
-        for hdr_cell in nested.rows[0].cells:
-            for p in hdr_cell.paragraphs:
-                pf = p.paragraph_format
-                pf.first_line_indent = Pt(0)
-                pf.left_indent = Pt(0)
-
-        # и то же для всех строк с данными
-        for data_row in nested.rows[1:]:
-            for cell in data_row.cells:
-                for p in cell.paragraphs:
-                    pf = p.paragraph_format
-                    pf.first_line_indent = Pt(0)
-                    pf.left_indent = Pt(0)
+        # вставить вложенную таблицу: шапка, данные и нулевые отступы за один проход
+        from tables import add_table_to_cell
+
+        add_table_to_cell(cell, df)
 
         return doc
 
 
-def insert_k_table(doc: DocumentObject, df: pl.DataFrame):
-    df = df.with_columns(sc.by_dtype(pl.Float64).round(4))
-    # 1) Находим таблицу и номер заголовочной строки
-    target_table = None
-    header_row_idx = None
-
-    for tbl in doc.tables:
-        for idx, row in enumerate(tbl.rows):
-            # проверяем, есть ли в этой строке нужная ячейка
-            if any("Общая сумма СПОД" in cell.text for cell in row.cells):
-                target_table = tbl
-                header_row_idx = idx
-                break
-        if target_table:
-            break
-
-    if not target_table:
-        # таблица не найдена — выходим
-        return
+def spod_rows(doc: DocumentObject, index: DocumentMarkerIndex) -> dict[str, list[int]]:
+    """
+    Строки таблицы СПОД по тексту шаблона, начиная со строки маркера:
+    k — второй столбец заполнен и не начинается с «Д», d — начинается с «Д».
+    Строки с пустым первым или вторым столбцом не заполняются.
+    """
+    from tables import TableGrid
+
+    hit = index.first(SPOD_MARKER)
+    if hit is None:
+        return {}
+    grid = TableGrid(hit.table)
+    k_rows, d_rows = [], []
+    for row_idx in range(hit.row, len(grid)):
+        second = grid.text(row_idx, 1)
+        if not grid.text(row_idx, 0).strip() or not second.strip():
+            continue
+        (d_rows if second.startswith("Д") else k_rows).append(row_idx)
+    return {"k": k_rows, "d": d_rows}
 
+
+def insert_k_table(
+    doc: DocumentObject,
+    df: pl.DataFrame,
+    index: DocumentMarkerIndex | None = None,
+    rows: list[int] | None = None,
+):
+    """
+    Значения первой строки df — во второй столбец строк K таблицы СПОД.
+    rows — готовые номера строк из плана шаблона (spod_rows); иначе считаются здесь.
+    """
     # 2) Берём значения из df
-    # Предположим, что у вас в df есть колонка "value", и в ней ровно столько строк,
-    # сколько строк таблицы (начиная с header_row_idx), куда нужно записать.
     values = df.row(0)
+    return _fill_spod(doc, values, index, "k", rows)
 
-    # 3) Проверяем, хватает ли строк в таблице.
-    # Нужны строки от header_row_idx до header_row_idx + len(values) - 1
-    needed = header_row_idx + len(values) - len(target_table.rows)
-    for _ in range(needed):
-        target_table.add_row()
-
-    # 4) Записываем по одной строке в ячейку (row_idx, col_idx=1)
-    # print(target_table.rows)
-    # print(len(target_table.rows))
-
-    row_indices = []
-    for row_idx in range(header_row_idx, header_row_idx + len(target_table.rows) - 1):
-        # проверяем первый столбец на непустоту
-        # print('row_idx = ', row_idx)
-        if (
-            not target_table.cell(row_idx, 0).text.strip()
-            or not target_table.cell(row_idx, 1).text.strip()
-        ):
-            continue
-        # проверяем второй столбец на "Д"
-        if target_table.cell(row_idx, 1).text.startswith("Д"):
-            continue
-        row_indices.append(row_idx)
 
-    # 2) Теперь просто zip по values и row_indices
-    for val, row_idx in zip(values, row_indices):
-        cell = target_table.cell(row_idx, 1)
-        cell.text = intcomma(str(val)).replace(",", " ").replace(".", ",")
-    return doc
+def insert_d_table(
+    doc: DocumentObject,
+    df: pl.DataFrame,
+    index: DocumentMarkerIndex | None = None,
+    rows: list[int] | None = None,
+):
+    """Второй столбец df — во второй столбец строк «Д…» таблицы СПОД."""
+    values = df.to_series(1).to_list()
+    return _fill_spod(doc, values, index, "d", rows)
+
 
+def _fill_spod(
+    doc: DocumentObject,
+    values,
+    index: DocumentMarkerIndex | None,
+    kind: str,
+    rows: list[int] | None,
+):
+    from tables import TableGrid
 
-def insert_d_table(doc: DocumentObject, df: pl.DataFrame):
-    df = df.with_columns(sc.by_dtype(pl.Float64).round(2))
     # 1) Находим таблицу и номер заголовочной строки
-    target_table = None
-    header_row_idx = None
-
-    for tbl in doc.tables:
-        for idx, row in enumerate(tbl.rows):
-            # проверяем, есть ли в этой строке нужная ячейка
-            if any("Общая сумма СПОД" in cell.text for cell in row.cells):
-                target_table = tbl
-                header_row_idx = idx
-                break
-        if target_table:
-            break
-
-    if not target_table:
+    if index is None:
+        index = DocumentMarkerIndex(doc, needles=(SPOD_MARKER,))
+    hit = index.first(SPOD_MARKER)
+    if hit is None:
         # таблица не найдена — выходим
         return
-
-    # 2) Берём значения из df
-    values = df.to_series(1).to_list()
+    # сетка таблицы разбирается один раз, а не на каждое обращение к ячейке
+    grid = TableGrid(hit.table)
+    header_row_idx = hit.row
 
     # 3) Проверяем, хватает ли строк в таблице.
     # Нужны строки от header_row_idx до header_row_idx + len(values) - 1
-    needed = header_row_idx + len(values) - len(target_table.rows)
-    for _ in range(needed):
-        target_table.add_row()
-
-    # 4) Записываем по одной строке в ячейку (row_idx, col_idx=1)
-    # print(target_table.rows)
-    # print(len(target_table.rows))
-
-    row_indices = []
-    for row_idx in range(header_row_idx, header_row_idx + len(target_table.rows) - 1):
-        # проверяем первый столбец на непустоту
-        # print('row_idx = ', row_idx)
-        if (
-            not target_table.cell(row_idx, 0).text.strip()
-            or not target_table.cell(row_idx, 1).text.strip()
-        ):
-            continue
-        # проверяем второй столбец на "Д"
-        if not target_table.cell(row_idx, 1).text.startswith("Д"):
-            continue
-        row_indices.append(row_idx)
+    grid.add_rows(header_row_idx + len(values) - len(grid))
+
+    # 4) Строки для записи; добавленные строки пустые и не заполняются
+    if rows is None:
+        rows = spod_rows(doc, index).get(kind, [])
+    end = header_row_idx + len(grid) - 1
+    row_indices = [row_idx for row_idx in rows if row_idx < end]
 
-    # 2) Теперь просто zip по values и row_indices
-    for val, row_idx in zip(values, row_indices):
-        cell = target_table.cell(row_idx, 1)
-        cell.text = intcomma(str(val)).replace(",", " ").replace(".", ",")
+    # Записываем столбец целиком: по строке в ячейку (row_idx, col_idx=1)
+    grid.write_column(1, row_indices, values)
     return doc
 
 
@@ -349,6 +373,8 @@ def clear_cell_shading(cell):
     Убирает любую заливку из ячейки cell:
     удаляет все <w:shd> в свойствах ячейки.
     """
+    from docx.oxml.ns import qn
+
     tc = cell._tc
     tcPr = tc.get_or_add_tcPr()
     for shd in tcPr.findall(qn("w:shd")):
@@ -371,58 +397,94 @@ def search_text_marker(cell: _Cell, start_par: str = START_PART):
     return None
 
 
-def insert_table(doc: DocumentObject, df: pl.DataFrame, marker: str):
-    all_cells = (cell for tbl in doc.tables for row in tbl.rows for cell in row.cells)
+def insert_table(
+    doc: DocumentObject,
+    df: pl.DataFrame,
+    marker: str,
+    index: DocumentMarkerIndex | None = None,
+):
+    if index is None:
+        index = DocumentMarkerIndex(doc)
 
     # находим первую ячейку с маркером текста
-    try:
-        cell = next(cell for cell in all_cells if marker in cell.text)
-    except StopIteration:
+    hit = index.marker(marker)
+    if hit is None or hit.cell is None:
         return None
+    cell = hit.cell
 
     if has_text_marker(cell, START_PART + marker):
-        # очистить маркер
-        cell.text = cell.text.replace(START_PART + marker, "")
-        cell.text = cell.text.replace('\n\n\n', "")
-        # вставить вложенную таблицу
-        nested = cell.add_table(rows=1, cols=df.width)
-        nested.style = "Table Grid"
-        nested.alignment = WD_TABLE_ALIGNMENT.LEFT
-        # nested.autofit = False
-
-        # шапка
-
-        hdr = nested.rows[0].cells
-        for i, col in enumerate(df.columns):
-            hdr[i].text = str(col).strip()
-        # данные
-        for data_row in df.iter_rows():
-            new_cells = nested.add_row().cells
-            for i, val in enumerate(data_row):
-                new_cells[i].text = (
-                    intcomma(str(val).strip()).replace(",", " ").replace(".", ",")
-                    if i >= 2
-                    else str(val).strip()
-                )
-        for hdr_cell in nested.rows[0].cells:
-            for p in hdr_cell.paragraphs:
-                pf = p.paragraph_format
-                pf.first_line_indent = Pt(0)
-                pf.left_indent = Pt(0)
-
-        # и то же для всех строк с данными
-        for data_row in nested.rows[1:]:
-            for cell in data_row.cells:
-                for p in cell.paragraphs:
-                    pf = p.paragraph_format
-                    pf.first_line_indent = Pt(0)
-                    pf.left_indent = Pt(0)
+        clear_marker(cell, marker)
+        # вставить вложенную таблицу: шапка, данные и нулевые отступы за один проход
+        from tables import add_table_to_cell
+
+        add_table_to_cell(cell, df)
 
         return doc
     print(f"Маркер {marker} не найден ни в одной ячейке таблиц.")
 
 
-def copy_sheet(src_ws: Worksheet, dst_ws: Worksheet):
+def clear_marker(cell: _Cell, marker: str) -> None:
+    """Убрать маркер из текста ячейки (остальной текст ячейки — одним абзацем)."""
+    cell.text = cell.text.replace(START_PART + marker, "")
+    cell.text = cell.text.replace('\n\n\n', "")
+
+
+def _excel2word_stream(word: Source, groups: dict[str, pl.DataFrame]) -> BytesIO:
+    """
+    Задача 3 потоковой записью document.xml (docx_stream): таблицы тела
+    с маркерами обрабатываются по одной, документ целиком не разбирается.
+
+    В отличие от python-docx модели, таблица вставляется в ту ячейку,
+    где встретился маркер; при повторе маркера в документе каждая
+    строка с ним получает свою копию данных.
+    """
+    from docx_stream import DocxRewriter
+    from markers import iter_markers
+    from tables import TABLE_STYLE, append_table
+
+    missing_markers = []
+    found = set()
+
+    def replace(element):
+        handled_rows = set()
+        for hit in iter_markers(element):
+            found.add(hit.key)
+            # в строке обрабатываем только первый маркер; абзацы вне таблиц не трогаем
+            tr = hit.tr
+            if tr is None or tr in handled_rows or not hit.is_alive(element):
+                continue
+            handled_rows.add(tr)
+            temp_df = groups.get(hit.key)
+            if temp_df is None:
+                # Удаляем строку, если для маркера нет данных
+                missing_markers.append(hit.key)
+                tr.getparent().remove(tr)
+                continue
+            clear_marker(hit.cell, hit.key)
+            append_table(hit.cell, temp_df, docx.style_id(TABLE_STYLE))
+        return [element]
+
+    with DocxRewriter(word) as docx:
+        with span("rewrite_docx"):
+            buffer = docx.rewrite(replace, needle=START_PART)
+
+    if missing_markers:
+        print(f"Маркеры без данных (строки удалены): {missing_markers}")
+    unused = [key for key in groups if key not in found]
+    if unused:
+        print(f"Данные без маркера в документе: {unused}")
+    return buffer
+
+
+def copy_sheet(
+    src_ws: Worksheet, dst_ws: Worksheet, styles: StyleCache | None = None
+):
+    from openpyxl.utils import column_index_from_string
+
+    if styles is None:
+        from style_cache import StyleCache
+
+        styles = StyleCache()
     # Копируем значения и стили
     for row in src_ws.iter_rows():
         for cell in row:
@@ -436,13 +498,8 @@ def copy_sheet(src_ws: Worksheet, dst_ws: Worksheet):
             new_cell = dst_ws.cell(row=row_idx, column=col_idx, value=cell.value)
 
             if cell.has_style:
-                new_cell.font = copy(cell.font)
-                new_cell.border = copy(cell.border)
-                new_cell.fill = copy(cell.fill)
-                # Прямо присваиваем строковый код формата
-                new_cell.number_format = cell.number_format
-                new_cell.protection = copy(cell.protection)
-                new_cell.alignment = copy(cell.alignment)
+                # одинаковые стили источника переносятся один раз, дальше — по номеру
+                styles.apply(cell, new_cell)
     # Воссоздаём merged ranges
     for merged_range in src_ws.merged_cells.ranges:
         dst_ws.merge_cells(str(merged_range))
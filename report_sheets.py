@@ -0,0 +1,283 @@
+"""
+Листы книги для таблиц отчёта (insert_tables_with_filter).
+
+Книга открывается один раз на задачу (общие строки разбираются один
+раз), лист читается, только когда до него дошла очередь. Строки
+с нулями в последних трёх столбцах отбрасываются сразу после чтения
+листа в Arrow (calamine) или ещё в цикле чтения (openpyxl) — дальше,
+в кэш и в таблицы, они не идут. Следующий лист тем временем читается
+в фоновом потоке.
+
+    with ReportSheets(excel) as sheets:
+        for i, name in enumerate(sheets.names[:placeholders]):
+            df = sheets.sheet(i)
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+import tomllib
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import cached_property
+from io import BytesIO
+from typing import TYPE_CHECKING, Iterable, Literal
+
+from pydantic import BaseModel
+
+from sources import Source, read_source
+from spans import span
+
+if TYPE_CHECKING:
+    import polars as pl
+
+# строка шапки листа (с нуля): две первые строки — заголовок отчёта
+HEADER_ROW = 2
+# последние столбцы, ноль в которых исключает строку из таблицы
+ZERO_COLUMNS = 3
+# меняется вместе с фильтром строк: от него зависят листы в кэше
+FILTER_VERSION = 1
+
+
+class ReportSheetsConfig(BaseModel):
+    # calamine — быстрое чтение (fastexcel); openpyxl — для книг, которые calamine читает неверно
+    engine: Literal["calamine", "openpyxl"] = "calamine"
+    # листов, читаемых заранее в фоновых потоках; 0 — только по требованию
+    prefetch: int = 2
+    # типы столбцов по листам, например {"Лист1" = {"2024" = "Float64"}}; остальные — текст
+    schema_overrides: dict[str, dict[str, str]] = {}
+    # процессов для сборки таблиц (task_four.TableRenderer); 1 — в процессе задачи
+    workers: int = 1
+
+
+def load_config() -> ReportSheetsConfig:
+    try:
+        with open("config.toml", "rb") as f:
+            return ReportSheetsConfig.model_validate(tomllib.load(f).get("report_tables", {}))
+    except FileNotFoundError:
+        return ReportSheetsConfig()
+
+
+def keep_rows(schema: pl.Schema) -> pl.Expr:
+    """
+    Строки без нулей в последних трёх столбцах. Текстовый столбец
+    сравнивается с '0', числовой — с 0; пустое значение строку тоже
+    исключает, как и раньше (any_horizontal с null даёт null).
+    """
+    import polars as pl
+
+    tail = list(schema.items())[-ZERO_COLUMNS:]
+    return ~pl.any_horizontal(
+        [pl.col(name) == ("0" if dtype == pl.String else 0) for name, dtype in tail]
+    )
+
+
+class ReportSheets:
+    """
+    Книга Excel, листы которой читаются по требованию.
+
+    sheet(i) ждёт i-й лист и ставит в фон чтение следующих prefetch
+    листов. Прочитанный лист не хранится: его держит только вызвавший.
+    Повторная задача с той же книгой берёт листы из кэша (frame_cache).
+    """
+
+    def __init__(self, source: Source, config: ReportSheetsConfig | None = None) -> None:
+        self.data = read_source(source)
+        self.config = config or load_config()
+        # открытая книга: fastexcel.ExcelReader или openpyxl (read_only); читает один поток
+        self._book = self._open()
+        self._book_lock = threading.Lock()
+        self.names = self._sheet_names()
+        self._pool = ThreadPoolExecutor(self.config.prefetch) if self.config.prefetch > 0 else None
+        self._loading: dict[int, Future] = {}
+        self._next = 0
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+        if self.config.engine == "openpyxl":
+            self._book.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def sheet(self, i: int) -> pl.DataFrame:
+        """i-й лист книги без исключённых строк, все столбцы — текст (кроме schema_overrides)."""
+        name = self.names[i]
+        with span("load_excel", sheet=name) as record:
+            if self._pool is None:
+                df = self._cached(name)
+            else:
+                # лист i и следующие prefetch — в очередь потоков
+                self._next = max(self._next, i)
+                while self._next < min(i + 1 + self.config.prefetch, len(self.names)):
+                    self._loading[self._next] = self._pool.submit(self._cached, self.names[self._next])
+                    self._next += 1
+                future = self._loading.pop(i, None)
+                df = self._cached(name) if future is None else future.result()
+            if record is not None:
+                record["rows"] = df.height
+        return df
+
+    # --- чтение ---
+
+    @cached_property
+    def _digest(self) -> str:
+        return hashlib.sha256(self.data).hexdigest()
+
+    def _cached(self, name: str) -> pl.DataFrame:
+        from frame_cache import frame_cache
+
+        options = {
+            "sheet_name": name,
+            "engine": self.config.engine,
+            "header_row": HEADER_ROW,
+            "schema_overrides": self.config.schema_overrides.get(name, {}),
+            "filter": FILTER_VERSION,
+        }
+        return frame_cache().frames(
+            self.data, "report_sheet", options, lambda: {name: self._load(name)}, digest=self._digest
+        )[name]
+
+    def _load(self, name: str) -> pl.DataFrame:
+        overrides = {
+            column: _dtype(dtype) for column, dtype in self.config.schema_overrides.get(name, {}).items()
+        }
+        if self.config.engine == "openpyxl":
+            return self._load_openpyxl(name, overrides)
+        import polars as pl
+
+        # как pl.read_excel(engine="calamine", infer_schema_length=0), но без
+        # повторного открытия книги и разбора общих строк для каждого листа
+        with self._book_lock:
+            sheet = self._book.load_sheet(name, header_row=HEADER_ROW, dtypes="string")
+        df = _drop_empty(pl.DataFrame(sheet))
+        if df.height == df.width == 0:
+            raise pl.exceptions.NoDataError(f"Лист {name!r} пуст")
+        if overrides:
+            df = _cast(df, overrides)
+        # calamine читает лист целиком: фильтр — сразу после чтения
+        return df.filter(keep_rows(df.schema))
+
+    def _load_openpyxl(self, name: str, overrides: dict) -> pl.DataFrame:
+        """
+        Лист через openpyxl (read_only). Строки с нулями отбрасываются
+        в цикле чтения, до построения таблицы; значения — текст, как
+        у calamine с infer_schema_length=0.
+        """
+        import polars as pl
+
+        with self._book_lock:
+            rows = self._book[name].iter_rows(min_row=HEADER_ROW + 1, values_only=True)
+            header = next(rows, None)
+            if header is None:
+                raise pl.exceptions.NoDataError(f"Лист {name!r} пуст")
+            # пустые ячейки в конце шапки — обычно оформление за краем таблицы;
+            # столбцы без шапки в конце листа не читаются, иначе последние три — не те
+            header = list(header)
+            while header and header[-1] is None:
+                header.pop()
+            columns = _column_names(header)
+            data = []
+            for row in rows:
+                values = [_text(v) for v in row[: len(columns)]]
+                if all(v is None for v in values):
+                    continue
+                values += [None] * (len(columns) - len(values))
+                # '0' и пустые отбрасывает и keep_rows при любом типе столбца
+                if any(v is None or v == "0" for v in values[-ZERO_COLUMNS:]):
+                    continue
+                data.append(values)
+        df = pl.DataFrame(data, schema=dict.fromkeys(columns, pl.String), orient="row")
+        empty = [c for c in df.columns if c.startswith("__UNNAMED__") and df[c].null_count() == df.height]
+        df = df.drop(empty)
+        if overrides:
+            # после приведения типов: числовой ноль записан в ячейке и как '0.0'
+            df = df.cast(overrides, strict=False)
+        return df.filter(keep_rows(df.schema))
+
+    def _open(self):
+        if self.config.engine == "openpyxl":
+            import openpyxl
+
+            return openpyxl.load_workbook(BytesIO(self.data), read_only=True, data_only=True)
+        import fastexcel
+
+        return fastexcel.read_excel(self.data)
+
+    def _sheet_names(self) -> list[str]:
+        if self.config.engine == "openpyxl":
+            return list(self._book.sheetnames)
+        return list(self._book.sheet_names)
+
+
+def _dtype(name: str) -> type[pl.DataType]:
+    import polars as pl
+
+    dtype = getattr(pl, name, None)
+    if not (isinstance(dtype, type) and issubclass(dtype, pl.DataType)):
+        raise ValueError(f"[report_tables] schema_overrides: неизвестный тип polars {name!r}")
+    return dtype
+
+
+def _drop_empty(df: pl.DataFrame) -> pl.DataFrame:
+    """Пустые безымянные столбцы и пустые строки, как у pl.read_excel."""
+    import polars as pl
+
+    empty = [
+        c for c in df.columns
+        if (c == "" or re.match(r"__UNNAMED__\d+$", c)) and df[c].null_count() == df.height
+    ]
+    df = df.drop(empty)
+    if df.width == 0:
+        return df
+    return df.filter(~pl.all_horizontal(pl.all().is_null()))
+
+
+def _cast(df: pl.DataFrame, overrides: dict) -> pl.DataFrame:
+    """Типы из schema_overrides для текстовых столбцов, как у pl.read_excel."""
+    import polars as pl
+
+    temporal, casts = [], {}
+    for name, dtype in overrides.items():
+        if dtype == pl.Datetime:
+            temporal.append(pl.col(name).str.to_datetime())
+        elif dtype == pl.Date:
+            temporal.append(pl.col(name).str.replace(r"(?:[ T]00:00:00(?:\.0+)?)$", "").str.to_date())
+        elif dtype == pl.Time:
+            temporal.append(pl.col(name).str.to_time())
+        else:
+            casts[name] = dtype
+    if temporal:
+        df = df.with_columns(*temporal)
+    return df.cast(casts) if casts else df
+
+
+def _column_names(header: Iterable) -> list[str]:
+    """Имена столбцов из строки шапки: пустые — __UNNAMED__<n>, повторы — с суффиксом."""
+    names: list[str] = []
+    for i, value in enumerate(header):
+        name = _text(value) or f"__UNNAMED__{i}"
+        base, n = name, 1
+        while name in names:
+            name = f"{base}_{n}"
+            n += 1
+        names.append(name)
+    return names
+
+
+def _text(value) -> str | None:
+    """Значение ячейки как текст calamine: целые без '.0', логические — true/false."""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
@@ -0,0 +1,160 @@
+import os
+import re
+import shutil
+import threading
+import tomllib
+from pathlib import Path
+from time import time
+from typing import NamedTuple
+
+from pydantic import BaseModel
+
+from sources import OUTPUT_DIR
+
+# папки задач, созданные sources.new_output_dir: <timestamp>_<суффикс>
+JOB_DIR = re.compile(r"^\d+_")
+# подпапки output/, в которых тоже лежат папки задач
+NESTED = ("checkpoints",)
+
+
+class RetentionConfig(BaseModel):
+    # предел размера результатов в output/, МБ; 0 — без предела
+    max_mb: int = 10240
+    # дней хранения результата после его выдачи в интерфейс; 0 — без предела
+    max_age_days: float = 7
+    # как часто проверять output/, секунд
+    interval: float = 600
+    # результаты моложе этого (секунд) не удаляются: интерфейс ещё копирует их к себе
+    grace: float = 300
+
+
+class JobDir(NamedTuple):
+    path: Path
+    size: int
+    # время выдачи результата в интерфейс (mtime папки, см. RetentionManager.touch)
+    used: float
+
+
+class OutputUsage(NamedTuple):
+    jobs: int
+    bytes: int
+    oldest: float | None
+
+
+class RetentionManager:
+    """
+    Очистка output/ от старых результатов.
+
+    Удаляются папки задач (output/<timestamp>_<суффикс>/ и такие же
+    в output/checkpoints/): сначала старше max_age_days, затем, пока
+    общий размер больше max_mb, — самые давние. Срок считается от выдачи
+    результата в интерфейс, touch() (mtime папки), а не от скачивания:
+    gradio копирует файл в свой кэш и отдаёт пользователю копию, папка
+    в output/ для скачивания уже не нужна. Проверка идёт
+    в фоновом потоке раз в interval секунд и по wake() после задачи;
+    сами задачи её не ждут. Папки, не созданные new_output_dir
+    (например, output/batch), не трогаются.
+    """
+
+    def __init__(self, config: RetentionConfig | None = None, directory: Path = OUTPUT_DIR) -> None:
+        if config is None:
+            try:
+                with open("config.toml", "rb") as f:
+                    section = tomllib.load(f).get("retention", {})
+            except FileNotFoundError:
+                section = {}
+            config = RetentionConfig.model_validate(section)
+        self.config = config
+        self.directory = directory
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def job_dirs(self) -> list[JobDir]:
+        """Папки задач с размером и временем последней выдачи, самые давние первыми."""
+        roots = [self.directory, *(self.directory / name for name in NESTED)]
+        found = []
+        for root in roots:
+            if not root.is_dir():
+                continue
+            for entry in root.iterdir():
+                if not JOB_DIR.match(entry.name) or not entry.is_dir():
+                    continue
+                try:
+                    size = sum(f.stat().st_size for f in entry.rglob("*") if f.is_file())
+                    found.append(JobDir(entry, size, entry.stat().st_mtime))
+                except OSError:
+                    # папку удалили, пока мы её обходили
+                    continue
+        return sorted(found, key=lambda d: d.used)
+
+    def usage(self) -> OutputUsage:
+        dirs = self.job_dirs()
+        return OutputUsage(
+            jobs=len(dirs),
+            bytes=sum(d.size for d in dirs),
+            oldest=dirs[0].used if dirs else None,
+        )
+
+    def touch(self, result: str | Path) -> None:
+        """Отметить выдачу результата в интерфейс: от неё считаются grace и max_age_days."""
+        folder = Path(result).parent
+        if JOB_DIR.match(folder.name):
+            try:
+                os.utime(folder)
+            except OSError:
+                pass
+
+    def sweep(self) -> list[Path]:
+        """Одна проверка: удаляет лишние папки задач и возвращает их."""
+        with self._lock:
+            now = time()
+            dirs = self.job_dirs()
+            total = sum(d.size for d in dirs)
+            max_age = self.config.max_age_days * 86400
+            limit = self.config.max_mb << 20
+            removed = []
+            for d in dirs:
+                if now - d.used < self.config.grace:
+                    # дальше только более свежие
+                    break
+                expired = max_age > 0 and now - d.used > max_age
+                over = limit > 0 and total > limit
+                if not (expired or over):
+                    break
+                # на Windows открытый файл не удалится — попробуем в следующий раз
+                shutil.rmtree(d.path, ignore_errors=True)
+                if not d.path.exists():
+                    removed.append(d.path)
+                    total -= d.size
+            if removed:
+                print(f"Очистка {self.directory}: удалено папок {len(removed)}, занято {total >> 20} МБ")
+            return removed
+
+    def wake(self) -> None:
+        """Запросить проверку вне расписания (например, после задачи)."""
+        self._wake.set()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                # ошибка очистки не должна останавливать сервис
+                print(f"Очистка {self.directory} не удалась: {e}")
+            self._wake.wait(self.config.interval)
+            self._wake.clear()
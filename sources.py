@@ -0,0 +1,60 @@
+import os
+from io import BytesIO
+from pathlib import Path
+from tempfile import mkdtemp
+from time import time
+from typing import IO
+
+OUTPUT_DIR = Path("output")
+
+# путь (в том числе файл из gradio), содержимое файла или открытый поток
+Source = str | os.PathLike | bytes | bytearray | IO[bytes]
+
+
+def open_source(source: Source) -> Path | IO[bytes]:
+    """
+    Вход для Document / load_workbook / polars: путь остаётся путём,
+    байты оборачиваются в BytesIO, поток перематывается в начало.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        return BytesIO(source)
+    if isinstance(source, (str, os.PathLike)):
+        return Path(source)
+    source.seek(0)
+    return source
+
+
+def read_source(source: Source) -> bytes:
+    """Содержимое файла целиком."""
+    stream = open_source(source)
+    if isinstance(stream, Path):
+        return stream.read_bytes()
+    return stream.read()
+
+
+def source_name(source: Source, default: str) -> str:
+    """Имя файла для выходного документа; у байтов имени нет — берём default."""
+    if isinstance(source, (str, os.PathLike)):
+        return Path(source).name
+    name = getattr(source, "name", None)
+    return Path(name).name if isinstance(name, str) else default
+
+
+def new_output_dir(out_dir: Path = OUTPUT_DIR) -> Path:
+    """
+    Отдельная папка задачи: output/<timestamp>_<случайный суффикс>.
+    Задачи, начатые в одну секунду, не попадут в одну папку.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    return out_dir / Path(mkdtemp(prefix=f"{int(time())}_", dir=out_dir)).name
+
+
+def save_output(buffer: BytesIO, filename: str, out_dir: Path = OUTPUT_DIR) -> str:
+    """
+    Запись готового файла на диск — последний шаг, только для интерфейса,
+    которому нужен путь: output/<timestamp>_<суффикс>/<filename>.
+    """
+    tmp_dir = new_output_dir(out_dir)
+    tmp = tmp_dir / filename
+    tmp.write_bytes(buffer.getbuffer())
+    return str(tmp)
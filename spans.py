@@ -0,0 +1,272 @@
+"""
+Замеры этапов задачи: именованные интервалы (span) и журнал задачи в JSON.
+
+    with job_trace("make_word", files=[...]) as trace:
+        ...
+        with span("load_excel", sheets=3):
+            ...
+    trace.summary()  # "Всего 1.42 с: чтение Excel 0.31 с, ..."
+
+Вне job_trace span ничего не делает, поэтому этапы размечаются прямо
+в библиотечных функциях (format_numbers, add_table_to_cell, ...).
+"""
+from __future__ import annotations
+
+import json
+import sys
+import tomllib
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date
+from pathlib import Path
+from time import perf_counter, time
+from typing import Iterator, Literal, NamedTuple
+from uuid import uuid4
+
+# названия этапов для сводки в интерфейсе; прочие показываются как есть
+STAGES = {
+    "load_excel": "чтение Excel",
+    "parse_docx": "разбор Word",
+    "locate_markers": "поиск маркеров",
+    "format_numbers": "форматирование чисел",
+    "build_table": "таблицы",
+    "copy_sheets": "перенос листов",
+    "save": "сохранение",
+    "rewrite_docx": "потоковая запись Word",
+}
+
+
+ProfileMode = Literal["off", "cprofile", "tracemalloc"]
+
+
+# NamedTuple, а не pydantic: spans импортируют лёгкие модули (task_four, formatting),
+# им нельзя тянуть pydantic при запуске (bench/bench_importtime.py)
+class ProfileConfig(NamedTuple):
+    # папка журналов: jobs-<дата>.jsonl, по строке на задачу; не задана — журнал не пишется
+    log_dir: Path | None = Path("logs")
+    # профиль задачи в log_dir: cprofile — <id>.prof, tracemalloc — <id>.memory.txt
+    mode: ProfileMode = "off"
+
+
+def peak_mb() -> float:
+    """Максимальный RSS процесса на сейчас, МБ (на Windows — пик tracemalloc, если включён)."""
+    try:
+        import resource
+    except ImportError:
+        import tracemalloc
+
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт КБ, macOS — байты
+    return peak / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+def _tracing() -> bool:
+    # tracemalloc уже загружен, если его кто-то запустил
+    module = sys.modules.get("tracemalloc")
+    return module is not None and module.is_tracing()
+
+
+class JobTrace:
+    """
+    Интервалы одной задачи в порядке начала; memory — пик памяти каждого:
+    при включённом tracemalloc — пик выделений Python внутри интервала
+    (вложенные входят во внешний), иначе — пик RSS процесса к его концу.
+    """
+
+    def __init__(self, job: str, memory: bool = False, **meta) -> None:
+        self.id = f"{int(time())}_{uuid4().hex[:8]}"
+        self.job = job
+        self.meta = meta
+        self.memory = memory
+        self.spans: list[dict] = []
+        self.status = "ok"
+        self.error: str | None = None
+        self.started = time()
+        self._start = perf_counter()
+        self.seconds = 0.0
+        self._depth = 0
+        # пики tracemalloc открытых интервалов, байт (memory при включённом tracemalloc)
+        self._peaks: list[int] = []
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[dict]:
+        record = {"name": name, "depth": self._depth, "start": round(perf_counter() - self._start, 6)}
+        record.update(attrs)
+        self.spans.append(record)
+        self._depth += 1
+        traced = self.memory and _tracing()
+        if traced:
+            self._enter_peak()
+        start = perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = round(perf_counter() - start, 6)
+            if traced:
+                record["peak_mb"] = round(self._exit_peak() / 2**20, 1)
+            elif self.memory:
+                record["peak_mb"] = round(peak_mb(), 1)
+            self._depth -= 1
+
+    def _enter_peak(self) -> None:
+        import tracemalloc
+
+        # пик до этой точки принадлежит внешнему интервалу; счётчик — заново для нового
+        if self._peaks:
+            self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        self._peaks.append(0)
+
+    def _exit_peak(self) -> int:
+        import tracemalloc
+
+        peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+        if self._peaks:
+            self._peaks[-1] = max(self._peaks[-1], peak)
+        return peak
+
+    def finish(self, error: BaseException | None = None) -> None:
+        self.seconds = perf_counter() - self._start
+        if error is not None:
+            self.status = "failed"
+            self.error = "".join(traceback.format_exception_only(error)).strip()
+
+    def totals(self) -> dict[str, float]:
+        """
+        Суммарное время по названиям этапов, в порядке первого появления.
+        Время вложенного этапа не входит во время внешнего: сумма не больше общего времени.
+        """
+        own = [record.get("seconds", 0.0) for record in self.spans]
+        parents: list[int] = []
+        for i, record in enumerate(self.spans):
+            del parents[record["depth"]:]
+            if parents:
+                own[parents[-1]] -= own[i]
+            parents.append(i)
+        totals: dict[str, float] = {}
+        for record, seconds in zip(self.spans, own):
+            totals[record["name"]] = totals.get(record["name"], 0.0) + seconds
+        return totals
+
+    def peaks(self) -> dict[str, float]:
+        """Наибольший пик памяти (peak_mb) по названиям этапов; пусто без memory."""
+        peaks: dict[str, float] = {}
+        for record in self.spans:
+            if "peak_mb" in record:
+                peaks[record["name"]] = max(peaks.get(record["name"], 0.0), record["peak_mb"])
+        return peaks
+
+    def summary(self) -> str:
+        stages = ", ".join(
+            f"{STAGES.get(name, name)} {seconds:.2f} с" for name, seconds in self.totals().items()
+        )
+        return f"Всего {self.seconds:.2f} с" + (f": {stages}" if stages else "")
+
+    def record(self) -> dict:
+        return {
+            "id": self.id,
+            "job": self.job,
+            "started": self.started,
+            "seconds": round(self.seconds, 6),
+            "status": self.status,
+            "error": self.error,
+            "meta": self.meta,
+            "totals": {name: round(s, 6) for name, s in self.totals().items()},
+            "spans": self.spans,
+        }
+
+
+_current: ContextVar[JobTrace | None] = ContextVar("job_trace", default=None)
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[dict | None]:
+    """Этап текущей задачи; без job_trace — пустой контекст."""
+    trace = _current.get()
+    if trace is None:
+        yield None
+        return
+    with trace.span(name, **attrs) as record:
+        yield record
+
+
+def load_config() -> ProfileConfig:
+    try:
+        with open("config.toml", "rb") as f:
+            section = tomllib.load(f).get("profile", {})
+    except FileNotFoundError:
+        return ProfileConfig()
+    mode = section.get("mode", "off")
+    if mode not in ProfileMode.__args__:
+        raise ValueError(f"[profile] mode: ожидается одно из {ProfileMode.__args__}, получено {mode!r}")
+    log_dir = section.get("log_dir", "logs")
+    return ProfileConfig(Path(log_dir) if log_dir else None, mode)
+
+
+@contextmanager
+def job_trace(job: str, config: ProfileConfig | None = None, memory: bool = False, **meta) -> Iterator[JobTrace]:
+    """
+    Замеры задачи: включает span, по завершении (и при ошибке) дописывает
+    запись в журнал и, если задан mode, сохраняет профиль задачи.
+    """
+    config = config or load_config()
+    trace = JobTrace(job, memory=memory, **meta)
+    token = _current.set(trace)
+    profiler = _start_profiler(config.mode)
+    try:
+        yield trace
+    except BaseException as e:
+        trace.finish(e)
+        raise
+    else:
+        trace.finish()
+    finally:
+        _current.reset(token)
+        _stop_profiler(profiler, config.mode, config.log_dir, trace.id)
+        if config.log_dir is not None:
+            write_log(trace, config.log_dir)
+
+
+def write_log(trace: JobTrace, log_dir: Path) -> Path:
+    log_dir.mkdir(parents=True, exist_ok=True)
+    path = log_dir / f"jobs-{date.fromtimestamp(trace.started).isoformat()}.jsonl"
+    # одна запись — одна строка одним write: строки процессов не перемешиваются
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(trace.record(), ensure_ascii=False) + "\n")
+    return path
+
+
+def _start_profiler(mode: str):
+    if mode == "cprofile":
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    if mode == "tracemalloc":
+        import tracemalloc
+
+        tracemalloc.start(25)
+    return None
+
+
+def _stop_profiler(profiler, mode: str, log_dir: Path | None, name: str) -> None:
+    if mode == "cprofile":
+        profiler.disable()
+        if log_dir is not None:
+            log_dir.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(log_dir / f"{name}.prof")
+    elif mode == "tracemalloc":
+        import tracemalloc
+
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if log_dir is None:
+            return
+        log_dir.mkdir(parents=True, exist_ok=True)
+        lines = [f"current {current / 2**20:.1f} MB, peak {peak / 2**20:.1f} MB"]
+        lines += [str(stat) for stat in snapshot.statistics("lineno")[:50]]
+        (log_dir / f"{name}.memory.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
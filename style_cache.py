@@ -0,0 +1,42 @@
+from copy import copy
+
+from openpyxl.cell.cell import Cell
+from openpyxl.styles.cell_style import StyleArray
+
+
+class StyleCache:
+    """
+    Интернирование стилей при копировании ячеек openpyxl между книгами.
+
+    Стиль ячейки в openpyxl — массив номеров (StyleArray) в таблицах книги.
+    Первый раз стиль источника переносится обычным присваиванием
+    font/border/fill/…, полученный массив номеров цели запоминается;
+    дальше ячейке сразу ставится готовый массив, без копий и поиска
+    в таблицах стилей. Кэш действует для одной пары книг (источник, цель).
+    """
+
+    def __init__(self) -> None:
+        self._styles: dict[tuple[int, ...], StyleArray] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def apply(self, src: Cell, dst: Cell) -> None:
+        """Оформление src на dst: шрифт, границы, заливка, формат числа, защита, выравнивание."""
+        key = tuple(src._style)
+        style = self._styles.get(key)
+        if style is None:
+            self.misses += 1
+            dst.font = copy(src.font)
+            dst.border = copy(src.border)
+            dst.fill = copy(src.fill)
+            # Прямо присваиваем строковый код формата
+            dst.number_format = src.number_format
+            dst.protection = copy(src.protection)
+            dst.alignment = copy(src.alignment)
+            self._styles[key] = copy(dst._style)
+            return
+        self.hits += 1
+        dst._style = copy(style)
+
+    def __repr__(self) -> str:
+        return f"StyleCache(styles={len(self._styles)}, hits={self.hits}, misses={self.misses})"
@@ -0,0 +1,172 @@
+from copy import deepcopy
+from typing import Iterable, Sequence
+
+import polars as pl
+from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+from docx.oxml.table import CT_Tbl
+from docx.shared import Emu, Inches, Length
+from docx.table import Table, _Cell
+
+from spans import span
+
+TABLE_STYLE = "Table Grid"
+_T_OPEN = '<w:t xml:space="preserve">'
+
+
+def _run_xml(text: pl.Expr) -> pl.Expr:
+    """
+    `w:r` с текстом ячейки, как при cell.text = text в python-docx:
+    табуляция -> w:tab, переводы строк -> w:br, пустая строка -> пустой run.
+    xml:space="preserve" ставится только там, где он нужен: lxml заметно
+    дольше переносит в документ элементы с атрибутами из пространства xml.
+    """
+    escaped = (
+        text.str.replace_all("&", "&amp;", literal=True)
+        .str.replace_all("<", "&lt;", literal=True)
+        .str.replace_all(">", "&gt;", literal=True)
+    )
+    special = (
+        escaped.str.replace_all("\t", f"</w:t><w:tab/>{_T_OPEN}", literal=True)
+        .str.replace_all("\n", f"</w:t><w:br/>{_T_OPEN}", literal=True)
+        .str.replace_all("\r", f"</w:t><w:br/>{_T_OPEN}", literal=True)
+    )
+    return (
+        pl.when(text == "")
+        .then(pl.lit("<w:r/>"))
+        .when(text.str.contains(r"^\s|\s$|[\t\n\r]"))
+        .then(pl.concat_str([pl.lit(f"<w:r>{_T_OPEN}"), special, pl.lit("</w:t></w:r>")]))
+        .otherwise(pl.concat_str([pl.lit("<w:r><w:t>"), escaped, pl.lit("</w:t></w:r>")]))
+    )
+
+
+def _rows_xml(df: pl.DataFrame, col_width: Length) -> str:
+    """Все строки `w:tr` текстового DataFrame одной строкой XML, без цикла по ячейкам."""
+    if df.height == 0:
+        return ""
+    tc_open = pl.lit(
+        f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{col_width.twips}"/></w:tcPr>'
+        '<w:p><w:pPr><w:ind w:left="0" w:firstLine="0"/></w:pPr>'
+    )
+    tc_close = pl.lit("</w:p></w:tc>")
+    cells = []
+    for name in df.columns:
+        text = pl.col(name).cast(pl.String).fill_null("")
+        cells += [tc_open, _run_xml(text), tc_close]
+    tr = pl.concat_str([pl.lit("<w:tr>"), *cells, pl.lit("</w:tr>")])
+    return df.select(tr.str.join("")).item()
+
+
+def table_xml(df: pl.DataFrame, width: Length, style_id: str | None = None) -> str:
+    """
+    XML готовой таблицы `w:tbl`: шапка из имён столбцов и строки df
+    (уже отформатированный текст, см. formatting.format_numbers),
+    ширина поровну между столбцами, у всех абзацев нулевые отступы.
+    """
+    cols = df.width
+    col_width = Emu(width // cols) if cols > 0 else Emu(0)
+    header = pl.DataFrame(
+        [[str(col).strip() for col in df.columns]], schema=df.columns, orient="row"
+    )
+    style = f'<w:tblStyle w:val="{style_id}"/>' if style_id else ""
+    grid = f'<w:gridCol w:w="{col_width.twips}"/>' * cols
+    return (
+        f"<w:tbl {nsdecls('w')}>"
+        f"<w:tblPr>{style}"
+        '<w:tblW w:type="auto" w:w="0"/>'
+        '<w:jc w:val="left"/>'
+        '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0"'
+        ' w:noHBand="0" w:noVBand="1" w:val="04A0"/>'
+        f"</w:tblPr><w:tblGrid>{grid}</w:tblGrid>"
+        f"{_rows_xml(header, col_width)}{_rows_xml(df, col_width)}"
+        "</w:tbl>"
+    )
+
+
+def build_table(df: pl.DataFrame, width: Length, style_id: str | None = None) -> CT_Tbl:
+    """Элемент `w:tbl` из DataFrame, собранный за один проход."""
+    return parse_xml(table_xml(df, width, style_id))
+
+
+class TableGrid:
+    """
+    Сетка ячеек таблицы, разобранная один раз.
+
+    Раскладка та же, что у Table.cell: ячейка с gridSpan занимает
+    несколько столбцов, продолжение вертикального объединения (vMerge)
+    отдаёт ячейку строки выше. Но Table.cell пересобирает всю сетку
+    на каждый вызов, а здесь cell и text — обращение к списку. Строки
+    добавляются пачкой (add_rows), столбец пишется одним вызовом
+    (write_column). Изменения таблицы в обход TableGrid сетка не видит.
+    """
+
+    def __init__(self, table: Table) -> None:
+        self.table = table
+        self.columns = table._column_count
+        self.rows = len(table._tbl.tr_lst)
+        self._cells = table._cells
+        self._texts: dict = {}
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def cell(self, row: int, col: int) -> _Cell:
+        return self._cells[col + row * self.columns]
+
+    def text(self, row: int, col: int) -> str:
+        """Текст ячейки, как cell.text; запоминается до записи через write_column."""
+        cell = self.cell(row, col)
+        text = self._texts.get(cell._tc)
+        if text is None:
+            text = self._texts[cell._tc] = cell.text
+        return text
+
+    def add_rows(self, count: int) -> None:
+        """count пустых строк в конец таблицы, как столько же вызовов Table.add_row."""
+        if count <= 0:
+            return
+        tbl = self.table._tbl
+        tr = tbl.add_tr()
+        for grid_col in tbl.tblGrid.gridCol_lst:
+            tc = tr.add_tc()
+            if grid_col.w is not None:
+                tc.width = grid_col.w
+        added = [tr]
+        for _ in range(count - 1):
+            clone = deepcopy(tr)
+            added[-1].addnext(clone)
+            added.append(clone)
+        for tr in added:
+            self._cells.extend(_Cell(tc, self.table) for tc in tr.tc_lst)
+        self.rows += count
+
+    def write_column(self, col: int, rows: Sequence[int], values: Iterable[str]) -> None:
+        """Тексты values в столбец col строк rows по порядку (лишнее из длинного отбрасывается)."""
+        for row, value in zip(rows, values):
+            cell = self.cell(row, col)
+            cell.text = value
+            self._texts.pop(cell._tc, None)
+
+
+def add_table_to_cell(cell: _Cell, df: pl.DataFrame, style: str = TABLE_STYLE) -> Table:
+    """
+    Замена cell.add_table + построчного заполнения: вложенная таблица
+    с шапкой из df в конце ячейки, как это делает python-docx.
+    """
+    style_id = cell.part.get_style_id(style, WD_STYLE_TYPE.TABLE)
+    return Table(append_table(cell, df, style_id), cell)
+
+
+def append_table(cell: _Cell, df: pl.DataFrame, style_id: str | None) -> CT_Tbl:
+    """
+    То же, что add_table_to_cell, со стилем по готовому идентификатору:
+    для ячеек без part (docx_stream).
+    """
+    with span("build_table", rows=df.height, columns=df.width):
+        width = cell.width if cell.width is not None else Inches(1)
+        tbl = build_table(df, width, style_id)
+        cell._tc._insert_tbl(tbl)
+        # Word требует абзац последним элементом ячейки (как cell.add_paragraph())
+        cell._tc.add_p()
+        return tbl
@@ -1,62 +1,178 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-import openpyxl
 import polars as pl
 from tqdm import tqdm
 
-def extract_spec_tables(xlsx_path: Path) -> list[pl.DataFrame]:
-    wb = openpyxl.load_workbook(xlsx_path, data_only=True, read_only=True, keep_links=False)
-    tables: list[pl.DataFrame] = []
-
-    for sheet_name in tqdm(wb.sheetnames):
-        ws = wb[sheet_name]
-
-        # Пройдемся по всем строкам, чтобы найти заголовки таблиц
-        for row in ws.iter_rows(values_only=False):
-            for cell in row:
-                val = cell.value
-                if val and isinstance(val, str) and val.startswith("spec_"):
-                    start_row = cell.row
-                    start_col = cell.column  # это номер, не буква
-
-                    # Считываем имена 4 столбцов из строки-заголовка
-                    headers = []
-                    for offset in range(4):
-                        hdr_cell = ws.cell(row=start_row, column=start_col + offset)
-                        headers.append(str(hdr_cell.value or "").strip())
-
-                    # Собираем данные до первого полностью пустого ряда
-                    data_rows = []
-                    curr_row = start_row + 1
-                    while True:
-                        row_vals = []
-                        # забираем все 4 колонки
-                        for offset in range(4):
-                            v = ws.cell(row=curr_row, column=start_col + offset).value
-                            row_vals.append(v)
-                        # если все четыре ячейки пустые — это конец таблицы
-                        if all(v is None for v in row_vals):
-                            break
-                        data_rows.append(row_vals)
-                        curr_row += 1
-
-                    # Если под заголовком были данные, делаем DataFrame
-                    if data_rows:
-                        # соберём dict из списков по колонкам
-                        cols = {headers[i]: [str(row[i]) for row in data_rows] for i in range(4)}
-                        df = pl.DataFrame(cols)
-                        df = df.filter((pl.nth(-1) != "0") & (pl.nth(-2) != "0"))
-                        short_df = df.select(pl.nth(-1), pl.nth(-2)).with_columns(pl.all().replace("None", None))
-                        short_df = short_df[[s.name for s in short_df if not (s.null_count() == short_df.height)]]
-                        # по желанию можно добавить колонку с именем листа
-                        if not short_df.is_empty() and not df.is_empty():
-                            tables.append(df.with_columns(pl.lit(sheet_name).alias("__sheetname__")))
-
-                    # пропускаем остальные ячейки в этой же строке,
-                    # чтобы не дублировать одну и ту же таблицу
-                    break
+from xlsx_stream import XlsxReader
 
+SPEC_PREFIX = "spec_"
+# ширина таблицы spec_: заголовок и три столбца справа от него
+SPEC_WIDTH = 4
+
+
+def _spec_frame(headers: list[str], data_rows: list[list], sheet_name: str) -> pl.DataFrame | None:
+    """DataFrame таблицы spec_ с прежней фильтрацией нулевых и пустых строк."""
+    if not data_rows:
+        return None
+    # соберём dict из списков по колонкам
+    cols = {headers[i]: [str(row[i]) for row in data_rows] for i in range(SPEC_WIDTH)}
+    df = pl.DataFrame(cols)
+    df = df.filter((pl.nth(-1) != "0") & (pl.nth(-2) != "0"))
+    short_df = df.select(pl.nth(-1), pl.nth(-2)).with_columns(pl.all().replace("None", None))
+    short_df = short_df[[s.name for s in short_df if not (s.null_count() == short_df.height)]]
+    # по желанию можно добавить колонку с именем листа
+    if not short_df.is_empty() and not df.is_empty():
+        return df.with_columns(pl.lit(sheet_name).alias("__sheetname__"))
+    return None
+
+
+class _OpenTable:
+    """Таблица spec_, строки которой ещё читаются."""
+
+    def __init__(self, row: int, col: int, headers: list[str]) -> None:
+        self.next_row = row + 1
+        self.col = col
+        self.headers = headers
+        self.rows: list[list] = []
+        self.open = True
+
+
+def _sheet_spec_tables(
+    reader: XlsxReader, sheet_name: str, strings: dict[int, str], spec_ids: set[int]
+) -> list[pl.DataFrame]:
+    """
+    Таблицы spec_ листа за один потоковый проход.
+
+    Заголовок — первая ячейка строки с текстом spec_… (ищется по номерам
+    общих строк, без разбора остальных ячеек); данные — SPEC_WIDTH столбцов
+    до первой полностью пустой строки. Несколько таблиц читаются одновременно.
+    """
+    found: list[_OpenTable] = []
+    active: list[_OpenTable] = []
+
+    def close_missing(row_idx: int) -> None:
+        # пропущенная в XML строка пустая — таблица, ждавшая её, закончилась
+        for table in active:
+            if table.next_row < row_idx:
+                table.open = False
+
+    for row_idx, row in reader.iter_row_elements(sheet_name):
+        close_missing(row_idx)
+        active = [t for t in active if t.open]
+        row_cells = reader.read_cells(row)
+        header = None
+        for cell in row_cells:
+            if cell.type == "s" and cell.value is not None and int(cell.value) in spec_ids:
+                header = cell
+            elif cell.type in ("inlineStr", "str") and (cell.value or "").startswith(SPEC_PREFIX):
+                header = cell
+            if header is not None:
+                break
+        if not active and header is None:
+            continue
+        cells = {cell.col: cell for cell in row_cells}
+
+        for table in active:
+            row_vals = [
+                reader.value(cells.get(table.col + offset), strings)
+                for offset in range(SPEC_WIDTH)
+            ]
+            # если все четыре ячейки пустые — это конец таблицы
+            if all(v is None for v in row_vals):
+                table.open = False
+                continue
+            table.rows.append(row_vals)
+            table.next_row += 1
+
+        if header is not None:
+            # Считываем имена 4 столбцов из строки-заголовка
+            headers = [
+                str(reader.value(cells.get(header.col + offset), strings) or "").strip()
+                for offset in range(SPEC_WIDTH)
+            ]
+            table = _OpenTable(row_idx, header.col, headers)
+            found.append(table)
+            active.append(table)
+
+    tables = []
+    for table in found:
+        df = _spec_frame(table.headers, table.rows, sheet_name)
+        if df is not None:
+            tables.append(df)
     return tables
 
+
+# меньше листов или байт — пул процессов не окупает свой запуск
+PARALLEL_MIN_SHEETS = 4
+PARALLEL_MIN_BYTES = 1 << 20
+
+# состояние процесса-исполнителя: книга открывается один раз на процесс
+_worker: tuple[XlsxReader, dict[int, str], set[int]] | None = None
+
+
+def _open_book(xlsx_path: Path | bytes) -> tuple[XlsxReader, dict[int, str], set[int]]:
+    reader = XlsxReader(xlsx_path)
+    strings = reader.shared_strings()
+    spec_ids = {i for i, text in strings.items() if text.startswith(SPEC_PREFIX)}
+    return reader, strings, spec_ids
+
+
+def _init_worker(xlsx_path: Path | bytes) -> None:
+    global _worker
+    _worker = _open_book(xlsx_path)
+
+
+def _worker_sheet(sheet_name: str) -> list[pl.DataFrame]:
+    return _sheet_spec_tables(_worker[0], sheet_name, *_worker[1:])
+
+
+def _book_size(xlsx_path: Path | bytes) -> int:
+    return len(xlsx_path) if isinstance(xlsx_path, bytes) else Path(xlsx_path).stat().st_size
+
+
+def extract_spec_tables(xlsx_path: Path | bytes, workers: int | None = None) -> list[pl.DataFrame]:
+    """
+    Все таблицы spec_ книги в порядке листов и строк.
+    Каждый лист читается один раз потоком; общие строки — один раз на книгу.
+
+    workers — число процессов (по умолчанию по числу ядер): листы делятся
+    между процессами, каждый открывает книгу сам. Небольшие книги
+    (PARALLEL_MIN_SHEETS, PARALLEL_MIN_BYTES) читаются в текущем процессе.
+    """
+    reader, strings, spec_ids = _open_book(xlsx_path)
+    with reader:
+        sheet_names = reader.sheet_names
+        workers = min(workers or os.cpu_count() or 1, len(sheet_names))
+        if (
+            workers <= 1
+            or len(sheet_names) < PARALLEL_MIN_SHEETS
+            or _book_size(xlsx_path) < PARALLEL_MIN_BYTES
+        ):
+            tables: list[pl.DataFrame] = []
+            for sheet_name in tqdm(sheet_names):
+                tables += _sheet_spec_tables(reader, sheet_name, strings, spec_ids)
+            return tables
+
+    # листы раздаются по одному, результат собирается по номеру листа:
+    # порядок таблиц тот же, что и при последовательном чтении
+    results: list[list[pl.DataFrame]] = [[] for _ in sheet_names]
+    # spawn, а не fork: форк процесса с уже запущенными потоками polars может зависнуть
+    with ProcessPoolExecutor(
+        workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(xlsx_path,),
+    ) as pool:
+        futures = {pool.submit(_worker_sheet, name): i for i, name in enumerate(sheet_names)}
+        # общий прогресс по всем процессам: лист засчитывается, когда готов
+        with tqdm(total=len(sheet_names)) as progress:
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                progress.update()
+    return [df for sheet_tables in results for df in sheet_tables]
+
 if __name__ == "__main__":
     ORIGIN_PATH = Path("шаблоны/task6")  # Укажите ваш путь
     path = ORIGIN_PATH / 'Отчет-МСФО-6-2024-Индо.xlsx'
@@ -1,88 +1,168 @@
-from docx.text.paragraph import Paragraph
-from docx.table import Table
-from docx import Document
-from docx.enum.table import WD_TABLE_ALIGNMENT
-from docx.shared import Pt
-import polars as pl
-from humanize import intcomma
-from pathlib import Path
-from time import time
-
-START_PART = "_ВСТАВКА_"
-OUTPUT_DIR = Path("output")
-OUTPUT_DIR.mkdir(exist_ok=True)
+from __future__ import annotations
+
+from io import BytesIO
+from typing import TYPE_CHECKING
+from markers import START_PART
+from sources import Source, save_output, source_name
+from spans import span
+
+# python-docx и polars импортируются при первом запуске задачи
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+    import polars as pl
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
+    from report_sheets import ReportSheets
 
 def insert_table_after(paragraph: Paragraph, df: pl.DataFrame, marker: str = START_PART) -> Table:
     """
     Вставляет таблицу сразу после параграфа с маркером.
+    df уже отформатирован (report_table), значения — готовый текст.
     """
-    # 1. Убираем маркер из текста параграфа
-    if marker in paragraph.text:
-        paragraph.text = paragraph.text.replace(marker, "").strip()
+    from docx.enum.style import WD_STYLE_TYPE
+
+    from tables import TABLE_STYLE, table_xml
 
-    # 2. Создаем новую таблицу
-    rows = df.height + 1  # +1 на заголовок
-    cols = df.width
     # Вычисляем доступную ширину страницы и используем ее для создания таблицы
     section = paragraph.part.document.sections[0]
     available_width = section.page_width - section.left_margin - section.right_margin
-    table = paragraph._parent.add_table(rows=rows, cols=cols, width=available_width)
-    table.style = "Table Grid"
-    table.alignment = WD_TABLE_ALIGNMENT.LEFT
-
-    # 3. Перемещаем таблицу в нужное место (после параграфа)
-    p = paragraph._element
-    parent = p.getparent()
-    parent.insert(parent.index(p) + 1, table._element)
-
-    # 4. Заполняем таблицу данными
-    # Шапка
-    hdr_cells = table.rows[0].cells
-    for i, col in enumerate(df.columns):
-        hdr_cells[i].text = str(col).strip()
-
-    # Данные - ИСПРАВЛЕНА ЛОГИКА ЗАПОЛНЕНИЯ
-    for i, data_row in enumerate(df.iter_rows()):
-        row_cells = table.rows[i + 1].cells  # Используем существующие строки, а не добавляем новые
-        for j, val in enumerate(data_row):
-            text = str(val).strip() if val is not None else ""
-            try:
-                text = intcomma(str(val).strip()).replace(",", " ").replace(".", ",") if j - len(data_row) >= -4 else str(val).strip()
-            except (ValueError, TypeError):
-                pass  # Оставляем как есть, если не число
-            row_cells[j].text = text
-
-    # 5. Убираем отступы
-    for row in table.rows:
-        for cell in row.cells:
-            for p_cell in cell.paragraphs:
-                p_cell.paragraph_format.first_line_indent = Pt(0)
-                p_cell.paragraph_format.left_indent = Pt(0)
-
-    return table
+    style_id = paragraph.part.get_style_id(TABLE_STYLE, WD_STYLE_TYPE.TABLE)
+    return splice_table_after(paragraph, table_xml(df, available_width, style_id), marker)
 
 
-def insert_tables_with_filter(word_filename: str, excel_filename: str):
-    timestamp = str(int(time()))
-    tmp_dir = OUTPUT_DIR / timestamp
-    tmp_dir.mkdir()
+def splice_table_after(paragraph: Paragraph, xml: str, marker: str = START_PART) -> Table:
+    """Готовый XML таблицы (render_table) сразу после параграфа с маркером; маркер убирается."""
+    from docx.oxml import parse_xml
+    from docx.table import Table
+
+    # 1. Убираем маркер из текста параграфа
+    if marker in paragraph.text:
+        paragraph.text = paragraph.text.replace(marker, "").strip()
+    # 2. Таблица сразу после параграфа
+    tbl = parse_xml(xml)
+    paragraph._p.addnext(tbl)
+    return Table(tbl, paragraph._parent)
+
+
+def report_table(df: pl.DataFrame) -> pl.DataFrame:
+    """Лист (строки с нулями отброшены при чтении, report_sheets) как текст таблицы отчёта."""
+    from formatting import format_numbers
+
+    # последние четыре столбца — числовые
+    return format_numbers(df, columns=df.columns[-4:])
+
+
+def render_table(df: pl.DataFrame, width: int, style_id: str | None) -> str:
+    """XML таблицы отчёта для листа; выполняется и в процессах TableRenderer."""
+    from docx.shared import Emu
+
+    from tables import table_xml
+
+    return table_xml(report_table(df), Emu(width), style_id)
+
+
+class TableRenderer:
+    """
+    XML таблиц отчёта по листам книги в порядке меток: get(i) — таблица
+    листа i. При workers > 1 таблицы (форматирование чисел и сборка XML)
+    собираются в процессах, на workers листов вперёд; основной процесс
+    только вставляет готовые строки по порядку, поэтому документ
+    байт в байт совпадает с последовательным запуском.
+    """
+
+    def __init__(self, sheets: ReportSheets, width: int, style_id: str | None, workers: int = 1) -> None:
+        self.sheets = sheets
+        self.width = int(width)
+        self.style_id = style_id
+        self.workers = min(workers, len(sheets))
+        self._pool = None
+        self._pending: dict[int, Future] = {}
+        self._next = 0
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, i: int) -> str:
+        from docx.shared import Emu
+
+        from tables import table_xml
+
+        name = self.sheets.names[i]
+        if self.workers <= 1:
+            df = report_table(self.sheets.sheet(i))
+            with span("build_table", sheet=name, rows=df.height, columns=df.width):
+                return table_xml(df, Emu(self.width), self.style_id)
+        if self._pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # spawn, а не fork: в процессе уже работают потоки polars и чтения листов
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        self._next = max(self._next, i)
+        while self._next < min(i + 1 + self.workers, len(self.sheets)):
+            df = self.sheets.sheet(self._next)
+            self._pending[self._next] = self._pool.submit(render_table, df, self.width, self.style_id)
+            self._next += 1
+        with span("build_table", sheet=name, workers=self.workers):
+            future = self._pending.pop(i, None)
+            if future is None:
+                return render_table(self.sheets.sheet(i), self.width, self.style_id)
+            return future.result()
+
 
-    word_filename: Path = Path(str(word_filename))
-    excel_filename: Path = Path(str(excel_filename))  
+def insert_tables_with_filter(word_filename: str, excel_filename: str):
     try:
-        doc = Document(word_filename)
-        # sheet_id=0 читает все листы
-        dfs_dict = pl.read_excel(excel_filename, sheet_id=0, infer_schema_length=0,
-                                 read_options={"header_row": 2})
+        buffer = insert_tables_with_filter_io(word_filename, excel_filename)
     except FileNotFoundError as e:
         print(f"Ошибка: Файл не найден - {e}")
         return
+    if buffer is None:
+        return
+    return save_output(buffer, f"выход_{source_name(word_filename, 'document.docx')}")
+
+
+def insert_tables_with_filter_io(word: Source, excel: Source) -> BytesIO | None:
+    """
+    Таблицы отчёта целиком в памяти: на входе пути, байты или потоки,
+    на выходе готовый docx (None, если вставлять нечего).
+    """
+    from docx_stream import load_config
+    from report_sheets import ReportSheets
+
+    # листы читаются по одному, когда до них дошла очередь (следующие — в фоне);
+    # повторная задача с той же книгой берёт их из кэша
+    with span("load_excel"):
+        sheets = ReportSheets(excel)
+    with sheets:
+        print(f"Найденные листы в Excel: {sheets.names}")
+        if load_config().engine == "stream":
+            return _insert_tables_stream(word, sheets)
+        return _insert_tables_docx(word, sheets)
+
+
+def _insert_tables_docx(word: Source, sheets: ReportSheets) -> BytesIO | None:
+    """Таблицы отчёта через модель документа python-docx."""
+    from docx.enum.style import WD_STYLE_TYPE
 
-    sheet_names = list(dfs_dict.keys())
-    print(f"Найденные листы в Excel: {sheet_names}")
+    from package_writer import save_docx
+    from tables import TABLE_STYLE
+    from template_cache import template_cache
+
+    sheet_names = sheets.names
 
     # Сначала найдем все параграфы-плейсхолдеры, чтобы избежать проблем при итерации
-    placeholder_paragraphs = [p for p in doc.paragraphs if p.text.strip().startswith(START_PART)]
+    template = template_cache().get(word)
+    doc, index = template.open()
+    placeholder_paragraphs = [hit.paragraph for hit in index.markers(in_cells=False)]
 
     print(f"Найдено {len(placeholder_paragraphs)} меток для вставки таблиц в Word.")
 
@@ -99,17 +179,69 @@ def insert_tables_with_filter(word_filename: str, excel_filename: str):
     if len(placeholder_paragraphs) != len(sheet_names):
         print(f"Внимание: Количество меток ({len(placeholder_paragraphs)}) не совпадает с количеством листов ({len(sheet_names)}). Будет вставлено {tables_to_insert_count} таблиц.")
 
-    for i in range(tables_to_insert_count):
-        p = placeholder_paragraphs[i]
-        sheet_name = sheet_names[i]
-        df = dfs_dict.get(sheet_name).filter(~pl.any_horizontal(pl.nth(-1, -2, -3) == '0'))
+    # Вычисляем доступную ширину страницы и используем ее для всех таблиц
+    section = doc.sections[0]
+    available_width = section.page_width - section.left_margin - section.right_margin
+    style_id = doc.part.get_style_id(TABLE_STYLE, WD_STYLE_TYPE.TABLE)
+    with TableRenderer(sheets, available_width, style_id, sheets.config.workers) as tables:
+        for i in range(tables_to_insert_count):
+            splice_table_after(placeholder_paragraphs[i], tables.get(i))
+
+    with span("save"):
+        return save_docx(doc, template.source, changed=(doc.part,))
 
-        print(f"Вставка таблицы с листа '{sheet_name}'...")
-        insert_table_after(p, df)
 
-    tmp = tmp_dir / f"выход_{word_filename.name}"
-    tmp = tmp.relative_to(".")
+def _insert_tables_stream(word: Source, sheets: ReportSheets) -> BytesIO | None:
+    """
+    Таблицы отчёта потоковой записью document.xml (docx_stream): абзацы
+    с меткой заменяются по мере чтения, XML таблицы пишется сразу строкой,
+    документ целиком не разбирается.
+    """
+    from contextlib import ExitStack
+
+    from docx.oxml.ns import qn
+    from docx.text.paragraph import Paragraph
 
-    doc.save(tmp)
-    return str(tmp)
+    from docx_stream import DocxRewriter
+    from markers import iter_markers
+    from tables import TABLE_STYLE
 
+    sheet_names = sheets.names
+    if not sheet_names:
+        print("В Excel файле не найдено листов для вставки.")
+        return
+    placeholders = 0
+    tables: TableRenderer | None = None
+
+    def replace(element):
+        nonlocal placeholders, tables
+        if element.tag != qn("w:p") or not any(iter_markers(element)):
+            return None
+        i = placeholders
+        placeholders += 1
+        if i >= len(sheet_names):
+            return None
+        if tables is None:
+            # стиль ищется при первой таблице: без меток он не нужен
+            tables = stack.enter_context(
+                TableRenderer(sheets, width, docx.style_id(TABLE_STYLE), sheets.config.workers)
+            )
+        # 1. Убираем маркер из текста параграфа; 2. таблица сразу после него
+        paragraph = Paragraph(element, None)
+        paragraph.text = paragraph.text.replace(START_PART, "").strip()
+        return [element, tables.get(i)]
+
+    with DocxRewriter(word) as docx, ExitStack() as stack:
+        with span("parse_docx", engine="stream"):
+            # ширина страницы нужна до первой таблицы, а раздел описан в конце документа
+            width = docx.section_width()
+        with span("rewrite_docx"):
+            buffer = docx.rewrite(replace, needle=START_PART)
+
+    print(f"Найдено {placeholders} меток для вставки таблиц в Word.")
+    if not placeholders:
+        print(f"В документе не найдено меток для вставки таблиц. Проверьте текст на наличие '{START_PART}'.")
+        return
+    if placeholders != len(sheet_names):
+        print(f"Внимание: Количество меток ({placeholders}) не совпадает с количеством листов ({len(sheet_names)}). Будет вставлено {min(placeholders, len(sheet_names))} таблиц.")
+    return buffer
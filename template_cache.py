@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import hashlib
+import tomllib
+from collections import OrderedDict
+from copy import deepcopy
+from io import BytesIO
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable
+
+from pydantic import BaseModel, ValidationError
+
+from markers import DocumentMarkerIndex
+from sources import Source, read_source
+from spans import span
+
+if TYPE_CHECKING:
+    from docx.document import Document as DocumentObject
+
+# меняется вместе с форматом TemplatePlan и разметкой DocumentMarkerIndex.locations
+PLAN_VERSION = 2
+
+# строки таблиц шаблона, вычисленные один раз при компиляции: имя → номера строк
+RowsPlan = Callable[["DocumentObject", DocumentMarkerIndex], dict[str, list[int]]]
+
+
+class TemplateConfig(BaseModel):
+    # скомпилированных шаблонов в памяти каждого процесса; 0 — без кэша
+    size: int = 16
+    # папка для планов шаблонов (переживают перезапуск); не задана — только память
+    directory: Path | None = None
+
+
+class TemplatePlan(BaseModel):
+    """Результат разбора шаблона, не зависящий от данных задачи."""
+
+    digest: str
+    needles: tuple[str, ...]
+    # DocumentMarkerIndex.locations(): где стоят маркеры
+    locations: dict
+    # геометрия таблиц и строки, которые задача заполняет или пропускает
+    rows: dict[str, list[int]] = {}
+
+
+class CompiledTemplate:
+    """
+    Разобранный шаблон Word и его план.
+
+    Дерево шаблона не меняется: open() отдаёт задаче копию части
+    word/document.xml, остальные части пакета (стили, колонтитулы,
+    картинки) общие — задачи их только читают. source — байты docx
+    шаблона: при сохранении неизменённые части копируются из них.
+    """
+
+    def __init__(
+        self, document: DocumentObject, plan: TemplatePlan, shared: bool = True, source: bytes | None = None
+    ):
+        self.document = document
+        self.plan = plan
+        self.shared = shared
+        self.source = source
+
+    @property
+    def rows(self) -> dict[str, list[int]]:
+        return self.plan.rows
+
+    def open(self) -> tuple[DocumentObject, DocumentMarkerIndex]:
+        """Документ для одной задачи и индекс маркеров без повторного обхода."""
+        with span("parse_docx", cached=self.shared):
+            doc = fork_document(self.document) if self.shared else self.document
+        with span("locate_markers", cached=True):
+            index = DocumentMarkerIndex(doc, self.plan.needles, locations=self.plan.locations)
+        return doc, index
+
+
+def fork_document(doc: DocumentObject) -> DocumentObject:
+    """
+    Копия документа для записи: новый пакет с копией дерева document.xml,
+    остальные части — те же объекты, что у doc.
+    """
+    part = doc.part
+    package = type(part.package)()
+    fork = type(part)(part.partname, part.content_type, deepcopy(part.element), package)
+    for rel in part.rels.values():
+        target = rel.target_ref if rel.is_external else rel.target_part
+        fork.rels.add_relationship(rel.reltype, target, rel.rId, rel.is_external)
+    for rel in part.package.rels.values():
+        target = rel.target_ref if rel.is_external else rel.target_part
+        if target is part:
+            target = fork
+        package.rels.add_relationship(rel.reltype, target, rel.rId, rel.is_external)
+    return fork.document
+
+
+def _can_fork(doc: DocumentObject) -> bool:
+    """Общие части не должны ссылаться на document.xml: иначе при сохранении он попадёт в пакет дважды."""
+    part = doc.part
+    return all(
+        rel.is_external or rel.target_part is not part
+        for other in part.package.iter_parts()
+        if other is not part
+        for rel in other.rels.values()
+    )
+
+
+class TemplateCache:
+    """
+    Кэш скомпилированных шаблонов Word по хешу содержимого.
+
+    Компиляция — разбор docx, поиск маркеров и расчёт строк таблиц (plan) —
+    выполняется один раз на шаблон; следующие задачи с тем же файлом
+    получают копию готового дерева и индекс маркеров сразу. В памяти
+    хранятся size последних шаблонов (LRU). Если задана directory,
+    планы пишутся на диск: после перезапуска docx разбирается заново,
+    но поиск маркеров пропускается.
+    """
+
+    def __init__(self, config: TemplateConfig | None = None) -> None:
+        self.config = config or TemplateConfig()
+        self._templates: OrderedDict[str, CompiledTemplate] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(
+        self, source: Source, needles: tuple[str, ...] = (), plan: RowsPlan | None = None
+    ) -> CompiledTemplate:
+        from docx import Document
+
+        data = read_source(source)
+        digest = hashlib.sha256(data).hexdigest()
+        key = _key(digest, needles, plan)
+        template = self._templates.get(key)
+        if template is not None:
+            self.hits += 1
+            self._templates.move_to_end(key)
+            return template
+
+        self.misses += 1
+        with span("parse_docx", cached=False):
+            doc = Document(BytesIO(data))
+        saved = self._load_plan(key)
+        if saved is None:
+            with span("locate_markers", cached=False):
+                index = DocumentMarkerIndex(doc, needles)
+                saved = TemplatePlan(
+                    digest=digest,
+                    needles=needles,
+                    locations=index.locations(),
+                    rows=plan(doc, index) if plan is not None else {},
+                )
+            self._save_plan(key, saved)
+        if self.config.size <= 0 or not _can_fork(doc):
+            return CompiledTemplate(doc, saved, shared=False, source=data)
+
+        template = CompiledTemplate(doc, saved, source=data)
+        self._templates[key] = template
+        while len(self._templates) > self.config.size:
+            self._templates.popitem(last=False)
+        return template
+
+    def _load_plan(self, key: str) -> TemplatePlan | None:
+        if self.config.directory is None:
+            return None
+        path = self.config.directory / f"{key}.json"
+        try:
+            return TemplatePlan.model_validate_json(path.read_bytes())
+        except (FileNotFoundError, ValidationError):
+            return None
+
+    def _save_plan(self, key: str, plan: TemplatePlan) -> None:
+        if self.config.directory is None:
+            return
+        self.config.directory.mkdir(parents=True, exist_ok=True)
+        path = self.config.directory / f"{key}.json"
+        # запись через временный файл: параллельный процесс не прочитает половину
+        tmp = path.with_suffix(f".{id(plan)}.tmp")
+        tmp.write_text(plan.model_dump_json(), encoding="utf-8")
+        tmp.replace(path)
+
+    def clear(self) -> None:
+        self._templates.clear()
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def __repr__(self) -> str:
+        return f"TemplateCache(templates={len(self)}, hits={self.hits}, misses={self.misses})"
+
+
+def _key(digest: str, needles: tuple[str, ...], plan: RowsPlan | None) -> str:
+    name = "" if plan is None else f"{plan.__module__}.{plan.__qualname__}"
+    options = hashlib.sha256(repr((PLAN_VERSION, needles, name)).encode()).hexdigest()
+    return f"{digest[:32]}_{options[:8]}"
+
+
+_cache: TemplateCache | None = None
+
+
+def template_cache() -> TemplateCache:
+    """Кэш шаблонов процесса; настройки — секция [templates] в config.toml."""
+    global _cache
+    if _cache is None:
+        try:
+            with open("config.toml", "rb") as f:
+                section = tomllib.load(f).get("templates", {})
+        except FileNotFoundError:
+            section = {}
+        _cache = TemplateCache(TemplateConfig.model_validate(section))
+    return _cache
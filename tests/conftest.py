@@ -0,0 +1,13 @@
+import pytest
+
+import frame_cache
+import template_cache
+
+
+@pytest.fixture(autouse=True)
+def no_caches(monkeypatch):
+    """Каждый тест считает всё заново: кэши листов и шаблонов выключены, на диск ничего не пишется."""
+    monkeypatch.setattr(frame_cache, "_cache", frame_cache.FrameCache(frame_cache.FrameCacheConfig(size_mb=0)))
+    monkeypatch.setattr(
+        template_cache, "_cache", template_cache.TemplateCache(template_cache.TemplateConfig(size=0))
+    )
@@ -0,0 +1,149 @@
+import zipfile
+from io import BytesIO
+
+import openpyxl
+import pytest
+from docx import Document
+from lxml import etree
+from openpyxl.styles import PatternFill
+
+import docx_stream
+from docx_stream import DocxConfig, DocxRewriter
+from fills import OSV_SHEET
+from markers import START_PART
+
+
+def _save(doc) -> bytes:
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def _body(data: bytes) -> bytes:
+    """Тело документа в каноническом XML (без различий в объявлениях пространств имён)."""
+    with zipfile.ZipFile(BytesIO(data)) as package:
+        root = etree.fromstring(package.read("word/document.xml"))
+    return etree.tostring(root, method="c14n")
+
+
+def _template() -> bytes:
+    doc = Document()
+    doc.add_heading("Отчёт", 1)
+    doc.add_paragraph("Вступление <&> с \"символами\"")
+    table = doc.add_table(rows=4, cols=2)
+    for i, key in enumerate(("Лист1", "Лист2", "Пусто", None)):
+        table.cell(i, 0).text = f"Раздел {i}"
+        if key:
+            table.cell(i, 1).text = f"{START_PART}{key}"
+    doc.add_paragraph(f"{START_PART}таблица 0")
+    doc.add_paragraph("Между таблицами")
+    doc.add_paragraph(f"{START_PART}таблица 1")
+    doc.add_page_break()
+    doc.add_paragraph("Конец")
+    return _save(doc)
+
+
+def test_rewrite_without_changes_round_trips():
+    data = _template()
+
+    with DocxRewriter(data) as docx:
+        out = docx.rewrite(lambda el: None).getvalue()
+
+    assert _body(out) == _body(data)
+    with zipfile.ZipFile(BytesIO(data)) as a, zipfile.ZipFile(BytesIO(out)) as b:
+        assert a.namelist() == b.namelist()
+        for name in a.namelist():
+            if name != "word/document.xml":
+                assert a.read(name) == b.read(name), name
+
+
+def test_section_width_matches_python_docx():
+    data = _template()
+    section = Document(BytesIO(data)).sections[0]
+
+    with DocxRewriter(data) as docx:
+        assert docx.section_width() == section.page_width - section.left_margin - section.right_margin
+
+
+def _osv_workbook() -> bytes:
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = OSV_SHEET
+    ws.append(["Лист", "Лицевой счет", "Наименование счета"])
+    yellow = PatternFill("solid", fgColor="FFFFFF00")
+    for i, sheet in enumerate(["Лист1", "Лист1", "Лист2", "Лист3", "Лист1"]):
+        ws.append([sheet, f"40817{i:05}", f"Счёт {i}"])
+        ws.cell(i + 2, 2).fill = yellow
+    ws.append(["Лист2", "не жёлтая", "строка"])
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def _report_workbook() -> bytes:
+    wb = openpyxl.Workbook()
+    for s in range(2):
+        ws = wb.active if s == 0 else wb.create_sheet()
+        ws.title = f"S{s}"
+        ws.append([f"Таблица {s}"])
+        ws.append([])
+        ws.append(["Статья", "Прим", "2024", "2023", "Изм"])
+        for r in range(6):
+            zero = r % 3 == 0
+            ws.append([f"Статья {r}", None, 0 if zero else r * 1000.5, 0 if zero else r * 10, 0 if zero else r])
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    def use(name: str) -> None:
+        monkeypatch.setattr(docx_stream, "load_config", lambda: DocxConfig(engine=name))
+
+    return use
+
+
+def test_excel2word_insert_stream_matches_python_docx(engine):
+    from process import Processor
+
+    word, excel = _template(), _osv_workbook()
+    outputs = []
+    for name in ("python-docx", "stream"):
+        processor = Processor()
+        processor.docx = DocxConfig(engine=name)
+        outputs.append(processor.excel2word_insert_io(word, excel).getvalue())
+
+    assert _body(outputs[0]) == _body(outputs[1])
+    body = _body(outputs[1]).decode()
+    assert "Счёт 4" in body and "Раздел 2" not in body
+
+
+def test_report_tables_stream_matches_python_docx(engine):
+    from task_four import insert_tables_with_filter_io
+
+    word, excel = _template(), _report_workbook()
+    outputs = []
+    for name in ("python-docx", "stream"):
+        engine(name)
+        outputs.append(insert_tables_with_filter_io(word, excel).getvalue())
+
+    assert _body(outputs[0]) == _body(outputs[1])
+    body = _body(outputs[1]).decode()
+    assert "Статья 5" in body and f"{START_PART}таблица" not in body
+
+
+@pytest.mark.parametrize("name", ["python-docx", "stream"])
+def test_report_tables_same_with_worker_processes(engine, monkeypatch, name):
+    import report_sheets
+    from task_four import insert_tables_with_filter_io
+
+    engine(name)
+    word, excel = _template(), _report_workbook()
+    outputs = []
+    for workers in (1, 3):
+        monkeypatch.setattr(report_sheets, "load_config", lambda: report_sheets.ReportSheetsConfig(workers=workers))
+        outputs.append(insert_tables_with_filter_io(word, excel).getvalue())
+
+    assert _body(outputs[0]) == _body(outputs[1])
+    assert "Статья 5" in _body(outputs[1]).decode()
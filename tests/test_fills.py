@@ -0,0 +1,64 @@
+import re
+import zipfile
+from io import BytesIO
+
+import openpyxl
+from openpyxl.styles import PatternFill
+from openpyxl.styles.colors import Color
+
+from fills import OSV_SHEET, read_yellow_rows, yellow_style_ids
+from xlsx_stream import XlsxReader
+
+# заливки по строкам листа: (подпись, заливка, жёлтая ли)
+FILLS = [
+    ("rgb", PatternFill("solid", fgColor=Color(rgb="FFFFFF00")), True),
+    ("indexed", PatternFill("solid", fgColor=Color(indexed=13)), True),
+    ("theme", PatternFill("solid", fgColor=Color(theme=4)), True),
+    ("theme tint", PatternFill("solid", fgColor=Color(theme=4, tint=0.4)), False),
+    ("rgb tint", PatternFill("solid", fgColor=Color(rgb="FFFFFF00", tint=-0.25)), False),
+    ("green", PatternFill("solid", fgColor=Color(rgb="FF00FF00")), False),
+    ("pattern", PatternFill("gray125", fgColor=Color(rgb="FFFFFF00")), False),
+]
+
+
+def _workbook() -> bytes:
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = OSV_SHEET
+    ws.append(["Лист", "Лицевой счет", "Наименование счета"])
+    for i, (label, fill, _) in enumerate(FILLS):
+        ws.append([f"Лист {i}", f"40817{i:05}", label])
+        ws.cell(i + 2, 2).fill = fill
+    buffer = BytesIO()
+    wb.save(buffer)
+    # accent1 темы (индекс 4 в Excel) — жёлтый
+    out = BytesIO()
+    with zipfile.ZipFile(buffer) as src, zipfile.ZipFile(out, "w") as dst:
+        for info in src.infolist():
+            data = src.read(info)
+            if info.filename.startswith("xl/theme/"):
+                data = re.sub(rb'(<a:accent1>\s*<a:srgbClr val=")\w+', rb"\g<1>FFFF00", data)
+            dst.writestr(info, data)
+    return out.getvalue()
+
+
+def test_yellow_style_ids():
+    with XlsxReader(_workbook()) as reader:
+        ids = yellow_style_ids(reader)
+        # стиль ячейки «Лицевой счет» в строках с заливками (после шапки)
+        styles = [cells[1].style for row, cells in reader.iter_rows(OSV_SHEET) if row > 1]
+
+    assert [style in ids for style in styles] == [yellow for _, _, yellow in FILLS]
+
+
+def test_read_yellow_rows_matches_openpyxl():
+    data = _workbook()
+    ws = openpyxl.load_workbook(BytesIO(data))[OSV_SHEET]
+    yellow = {label for label, _, is_yellow in FILLS if is_yellow}
+    expected = [
+        [str(c.value) for c in row] for row in ws.iter_rows(min_row=2, max_col=3) if row[2].value in yellow
+    ]
+
+    df = read_yellow_rows(data)
+
+    assert df.rows() == [tuple(row) for row in expected]
@@ -0,0 +1,47 @@
+import polars as pl
+import pytest
+from humanize import intcomma
+
+from formatting import format_numbers
+
+
+def _intcomma(value) -> str:
+    """Прежнее форматирование ячеек отчёта."""
+    return intcomma(str(value).strip()).replace(",", " ").replace(".", ",")
+
+
+FLOATS = [0.0, -0.0, 1234567.125, -1234567.5, -999.5, 123.0, 1.5e16, float("inf"), float("-inf"), float("nan")]
+INTS = [0, -1, -1000, 1234567, -9223372036854775807]
+STRINGS = ["1234", "-1234567", "1234.5", "-0.5", " 12 ", "1,234", "+15", "00123", "abc", "inf", "-Infinity", "nan", ""]
+
+
+@pytest.mark.parametrize(
+    ("dtype", "values"), [(pl.Float64, FLOATS), (pl.Int64, INTS), (pl.String, STRINGS)]
+)
+def test_matches_intcomma(dtype, values):
+    df = pl.DataFrame({"a": values}, schema={"a": dtype})
+
+    assert format_numbers(df)["a"].to_list() == [_intcomma(v) for v in values]
+
+
+def test_rounding_matches_intcomma():
+    values = [1234.5678, -0.125, 2.675, 1e-7, float("inf")]
+    df = pl.DataFrame({"a": values, "b": [str(v) for v in values]})
+
+    out = format_numbers(df, decimals=2)
+
+    # прежний код округлял столбцы Float64 (polars) до intcomma, а текст — нет
+    assert out["a"].to_list() == [_intcomma(v) for v in pl.Series(values).round(2)]
+    assert out["b"].to_list() == [_intcomma(str(v)) for v in values]
+
+
+def test_nulls_and_text_columns():
+    df = pl.DataFrame({"name": ["Статья 1.2", None], "sum": [1000.5, None], "text": ["x", None]})
+
+    out = format_numbers(df, columns=["sum", "text"], null_value="-")
+
+    assert out.to_dict(as_series=False) == {
+        "name": ["Статья 1.2", "-"],
+        "sum": ["1 000,5", "-"],
+        "text": ["x", "-"],
+    }
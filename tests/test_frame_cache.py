@@ -0,0 +1,46 @@
+import os
+
+import polars as pl
+from polars.testing import assert_frame_equal
+
+from frame_cache import MANIFEST, FrameCache, FrameCacheConfig
+
+
+def _frames(n: int = 1000) -> dict[str, pl.DataFrame]:
+    return {
+        "Лист1": pl.DataFrame({"Статья": [f"строка {i}" for i in range(n)], "2024": [None, "1,5"] * (n // 2)}),
+        "Пусто": pl.DataFrame(),
+    }
+
+
+def test_second_read_comes_from_disk(tmp_path):
+    cache = FrameCache(FrameCacheConfig(directory=tmp_path))
+    calls = []
+
+    def load():
+        calls.append(1)
+        return _frames()
+
+    first = cache.frames(b"book", "calamine", {"header_row": 2}, load)
+    second = cache.frames(b"book", "calamine", {"header_row": 2}, load)
+    other = cache.frames(b"book", "openpyxl", {"header_row": 2}, load)
+
+    assert len(calls) == 2
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert list(second) == list(first)
+    for name in first:
+        assert_frame_equal(second[name], first[name])
+    assert list(other) == list(first)
+
+
+def test_least_recently_read_entry_is_evicted(tmp_path):
+    cache = FrameCache(FrameCacheConfig(directory=tmp_path, size_mb=1))
+    old = cache.key(b"old", "calamine", {})
+    cache.frames(b"old", "calamine", {}, lambda: _frames(12_000))
+    # давнее чтение задаётся явно: mtime двух записей может совпасть
+    os.utime(tmp_path / old / MANIFEST, (0, 0))
+
+    cache.frames(b"new", "calamine", {}, lambda: _frames(12_000))
+
+    # каждая запись больше половины предела: остаётся прочитанная последней
+    assert [entry.name for _, _, entry in cache.usage()] == [cache.key(b"new", "calamine", {})]
@@ -0,0 +1,58 @@
+from docx import Document
+
+from markers import START_PART, DocumentMarkerIndex, iter_markers
+
+
+def _document():
+    doc = Document()
+    doc.add_paragraph(f"{START_PART}A")
+    table = doc.add_table(rows=3, cols=3)
+    # объединённая по горизонтали ячейка: в doc.tables она в row.cells дважды
+    merged = table.cell(0, 0).merge(table.cell(0, 1))
+    merged.text = "L6 итог"
+    table.cell(1, 2).text = f"{START_PART}B"
+    table.cell(2, 0).text = "L6 ещё"
+    nested = table.cell(2, 1).add_table(rows=1, cols=1)
+    nested.cell(0, 0).text = f"{START_PART}C"
+    nested.cell(0, 0).add_paragraph("L6 во вложенной")
+    return doc
+
+
+def test_merged_cell_indexed_once():
+    index = DocumentMarkerIndex(_document(), needles=("L6",))
+
+    hits = index._needles["L6"]
+    assert [hit.cell.text for hit in hits] == ["L6 итог", "L6 ещё"]
+    assert (hits[0].row, hits[0].col) == (0, 0)
+    assert (hits[1].row, hits[1].col) == (2, 0)
+
+
+def test_nested_tables_not_scanned():
+    # как doc.tables -> row.cells -> cell.paragraphs: вложенные таблицы не обходятся
+    doc = _document()
+    index = DocumentMarkerIndex(doc, needles=("L6",))
+
+    assert [hit.key for hit in index.markers()] == ["A", "B"]
+    assert not index.has_marker("C")
+    assert [hit.key for el in doc.element.body for hit in iter_markers(el)] == ["A", "B"]
+
+
+def test_hit_dead_after_row_removed():
+    doc = _document()
+    index = DocumentMarkerIndex(doc, needles=("L6",))
+    first = index.first("L6")
+    tr = first.tr
+    tr.getparent().remove(tr)
+
+    assert not first.is_alive(doc.element.body)
+    assert index.first("L6").cell.text == "L6 ещё"
+    assert index.first("L6").row == 1
+
+
+def test_restored_locations_match_scan():
+    doc = _document()
+    index = DocumentMarkerIndex(doc, needles=("L6",))
+    restored = DocumentMarkerIndex(doc, needles=("L6",), locations=index.locations())
+
+    assert [(h.key, h.row, h.col) for h in restored.markers()] == [(h.key, h.row, h.col) for h in index.markers()]
+    assert restored.first("L6").cell._tc is index.first("L6").cell._tc
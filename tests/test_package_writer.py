@@ -0,0 +1,87 @@
+import struct
+import zipfile
+from io import BytesIO
+
+from docx import Document
+
+import package_writer
+from package_writer import save_docx
+
+DOCUMENT = "word/document.xml"
+
+
+def _template() -> bytes:
+    doc = Document()
+    doc.add_paragraph("Отчёт")
+    buffer = BytesIO()
+    doc.save(buffer)
+    # как у Word: перевод строки после объявления XML, python-docx пишет без него
+    out = BytesIO()
+    with zipfile.ZipFile(buffer) as src, zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as dst:
+        for info in src.infolist():
+            data = src.read(info)
+            if info.filename.endswith(".xml") and data.startswith(b"<?xml"):
+                head, _, body = data.partition(b"?>")
+                data = head + b"?>\r\n" + body.lstrip()
+            dst.writestr(info, data)
+    return out.getvalue()
+
+
+def _raw(package: zipfile.ZipFile, name: str) -> bytes:
+    """Сжатые байты записи как они лежат в архиве."""
+    info = package.getinfo(name)
+    package.fp.seek(info.header_offset + 26)
+    name_length, extra_length = struct.unpack("<HH", package.fp.read(4))
+    package.fp.seek(info.header_offset + zipfile.sizeFileHeader + name_length + extra_length)
+    return package.fp.read(info.compress_size)
+
+
+def _edit(source: bytes):
+    doc = Document(BytesIO(source))
+    doc.paragraphs[0].text = "Отчёт за май"
+    return doc
+
+
+def test_untouched_parts_are_copied_raw():
+    source = _template()
+    doc = _edit(source)
+
+    result = save_docx(doc, source, changed=(doc.part,))
+
+    with zipfile.ZipFile(BytesIO(source)) as src, zipfile.ZipFile(result) as out:
+        assert set(out.namelist()) == set(src.namelist())
+        copied = [name for name in src.namelist() if name not in (DOCUMENT, "[Content_Types].xml", "_rels/.rels")]
+        assert "word/styles.xml" in copied
+        for name in copied:
+            assert out.getinfo(name).CRC == src.getinfo(name).CRC, name
+            assert _raw(out, name) == _raw(src, name), name
+        assert out.getinfo(DOCUMENT).CRC != src.getinfo(DOCUMENT).CRC
+    assert Document(result).paragraphs[0].text == "Отчёт за май"
+
+
+def test_without_changed_parts_are_serialized():
+    source = _template()
+    doc = _edit(source)
+
+    result = save_docx(doc, source)
+
+    with zipfile.ZipFile(BytesIO(source)) as src, zipfile.ZipFile(result) as out:
+        # python-docx пишет XML без перевода строки — байты другие
+        assert out.getinfo("word/styles.xml").CRC != src.getinfo("word/styles.xml").CRC
+    assert Document(result).paragraphs[0].text == "Отчёт за май"
+
+
+def test_fallback_without_zipfile_internals(monkeypatch):
+    source = _template()
+    doc = _edit(source)
+    expected = save_docx(doc, source, changed=(doc.part,))
+    monkeypatch.setattr(package_writer, "_ZIP_INTERNALS", ("_no_such_attribute",))
+
+    doc = _edit(source)
+    result = save_docx(doc, source, changed=(doc.part,))
+
+    with zipfile.ZipFile(expected) as fast, zipfile.ZipFile(result) as plain:
+        assert plain.namelist() == fast.namelist()
+        for name in fast.namelist():
+            assert plain.read(name) == fast.read(name), name
+    assert Document(result).paragraphs[0].text == "Отчёт за май"
@@ -0,0 +1,35 @@
+import os
+from time import time
+
+from retention import RetentionConfig, RetentionManager
+
+
+def _job(root, name: str, age: float, size: int = 100):
+    folder = root / name
+    folder.mkdir(parents=True)
+    (folder / "result.docx").write_bytes(b"x" * size)
+    past = time() - age
+    os.utime(folder, (past, past))
+    return folder
+
+
+def test_age_counts_from_touch(tmp_path):
+    retention = RetentionManager(RetentionConfig(max_age_days=1, grace=300), directory=tmp_path)
+    old = _job(tmp_path, "100_old", 2 * 86400)
+    touched = _job(tmp_path, "200_touched", 2 * 86400)
+    fresh = _job(tmp_path / "checkpoints", "300_fresh", 60)
+    other = _job(tmp_path, "batch", 2 * 86400)
+
+    retention.touch(touched / "result.docx")
+
+    assert retention.sweep() == [old]
+    assert touched.exists() and fresh.exists() and other.exists()
+
+
+def test_size_limit_removes_oldest_outside_grace(tmp_path):
+    retention = RetentionManager(RetentionConfig(max_mb=1, max_age_days=0, grace=300), directory=tmp_path)
+    jobs = [_job(tmp_path, f"{i}_job", age, size=600 << 10) for i, age in enumerate((3000, 2000, 10))]
+
+    # три папки по 600 КБ при пределе 1 МБ: свежая под grace остаётся, хоть предел и превышен
+    assert retention.sweep() == jobs[:2]
+    assert jobs[2].exists()
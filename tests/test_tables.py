@@ -0,0 +1,118 @@
+from copy import deepcopy
+
+import polars as pl
+from docx import Document
+from lxml import etree
+
+from markers import DocumentMarkerIndex
+from process import SPOD_MARKER, insert_d_table, insert_k_table, spod_rows
+from tables import TableGrid
+
+
+def _merged_table():
+    """Таблица с объединениями по горизонтали (gridSpan) и вертикали (vMerge)."""
+    doc = Document()
+    table = doc.add_table(rows=5, cols=4)
+    for r, row in enumerate(table.rows):
+        for c, cell in enumerate(row.cells):
+            cell.text = f"{r}:{c}"
+    table.cell(0, 0).merge(table.cell(0, 2))
+    table.cell(1, 3).merge(table.cell(3, 3))
+    table.cell(2, 1).merge(table.cell(3, 2))
+    return doc, table
+
+
+def _xml(element) -> bytes:
+    return etree.tostring(element, method="c14n")
+
+
+def test_grid_matches_table_cell():
+    _, table = _merged_table()
+    grid = TableGrid(table)
+
+    assert len(grid) == len(table.rows)
+    for r in range(len(table.rows)):
+        for c in range(grid.columns):
+            assert grid.cell(r, c)._tc is table.cell(r, c)._tc, (r, c)
+            assert grid.text(r, c) == table.cell(r, c).text, (r, c)
+
+
+def test_add_rows_and_write_column_match_python_docx():
+    _, expected = _merged_table()
+    _, table = _merged_table()
+    for _ in range(3):
+        expected.add_row()
+    for r, value in zip((1, 4, 6, 7), "abcd"):
+        expected.cell(r, 1).text = value
+
+    grid = TableGrid(table)
+    grid.text(4, 1)
+    grid.add_rows(3)
+    grid.write_column(1, [1, 4, 6, 7], "abcd")
+
+    assert _xml(table._tbl) == _xml(expected._tbl)
+    for r in range(len(expected.rows)):
+        for c in range(grid.columns):
+            assert grid.text(r, c) == expected.cell(r, c).text, (r, c)
+
+
+def _spod_document():
+    doc = Document()
+    doc.add_paragraph("Перед таблицей")
+    table = doc.add_table(rows=7, cols=3)
+    rows = [
+        (SPOD_MARKER, "Сумма"),
+        ("Счёт", "К 1"),
+        ("", "К без первого столбца"),
+        ("Счёт", "Д 1"),
+        ("Счёт", ""),
+        ("Счёт", "Д 2"),
+        ("Итого", "К 2"),
+    ]
+    for row, (first, second) in zip(table.rows, rows):
+        row.cells[0].text = first
+        row.cells[1].text = second
+    table.cell(1, 2).merge(table.cell(3, 2))
+    return doc
+
+
+def _rows_reference(table, start):
+    """spod_rows до TableGrid: тексты через Table.cell."""
+    rows = {"k": [], "d": []}
+    for r in range(start, len(table.rows)):
+        first, second = table.cell(r, 0).text, table.cell(r, 1).text
+        if first.strip() and second.strip():
+            rows["d" if second.startswith("Д") else "k"].append(r)
+    return rows
+
+
+def _fill_reference(table, start, values, rows):
+    """_fill_spod до TableGrid: Table.add_row и Table.cell."""
+    for _ in range(start + len(values) - len(table.rows)):
+        table.add_row()
+    end = start + len(table.rows) - 1
+    for value, r in zip(values, [r for r in rows if r < end]):
+        table.cell(r, 1).text = value
+
+
+def test_spod_fill_matches_table_cell_loop():
+    k = pl.DataFrame({f"c{i}": [f"k{i}"] for i in range(12)})
+    d = pl.DataFrame({"a": ["x", "y", "z"], "b": ["d1", "d2", "d3"]})
+    doc = _spod_document()
+    before = deepcopy(doc.element.body)
+    # как в Processor: индекс и строки плана считаются до заполнения
+    index = DocumentMarkerIndex(doc, needles=(SPOD_MARKER,))
+    rows = spod_rows(doc, index)
+    insert_k_table(doc, k, index, rows["k"])
+    insert_d_table(doc, d, index, rows["d"])
+
+    reference = _spod_document()
+    hit = DocumentMarkerIndex(reference, needles=(SPOD_MARKER,)).first(SPOD_MARKER)
+    expected = _rows_reference(hit.table, hit.row)
+    _fill_reference(hit.table, hit.row, k.row(0), expected["k"])
+    _fill_reference(hit.table, hit.row, d.to_series(1).to_list(), expected["d"])
+
+    # строка маркера тоже строка K: отбор начинается с неё
+    assert rows == expected == {"k": [0, 1, 6], "d": [3, 5]}
+    assert _xml(doc.element.body) == _xml(reference.element.body)
+    assert _xml(doc.element.body) != _xml(before)
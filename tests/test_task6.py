@@ -0,0 +1,88 @@
+from datetime import datetime
+from io import BytesIO
+
+import openpyxl
+import polars as pl
+import pytest
+
+from task6 import extract_spec_tables
+
+
+def _openpyxl_spec_tables(data: bytes) -> list[pl.DataFrame]:
+    """Прежняя реализация: openpyxl, ячейка за ячейкой."""
+    wb = openpyxl.load_workbook(BytesIO(data), data_only=True, read_only=True, keep_links=False)
+    tables = []
+    for sheet_name in wb.sheetnames:
+        ws = wb[sheet_name]
+        for row in ws.iter_rows(values_only=False):
+            for cell in row:
+                val = cell.value
+                if val and isinstance(val, str) and val.startswith("spec_"):
+                    start_row, start_col = cell.row, cell.column
+                    headers = [
+                        str(ws.cell(row=start_row, column=start_col + offset).value or "").strip()
+                        for offset in range(4)
+                    ]
+                    data_rows = []
+                    curr_row = start_row + 1
+                    while True:
+                        row_vals = [ws.cell(row=curr_row, column=start_col + offset).value for offset in range(4)]
+                        if all(v is None for v in row_vals):
+                            break
+                        data_rows.append(row_vals)
+                        curr_row += 1
+                    if data_rows:
+                        cols = {headers[i]: [str(row[i]) for row in data_rows] for i in range(4)}
+                        df = pl.DataFrame(cols)
+                        df = df.filter((pl.nth(-1) != "0") & (pl.nth(-2) != "0"))
+                        short_df = df.select(pl.nth(-1), pl.nth(-2)).with_columns(pl.all().replace("None", None))
+                        short_df = short_df[[s.name for s in short_df if not (s.null_count() == short_df.height)]]
+                        if not short_df.is_empty() and not df.is_empty():
+                            tables.append(df.with_columns(pl.lit(sheet_name).alias("__sheetname__")))
+                    break
+    return tables
+
+
+def _workbook() -> bytes:
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Отчёт"
+    ws["A1"] = "Заголовок отчёта"
+    ws.append(["spec_доходы", "Прим", "2024", "2023"])
+    ws.append(["Проценты", None, 1234.5, 1000])
+    ws.append(["Нули", None, 0, 0])
+    ws.append(["Комиссии", "1.2", 10, 0])
+    ws.append(["Дата", None, datetime(2024, 12, 31), "текст"])
+    ws.append([])
+    # две таблицы в одной строке: вторая — правее
+    ws.append(["spec_левая", "b", "c", "d", None, "spec_правая", "x", "y", "z"])
+    ws.append(["1", 2, 3, 4, None, "п", None, 5.25, -7])
+    ws.append([None, None, None, None, None, "п2", None, 6, 8])
+    ws.append([])
+    ws.append(["spec_пустая", "a", "b", "c"])
+    ws.append([])
+    ws.append(["spec_только_нули", "a", "b", "c"])
+    ws.append(["x", None, 0, 0])
+    other = wb.create_sheet("Второй")
+    for r in range(5):
+        other.append([None] * r + ["spec_лесенка", "1", "2", "3"])
+        other.append([None] * r + [f"строка {r}", r, r + 0.5, None])
+    return _save(wb)
+
+
+def _save(wb) -> bytes:
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_matches_openpyxl(workers):
+    data = _workbook()
+
+    tables = extract_spec_tables(data, workers=workers)
+    expected = _openpyxl_spec_tables(data)
+
+    assert len(tables) == len(expected) > 0
+    for got, want in zip(tables, expected):
+        assert got.equals(want), (got, want)
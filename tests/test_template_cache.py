@@ -0,0 +1,59 @@
+from io import BytesIO
+
+from docx import Document
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+
+from markers import START_PART
+from template_cache import TemplateCache, TemplateConfig
+
+NEEDLES = ("таблица",)
+
+
+def _template() -> bytes:
+    doc = Document()
+    doc.add_paragraph("Вступление")
+    doc.add_paragraph(f"{START_PART}таблица")
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def _rows(doc, index) -> dict[str, list[int]]:
+    return {"paragraphs": [len(doc.paragraphs)]}
+
+
+def test_second_job_gets_fork_of_cached_template():
+    cache = TemplateCache(TemplateConfig(size=4))
+    data = _template()
+
+    template = cache.get(data, NEEDLES, plan=_rows)
+    assert cache.get(data, NEEDLES, plan=_rows) is template
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert template.rows == {"paragraphs": [2]}
+
+    doc, index = template.open()
+    (hit,) = index.markers(in_cells=False)
+    hit.paragraph.text = "Заменено"
+    # копия только у document.xml: шаблон не меняется, остальные части общие
+    assert template.document.paragraphs[1].text == f"{START_PART}таблица"
+    assert doc.part is not template.document.part
+    assert doc.part.part_related_by(RT.STYLES) is template.document.part.part_related_by(RT.STYLES)
+    (again,) = template.open()[1].markers(in_cells=False)
+    assert again.paragraph.text == f"{START_PART}таблица"
+
+
+def test_plan_survives_restart(tmp_path):
+    data = _template()
+    calls = []
+
+    def rows(doc, index):
+        calls.append(1)
+        return _rows(doc, index)
+
+    TemplateCache(TemplateConfig(directory=tmp_path)).get(data, NEEDLES, plan=rows)
+    template = TemplateCache(TemplateConfig(directory=tmp_path)).get(data, NEEDLES, plan=rows)
+
+    assert len(calls) == 1
+    assert template.rows == {"paragraphs": [2]}
+    (hit,) = template.open()[1].markers(in_cells=False)
+    assert hit.paragraph.text == f"{START_PART}таблица"
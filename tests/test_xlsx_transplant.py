@@ -0,0 +1,94 @@
+import re
+import zipfile
+from io import BytesIO
+
+import openpyxl
+from openpyxl.formatting.rule import CellIsRule, Rule
+from openpyxl.styles import Font, PatternFill
+from openpyxl.styles.differential import DifferentialStyle
+
+from xlsx_transplant import transplant_sheets
+
+_DXFS = re.compile(rb"<dxfs\b[^>]*/>|<dxfs\b.*?</dxfs>", re.S)
+
+
+def _book(sheet: str, rule: Rule | None = None, dxf: DifferentialStyle | None = None) -> bytes:
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = sheet
+    ws["A1"] = 1
+    if dxf is not None:
+        # dxf цели с номером 0: на него не должно указать правило источника
+        wb._differential_styles.add(dxf)
+    if rule is not None:
+        ws.conditional_formatting.add("A1:A10", rule)
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def _without_dxfs(data: bytes) -> bytes:
+    """Та же книга, но в styles.xml нет раздела dxfs."""
+    out = BytesIO()
+    with zipfile.ZipFile(BytesIO(data)) as src, zipfile.ZipFile(out, "w") as dst:
+        for info in src.infolist():
+            part = src.read(info)
+            if info.filename == "xl/styles.xml":
+                part = _DXFS.sub(b"", part)
+            dst.writestr(info, part)
+    return out.getvalue()
+
+
+def _rules(data: bytes, sheet: str) -> list:
+    ws = openpyxl.load_workbook(BytesIO(data))[sheet]
+    return [rule for cf in ws.conditional_formatting for rule in cf.rules]
+
+
+def test_cf_rule_keeps_merged_dxf():
+    red = DifferentialStyle(fill=PatternFill(bgColor="FFFF0000"))
+    origin = _book("Источник", CellIsRule(operator="greaterThan", formula=["0"], font=Font(bold=True)))
+    target = _book("Цель", dxf=red)
+
+    result = transplant_sheets(origin, target).getvalue()
+
+    (rule,) = _rules(result, "Источник")
+    assert rule.dxfId == 1
+    dxfs = openpyxl.load_workbook(BytesIO(result))._differential_styles
+    assert dxfs[rule.dxfId].font.b
+
+
+def test_cf_rule_without_source_dxf_drops_dxf_id():
+    red = DifferentialStyle(fill=PatternFill(bgColor="FFFF0000"))
+    origin = _without_dxfs(
+        _book("Источник", CellIsRule(operator="greaterThan", formula=["0"], font=Font(bold=True)))
+    )
+    target = _book("Цель", dxf=red)
+
+    result = transplant_sheets(origin, target).getvalue()
+
+    (rule,) = _rules(result, "Источник")
+    assert rule.dxfId is None
+    with zipfile.ZipFile(BytesIO(result)) as package:
+        sheet = package.read("xl/worksheets/sheet1.xml")
+    assert b"dxfId" not in sheet
+
+
+def test_parallel_rewrite_is_byte_identical():
+    wb = openpyxl.Workbook()
+    for s in range(3):
+        ws = wb.active if s == 0 else wb.create_sheet()
+        ws.title = f"Лист{s}"
+        for r in range(1, 50):
+            ws.append([f"строка {s}-{r}", r * 1.5, r])
+            ws.cell(r, 2).font = Font(bold=r % 2 == 0)
+        ws.merge_cells("D1:E2")
+        ws.conditional_formatting.add("B1:B50", CellIsRule(operator="greaterThan", formula=["10"], font=Font(italic=True)))
+    buffer = BytesIO()
+    wb.save(buffer)
+    origin, target = buffer.getvalue(), _book("Цель")
+
+    serial = transplant_sheets(origin, target, workers=1).getvalue()
+    parallel = transplant_sheets(origin, target, workers=3).getvalue()
+
+    assert serial == parallel
+    assert openpyxl.load_workbook(BytesIO(parallel)).sheetnames == ["Лист0", "Лист1", "Лист2", "Цель"]
@@ -0,0 +1,46 @@
+from io import BytesIO
+
+import polars as pl
+
+from frame_cache import frame_cache
+from sources import Source, read_source
+from spans import span
+
+
+class WorkbookSession:
+    """
+    Книга Excel, открытая один раз на задачу.
+
+    Файл (путь, байты или поток) читается в память один раз, все листы из `sheet_names`
+    разбираются одним вызовом парсера, дальше листы отдаются из памяти.
+    """
+
+    def __init__(
+        self, source: Source, sheet_names: list[str], **read_options
+    ) -> None:
+        self.data = read_source(source)
+        self.sheet_names = list(sheet_names)
+        self.read_options = read_options
+        self._frames: dict[str, pl.DataFrame] | None = None
+
+    def __getitem__(self, sheet_name: str) -> pl.DataFrame:
+        return self.frames[sheet_name]
+
+    @property
+    def frames(self) -> dict[str, pl.DataFrame]:
+        if self._frames is None:
+            self._frames = self.load()
+        return self._frames
+
+    def load(self) -> dict[str, pl.DataFrame]:
+        # повторная задача с той же книгой берёт листы из кэша (frame_cache)
+        options = {"sheet_name": self.sheet_names, **self.read_options}
+        with span("load_excel", sheets=len(self.sheet_names)):
+            return frame_cache().frames(self.data, "read_excel", options, self._parse)
+
+    def _parse(self) -> dict[str, pl.DataFrame]:
+        # calamine открывает архив один раз и обходит листы по очереди;
+        # отдельные потоки на каждый лист выигрыша не дают (см. bench/bench_workbook.py)
+        return pl.read_excel(
+            BytesIO(self.data), sheet_name=self.sheet_names, **self.read_options
+        )
@@ -0,0 +1,198 @@
+import posixpath
+import zipfile
+from functools import cached_property, lru_cache
+from io import BytesIO
+from pathlib import Path
+from typing import IO, Iterator, NamedTuple
+
+from lxml import etree
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel
+
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+
+def q(tag: str) -> str:
+    return f"{{{MAIN_NS}}}{tag}"
+
+
+_ROW, _C, _V, _T = q("row"), q("c"), q("v"), q("t")
+
+
+@lru_cache(maxsize=None)
+def _letters_index(letters: str) -> int:
+    col = 0
+    for ch in letters:
+        col = col * 26 + ord(ch) - 64
+    return col
+
+
+def column_index(ref: str) -> int:
+    """'AB12' -> 28."""
+    return _letters_index(ref.rstrip("0123456789"))
+
+
+class RawCell(NamedTuple):
+    col: int
+    style: int
+    type: str
+    value: str | None
+
+
+class XlsxReader:
+    """
+    Потоковое чтение xlsx без openpyxl-модели: части пакета разбираются
+    iterparse, строки листа отдаются по одной и сразу освобождаются.
+    """
+
+    def __init__(self, source: str | Path | bytes | IO[bytes]) -> None:
+        if isinstance(source, bytes):
+            source = BytesIO(source)
+        self.zip = zipfile.ZipFile(source)
+
+    def close(self) -> None:
+        self.zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- книга ---
+
+    @cached_property
+    def _workbook(self):
+        return etree.fromstring(self.zip.read("xl/workbook.xml"))
+
+    @cached_property
+    def sheet_parts(self) -> dict[str, str]:
+        """Имя листа -> путь части в архиве, в порядке листов книги."""
+        rels = etree.fromstring(self.zip.read("xl/_rels/workbook.xml.rels"))
+        targets = {
+            rel.get("Id"): rel.get("Target") for rel in rels.iter(f"{{{PKG_REL_NS}}}Relationship")
+        }
+        parts = {}
+        for sheet in self._workbook.iter(q("sheet")):
+            target = targets[sheet.get(f"{{{REL_NS}}}id")]
+            if target.startswith("/"):
+                parts[sheet.get("name")] = target.lstrip("/")
+            else:
+                parts[sheet.get("name")] = posixpath.normpath(posixpath.join("xl", target))
+        return parts
+
+    @property
+    def sheet_names(self) -> list[str]:
+        return list(self.sheet_parts)
+
+    @cached_property
+    def epoch(self):
+        pr = self._workbook.find(q("workbookPr"))
+        if pr is not None and pr.get("date1904") in ("1", "true"):
+            return CALENDAR_MAC_1904
+        return CALENDAR_WINDOWS_1900
+
+    # --- стили ---
+
+    @cached_property
+    def styles(self):
+        if "xl/styles.xml" not in self.zip.namelist():
+            return etree.Element(q("styleSheet"))
+        return etree.fromstring(self.zip.read("xl/styles.xml"))
+
+    @cached_property
+    def cell_xfs(self) -> list:
+        xfs = self.styles.find(q("cellXfs"))
+        return [] if xfs is None else list(xfs.iter(q("xf")))
+
+    @cached_property
+    def date_styles(self) -> frozenset[int]:
+        """Номера cellXfs с форматом даты: такие числа openpyxl отдаёт как datetime."""
+        formats = dict(BUILTIN_FORMATS)
+        for fmt in self.styles.iter(q("numFmt")):
+            formats[int(fmt.get("numFmtId"))] = fmt.get("formatCode")
+        return frozenset(
+            i
+            for i, xf in enumerate(self.cell_xfs)
+            if is_date_format(formats.get(int(xf.get("numFmtId", 0)), ""))
+        )
+
+    # --- строки ---
+
+    def shared_strings(self, wanted: set[int] | None = None) -> dict[int, str]:
+        """
+        Таблица общих строк за один потоковый проход.
+        Если задан wanted — в памяти остаются только нужные номера.
+        """
+        strings: dict[int, str] = {}
+        if "xl/sharedStrings.xml" not in self.zip.namelist():
+            return strings
+        with self.zip.open("xl/sharedStrings.xml") as f:
+            for i, (_, si) in enumerate(etree.iterparse(f, tag=q("si"))):
+                if wanted is None or i in wanted:
+                    # текст без фонетических подсказок (rPh), как у openpyxl
+                    strings[i] = "".join(
+                        t.text or "" for t in si.iter(q("t")) if t.getparent().tag != q("rPh")
+                    )
+                si.clear()
+                while si.getprevious() is not None:
+                    del si.getparent()[0]
+        return strings
+
+    # --- лист ---
+
+    def iter_row_elements(self, sheet_name: str) -> Iterator[tuple[int, etree._Element]]:
+        """
+        Элементы `row` листа по порядку, с номером строки.
+        Элемент действителен только до следующего шага: после него строка очищается.
+        """
+        with self.zip.open(self.sheet_parts[sheet_name]) as f:
+            row_idx = 0
+            for _, row in etree.iterparse(f, tag=_ROW):
+                row_idx = int(row.get("r", row_idx + 1))
+                yield row_idx, row
+                row.clear()
+                while row.getprevious() is not None:
+                    del row.getparent()[0]
+
+    @staticmethod
+    def read_cells(row: etree._Element) -> list[RawCell]:
+        """Ячейки элемента `row`; значения сырые, как в XML (типизирует value())."""
+        cells = []
+        col = 0
+        for c in row.iterchildren(_C):
+            ref = c.get("r")
+            col = column_index(ref) if ref else col + 1
+            cell_type = c.get("t", "n")
+            if cell_type == "inlineStr":
+                value = "".join(t.text or "" for t in c.iter(_T))
+            else:
+                v = c.find(_V)
+                value = v.text if v is not None else None
+            cells.append(RawCell(col, int(c.get("s", 0)), cell_type, value))
+        return cells
+
+    def iter_rows(self, sheet_name: str) -> Iterator[tuple[int, list[RawCell]]]:
+        """Строки листа по порядку: (номер строки, ячейки строки)."""
+        for row_idx, row in self.iter_row_elements(sheet_name):
+            yield row_idx, self.read_cells(row)
+
+    def value(self, cell: RawCell | None, strings: dict[int, str]):
+        """Значение ячейки того же типа, что отдаёт openpyxl с data_only=True."""
+        if cell is None or cell.value is None:
+            return None
+        raw = cell.value
+        match cell.type:
+            case "s":
+                return strings.get(int(raw))
+            case "b":
+                return bool(int(raw))
+            case "n":
+                number = float(raw) if "." in raw or "E" in raw or "e" in raw else int(raw)
+                if cell.style in self.date_styles:
+                    return from_excel(number, self.epoch)
+                return number
+            case _:
+                return raw
@@ -0,0 +1,560 @@
+import multiprocessing
+import posixpath
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
+from io import BytesIO
+from itertools import repeat
+from typing import NamedTuple
+
+from lxml import etree
+
+from package_writer import PackageWriter
+from sources import Source, open_source
+from xlsx_stream import MAIN_NS, PKG_REL_NS, REL_NS, q
+
+CT_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+REL_TYPES = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/"
+WORKSHEET_REL = REL_TYPES + "worksheet"
+SHARED_STRINGS_REL = REL_TYPES + "sharedStrings"
+CALC_CHAIN_REL = REL_TYPES + "calcChain"
+WORKSHEET_CT = "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"
+SHARED_STRINGS_CT = (
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"
+)
+WORKBOOK = "xl/workbook.xml"
+WORKBOOK_RELS = "xl/_rels/workbook.xml.rels"
+STYLES = "xl/styles.xml"
+CONTENT_TYPES = "[Content_Types].xml"
+# порядок разделов styles.xml по схеме
+STYLE_SECTIONS = (
+    "numFmts", "fonts", "fills", "borders", "cellStyleXfs", "cellXfs",
+    "cellStyles", "dxfs", "tableStyles", "colors", "extLst",
+)
+# элементы листа со ссылками на его связи (рисунки, примечания, умные таблицы);
+# связи листа не переносятся, поэтому ссылки тоже убираются
+REL_ELEMENTS = (
+    "drawing", "legacyDrawing", "legacyDrawingHF", "picture",
+    "oleObjects", "controls", "tableParts",
+)
+# определённые имена листа, которые относятся к настройкам печати
+PRINT_NAMES = ("_xlnm.Print_Area", "_xlnm.Print_Titles")
+FIRST_CUSTOM_NUMFMT = 164
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+_R_ID = f"{{{REL_NS}}}id"
+_SHEET_DATA = re.compile(rb"<((?:\w+:)?)sheetData\b[^>]*?(/?)>")
+_EMPTY_SHEET_DATA = re.compile(rb"<((?:\w+:)?)sheetData/>")
+_CELL = re.compile(rb"<(?:\w+:)?c\b[^>]*?(?:/>|>.*?</(?:\w+:)?c>)", re.S)
+_ROW_TAG = re.compile(rb"<(?:\w+:)?row\b[^>]*>")
+_S_ATTR = re.compile(rb"(\ss=)([\"'])(\d+)\2")
+_SHARED_TYPE = re.compile(rb"\st=([\"'])s\1")
+_VALUE = re.compile(rb"(<(?:\w+:)?v>)(\d+)(</)")
+
+
+def _key(el) -> tuple:
+    """Ключ для сравнения элементов по содержимому (без объявлений пространств имён)."""
+    return (el.tag, tuple(sorted(el.attrib.items())), el.text, tuple(_key(c) for c in el))
+
+
+def _resolve(target: str, base: str = "xl") -> str:
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join(base, target))
+
+
+def _rels_path(part: str) -> str:
+    folder, name = posixpath.split(part)
+    return f"{folder}/_rels/{name}.rels"
+
+
+class InternTable:
+    """
+    Раздел styles.xml или sharedStrings.xml (fonts, fills, dxfs, sst …):
+    одинаковые элементы хранятся один раз, новые дописываются в конец.
+    """
+
+    def __init__(self, parent, tag: str) -> None:
+        self.parent = parent
+        self.tag = tag
+        self.index: dict[tuple, int] = {}
+        self.size = 0
+        for el in parent.iterchildren(tag):
+            self.index.setdefault(_key(el), self.size)
+            self.size += 1
+
+    def intern(self, el) -> int:
+        key = _key(el)
+        idx = self.index.get(key)
+        if idx is None:
+            self.parent.append(deepcopy(el))
+            idx = self.index[key] = self.size
+            self.size += 1
+        return idx
+
+    def update_count(self) -> None:
+        self.parent.set("count", str(self.size))
+
+
+def _section(root, name: str, order: tuple[str, ...] = STYLE_SECTIONS):
+    """Раздел styles.xml; если его нет — создаётся на своём месте по схеме."""
+    found = root.find(q(name))
+    if found is not None:
+        return found
+    el = etree.Element(q(name))
+    later = set(order[order.index(name) + 1 :])
+    for i, child in enumerate(root):
+        if etree.QName(child).localname in later:
+            root.insert(i, el)
+            return el
+    root.append(el)
+    return el
+
+
+class StyleMerger:
+    """
+    Слияние styles.xml книги-источника в styles.xml целевой книги.
+
+    Шрифты, заливки, границы, форматы чисел, cellXfs и dxfs источника
+    дописываются в таблицы цели (одинаковые записи не дублируются);
+    cell_xfs и dxfs — номера стилей цели по номерам источника.
+    """
+
+    def __init__(self, target_root, origin_root) -> None:
+        self.root = target_root
+        self.origin = origin_root
+        self._numfmts = self._merge_numfmts()
+        self._fonts = self._merge("fonts", "font")
+        self._fills = self._merge("fills", "fill")
+        self._borders = self._merge("borders", "border")
+        self.cell_xfs = self._merge_cell_xfs()
+        self.dxfs = self._merge("dxfs", "dxf")
+
+    def _merge(self, section: str, tag: str) -> list[int]:
+        source = self.origin.find(q(section))
+        if source is None or not len(source):
+            return []
+        table = InternTable(_section(self.root, section), q(tag))
+        mapping = [table.intern(el) for el in source.iterchildren(q(tag))]
+        table.update_count()
+        return mapping
+
+    def _merge_numfmts(self) -> dict[str, str]:
+        source = self.origin.find(q("numFmts"))
+        if source is None:
+            return {}
+        target = self.root.find(q("numFmts"))
+        by_code = {}
+        next_id = FIRST_CUSTOM_NUMFMT
+        for fmt in () if target is None else target.iterchildren(q("numFmt")):
+            by_code.setdefault(fmt.get("formatCode"), fmt.get("numFmtId"))
+            next_id = max(next_id, int(fmt.get("numFmtId")) + 1)
+        mapping = {}
+        for fmt in source.iterchildren(q("numFmt")):
+            code = fmt.get("formatCode")
+            if code not in by_code:
+                target = _section(self.root, "numFmts")
+                etree.SubElement(
+                    target, q("numFmt"), numFmtId=str(next_id), formatCode=code
+                )
+                by_code[code] = str(next_id)
+                next_id += 1
+            mapping[fmt.get("numFmtId")] = by_code[code]
+        if target is not None:
+            target.set("count", str(len(target.findall(q("numFmt")))))
+        return mapping
+
+    def _merge_cell_xfs(self) -> list[int]:
+        source = self.origin.find(q("cellXfs"))
+        if source is None:
+            return []
+        table = InternTable(_section(self.root, "cellXfs"), q("xf"))
+        mapping = []
+        for i, xf in enumerate(source.iterchildren(q("xf"))):
+            if i == 0:
+                # стиль по умолчанию остаётся стилем по умолчанию цели,
+                # как у openpyxl: ячейки без стиля не копировали оформление
+                mapping.append(0)
+                continue
+            xf = deepcopy(xf)
+            for attr, ids in (
+                ("fontId", self._fonts),
+                ("fillId", self._fills),
+                ("borderId", self._borders),
+            ):
+                if ids:
+                    xf.set(attr, str(ids[int(xf.get(attr, 0))]))
+            num_fmt = xf.get("numFmtId")
+            if num_fmt in self._numfmts:
+                xf.set("numFmtId", self._numfmts[num_fmt])
+            # именованные стили (cellStyles) не переносятся
+            xf.set("xfId", "0")
+            mapping.append(table.intern(xf))
+        table.update_count()
+        return mapping
+
+
+
+class SharedStrings:
+    """
+    Общие строки цели с дописанными строками источника.
+    Строки источника переносятся все и по порядку, поэтому номера
+    не зависят от того, в каком порядке (и процессе) обрабатываются листы.
+    """
+
+    def __init__(self, target_root, origin_root) -> None:
+        self.root = target_root
+        self.table = InternTable(target_root, q("si"))
+        origin = () if origin_root is None else origin_root.iterchildren(q("si"))
+        self.mapping = [self.table.intern(si) for si in origin]
+
+    @property
+    def used(self) -> bool:
+        return bool(self.mapping)
+
+    def tostring(self) -> bytes:
+        self.root.set("uniqueCount", str(self.table.size))
+        self.root.attrib.pop("count", None)
+        return etree.tostring(self.root, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+
+class IdMap(NamedTuple):
+    """Номера источника -> номера цели для одного переноса (передаётся в процессы)."""
+
+    cell_xfs: list[int]
+    dxfs: list[int]
+    strings: list[int]
+
+    def cell_xf(self, idx: int) -> int:
+        return self.cell_xfs[idx] if idx < len(self.cell_xfs) else 0
+
+    def dxf(self, idx: int) -> int | None:
+        """None — в dxfs источника нет такой записи: переносить нечего."""
+        return self.dxfs[idx] if idx < len(self.dxfs) else None
+
+
+def rewrite_sheet(data: bytes, ids: IdMap) -> bytes:
+    """
+    XML листа источника с номерами стилей и строк цели.
+    Чистая функция от байтов листа: листы можно обрабатывать в разных процессах.
+    """
+    m = _SHEET_DATA.search(data)
+    if m is None:
+        raise ValueError("В листе нет sheetData")
+    prefix = m.group(1)
+    if m.group(2):
+        body, tail = b"", data[m.end() :]
+    else:
+        close = b"</" + prefix + b"sheetData>"
+        end = data.index(close, m.end())
+        body, tail = data[m.end() : end], data[end + len(close) :]
+
+    def style(match: re.Match) -> bytes:
+        idx = ids.cell_xf(int(match.group(3)))
+        return match.group(1) + match.group(2) + str(idx).encode() + match.group(2)
+
+    def shared(match: re.Match) -> bytes:
+        return match.group(1) + str(ids.strings[int(match.group(2))]).encode() + match.group(3)
+
+    def cell(match: re.Match) -> bytes:
+        text = match.group(0)
+        end = text.index(b">")
+        head = _S_ATTR.sub(style, text[:end], count=1)
+        rest = text[end:]
+        if _SHARED_TYPE.search(head):
+            rest = _VALUE.sub(shared, rest, count=1)
+        return head + rest
+
+    body = _CELL.sub(cell, body)
+    body = _ROW_TAG.sub(lambda r: _S_ATTR.sub(style, r.group(0), count=1), body)
+
+    # всё, что вне sheetData, небольшое: разбираем как дерево
+    root = etree.fromstring(data[: m.start()] + b"<" + prefix + b"sheetData/>" + tail)
+    _fix_sheet_tree(root, ids)
+    skeleton = etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+    empty = _EMPTY_SHEET_DATA.search(skeleton)
+    if not body:
+        return skeleton
+    tag = empty.group(1) + b"sheetData"
+    return (
+        skeleton[: empty.start()]
+        + b"<" + tag + b">" + body + b"</" + tag + b">"
+        + skeleton[empty.end() :]
+    )
+
+
+def _fix_sheet_tree(root, ids: IdMap) -> None:
+    for view in root.iter(q("sheetView")):
+        # выбранным остаётся лист, активный в целевой книге
+        view.attrib.pop("tabSelected", None)
+    for col in root.iter(q("col")):
+        if col.get("style") is not None:
+            col.set("style", str(ids.cell_xf(int(col.get("style")))))
+    for rule in root.iter(q("cfRule")):
+        if rule.get("dxfId") is not None:
+            dxf = ids.dxf(int(rule.get("dxfId")))
+            # номер без записи указал бы на чужой или несуществующий dxf цели
+            if dxf is None:
+                del rule.attrib["dxfId"]
+            else:
+                rule.set("dxfId", str(dxf))
+    for name in REL_ELEMENTS:
+        for el in root.findall(q(name)):
+            root.remove(el)
+    hyperlinks = root.find(q("hyperlinks"))
+    if hyperlinks is not None:
+        for link in hyperlinks.findall(q("hyperlink")):
+            if link.get(_R_ID) is not None:
+                hyperlinks.remove(link)
+        if not len(hyperlinks):
+            root.remove(hyperlinks)
+    for setup in root.iter(q("pageSetup")):
+        setup.attrib.pop(_R_ID, None)
+
+
+class SheetTransplant:
+    """
+    Перенос листов одной книги в другую на уровне XML пакета, без openpyxl.
+
+    XML листа источника переписывается потоком байтов: меняются только
+    номера стилей (`s`) и общих строк (`<v>` у t="s"). Объединения,
+    размеры, условное форматирование и настройки печати переносятся
+    вместе с листом. Остальные листы и части цели копируются как есть.
+
+    Порядок листов как у прежнего Processor.copy_ws: листы источника
+    в начале, за ними листы цели, кроме заменённых и пустого "Sheet".
+    """
+
+    def __init__(
+        self, origin: zipfile.ZipFile, target: zipfile.ZipFile, workers: int = 1
+    ) -> None:
+        self.origin = origin
+        self.target = target
+        self.workers = workers
+        self.names = set(target.namelist())
+        self.parts: dict[str, bytes] = {}
+        self.removed: set[str] = set()
+
+    # --- чтение пакета ---
+
+    def _xml(self, package: zipfile.ZipFile, part: str):
+        return etree.fromstring(package.read(part))
+
+    @staticmethod
+    def _tostring(root) -> bytes:
+        return etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+    def _sheets(self, workbook, rels) -> list[tuple[etree._Element, etree._Element]]:
+        """Листы книги с их связями, в порядке книги."""
+        by_id = {rel.get("Id"): rel for rel in rels.iterchildren(f"{{{PKG_REL_NS}}}Relationship")}
+        return [(sheet, by_id[sheet.get(_R_ID)]) for sheet in workbook.find(q("sheets"))]
+
+    @staticmethod
+    def _part_of(rels, rel_type: str) -> str | None:
+        for rel in rels.iterchildren(f"{{{PKG_REL_NS}}}Relationship"):
+            if rel.get("Type") == rel_type:
+                return _resolve(rel.get("Target"))
+        return None
+
+    # --- перенос ---
+
+    def run(self) -> BytesIO:
+        workbook = self._xml(self.target, WORKBOOK)
+        rels = self._xml(self.target, WORKBOOK_RELS)
+        types = self._xml(self.target, CONTENT_TYPES)
+        origin_workbook = self._xml(self.origin, WORKBOOK)
+        origin_rels = self._xml(self.origin, WORKBOOK_RELS)
+
+        origin_sheets = []
+        for sheet, rel in self._sheets(origin_workbook, origin_rels):
+            if rel.get("Type") != WORKSHEET_REL:
+                print(f"Лист {sheet.get('name')!r} не рабочий лист, пропускаем")
+                continue
+            origin_sheets.append((sheet, rel))
+        origin_names = {sheet.get("name") for sheet, _ in origin_sheets}
+
+        styles = StyleMerger(
+            self._xml(self.target, STYLES) if STYLES in self.names else etree.Element(q("styleSheet")),
+            self._xml(self.origin, STYLES) if STYLES in self.origin.namelist() else etree.Element(q("styleSheet")),
+        )
+        sst_part = self._part_of(rels, SHARED_STRINGS_REL)
+        origin_sst = self._part_of(origin_rels, SHARED_STRINGS_REL)
+        strings = SharedStrings(
+            self._xml(self.target, sst_part) if sst_part else etree.Element(q("sst"), nsmap={None: MAIN_NS}),
+            self._xml(self.origin, origin_sst) if origin_sst else None,
+        )
+
+        # листы цели: остаются все, кроме заменяемых и пустого "Sheet"
+        target_sheets = self._sheets(workbook, rels)
+        kept = []
+        new_index = {}
+        for i, (sheet, rel) in enumerate(target_sheets):
+            name = sheet.get("name")
+            if name in origin_names or name == "Sheet":
+                self._remove_part(_resolve(rel.get("Target")), types)
+                rels.remove(rel)
+                continue
+            new_index[i] = len(origin_sheets) + len(kept)
+            kept.append(sheet)
+
+        sheets = workbook.find(q("sheets"))
+        for sheet in list(sheets):
+            sheets.remove(sheet)
+        sheet_id = max((int(s.get("sheetId")) for s, _ in target_sheets), default=0)
+        ids = IdMap(styles.cell_xfs, styles.dxfs, strings.mapping)
+        datas = [self.origin.read(_resolve(rel.get("Target"))) for _, rel in origin_sheets]
+        for (sheet, rel), data in zip(origin_sheets, self._rewrite_sheets(datas, ids)):
+            sheet_id += 1
+            part = self._new_part_name("xl/worksheets/sheet{}.xml")
+            self.parts[part] = data
+            rel_id = self._new_rel(rels, WORKSHEET_REL, posixpath.relpath(part, "xl"))
+            self._add_override(types, part, WORKSHEET_CT)
+            attrs = {"name": sheet.get("name"), "sheetId": str(sheet_id)}
+            if sheet.get("state"):
+                attrs["state"] = sheet.get("state")
+            new = etree.SubElement(sheets, q("sheet"), attrs)
+            new.set(_R_ID, rel_id)
+        for sheet in kept:
+            sheets.append(sheet)
+
+        self._update_defined_names(workbook, origin_workbook, origin_sheets, new_index)
+        self._update_views(workbook, new_index)
+
+        # цепочка вычислений ссылается на старые номера листов — Excel пересоберёт её
+        calc_chain = self._part_of(rels, CALC_CHAIN_REL)
+        if calc_chain:
+            self._remove_part(calc_chain, types)
+            for rel in list(rels):
+                if rel.get("Type") == CALC_CHAIN_REL:
+                    rels.remove(rel)
+
+        if strings.used:
+            if sst_part is None:
+                sst_part = "xl/sharedStrings.xml"
+                self._new_rel(rels, SHARED_STRINGS_REL, "sharedStrings.xml")
+                self._add_override(types, sst_part, SHARED_STRINGS_CT)
+            self.parts[sst_part] = strings.tostring()
+
+        self.parts[STYLES] = self._tostring(styles.root)
+        if STYLES not in self.names:
+            self._add_override(
+                types, STYLES, "application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"
+            )
+        self.parts[WORKBOOK] = self._tostring(workbook)
+        self.parts[WORKBOOK_RELS] = self._tostring(rels)
+        self.parts[CONTENT_TYPES] = self._tostring(types)
+        return self._write()
+
+    def _rewrite_sheets(self, datas: list[bytes], ids: IdMap) -> list[bytes]:
+        """
+        Листы переписываются независимо друг от друга; при workers > 1 —
+        в пуле процессов. pool.map отдаёт результаты в порядке листов,
+        поэтому итоговый файл совпадает с последовательным запуском.
+        """
+        workers = min(self.workers, len(datas))
+        if workers <= 1:
+            return [rewrite_sheet(data, ids) for data in datas]
+        # spawn, а не fork: в процессе приложения уже могут работать потоки polars
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            return list(pool.map(rewrite_sheet, datas, repeat(ids)))
+
+    def _update_defined_names(self, workbook, origin_workbook, origin_sheets, new_index) -> None:
+        """localSheetId — номер листа по порядку: пересчитываем под новый порядок."""
+        names = workbook.find(q("definedNames"))
+        if names is not None:
+            for name in list(names):
+                local = name.get("localSheetId")
+                if local is None:
+                    continue
+                if int(local) in new_index:
+                    name.set("localSheetId", str(new_index[int(local)]))
+                else:
+                    names.remove(name)
+        origin_names = origin_workbook.find(q("definedNames"))
+        if origin_names is None:
+            return
+        all_origin = [s.get("name") for s in origin_workbook.find(q("sheets"))]
+        moved = [sheet.get("name") for sheet, _ in origin_sheets]
+        for name in origin_names:
+            local = name.get("localSheetId")
+            if local is None or name.get("name") not in PRINT_NAMES:
+                continue
+            sheet_name = all_origin[int(local)]
+            if sheet_name not in moved:
+                continue
+            if names is None:
+                names = etree.Element(q("definedNames"))
+                workbook.find(q("sheets")).addnext(names)
+            new = deepcopy(name)
+            new.set("localSheetId", str(moved.index(sheet_name)))
+            names.append(new)
+
+    @staticmethod
+    def _update_views(workbook, new_index) -> None:
+        for view in workbook.iter(q("workbookView")):
+            active = int(view.get("activeTab", 0))
+            view.set("activeTab", str(new_index.get(active, 0)))
+            if view.get("firstSheet") is not None:
+                view.set("firstSheet", "0")
+
+    # --- части пакета ---
+
+    def _new_part_name(self, pattern: str) -> str:
+        n = 1
+        while pattern.format(n) in self.names or pattern.format(n) in self.parts:
+            n += 1
+        return pattern.format(n)
+
+    @staticmethod
+    def _new_rel(rels, rel_type: str, target: str) -> str:
+        ids = {rel.get("Id") for rel in rels}
+        n = 1
+        while f"rId{n}" in ids:
+            n += 1
+        etree.SubElement(
+            rels, f"{{{PKG_REL_NS}}}Relationship", Id=f"rId{n}", Type=rel_type, Target=target
+        )
+        return f"rId{n}"
+
+    @staticmethod
+    def _add_override(types, part: str, content_type: str) -> None:
+        etree.SubElement(
+            types, f"{{{CT_NS}}}Override", PartName="/" + part, ContentType=content_type
+        )
+
+    def _remove_part(self, part: str, types) -> None:
+        self.removed.update((part, _rels_path(part)))
+        for override in types.iterchildren(f"{{{CT_NS}}}Override"):
+            if override.get("PartName") == "/" + part:
+                types.remove(override)
+
+    def _write(self) -> BytesIO:
+        # нетронутые части книги (листы, рисунки) копируются без пересжатия,
+        # изменённые сжимаются параллельно
+        with PackageWriter(self.target) as out:
+            for info in self.target.infolist():
+                if info.filename in self.removed:
+                    continue
+                # изменённые части сохраняют дату исходной записи
+                data = self.parts.pop(info.filename, None)
+                if data is None:
+                    out.copy(info)
+                else:
+                    out.write(info, data)
+            for part, data in self.parts.items():
+                # фиксированная дата: одинаковый вход — одинаковые байты на выходе
+                out.write(zipfile.ZipInfo(part, date_time=ZIP_EPOCH), data)
+        return out.buffer
+
+
+def transplant_sheets(origin: Source, target: Source, workers: int = 1) -> BytesIO:
+    """
+    Листы origin в начало книги target; на выходе готовый xlsx в памяти.
+    workers — число процессов для переписывания листов (1 — без пула).
+    """
+    with (
+        zipfile.ZipFile(open_source(origin)) as src,
+        zipfile.ZipFile(open_source(target)) as dst,
+    ):
+        return SheetTransplant(src, dst, workers).run()